@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 
 from .indexer import build_lexicon_index
 from .harmonizer import harmonize_content
+from .matcher import LexiconMatcher
 from .manifest_generator import generate_manifest
 from forge.packages.common import ui as loom
 from forge.packages.psi import config # Import config for root path
@@ -73,6 +74,7 @@ def main():
     repo_paths = [os.path.join(foundation_root, name) for name in repos_to_scan_names]
 
     lexicon = build_lexicon_index(repo_paths)
+    matcher = LexiconMatcher(lexicon) # Compiled once and reused for every file.
     files_to_process = get_all_markdown_files(repo_paths)
     
     setup_items = [
@@ -90,7 +92,7 @@ def main():
         with open(file_path, 'r', encoding='utf-8') as f:
             original_content = f.read()
 
-        new_content = harmonize_content(original_content, lexicon, provider)
+        new_content = harmonize_content(original_content, lexicon, provider, matcher)
 
         if new_content != original_content:
             manifests_generated += 1
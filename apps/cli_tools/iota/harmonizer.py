@@ -2,10 +2,12 @@
 import re
 import os
 import json
+import bisect
 from typing import Dict, Set, List, Any
 from forge.packages.psi.client import get_oracle_response
 from forge.packages.common.ui import eprint, Colors
 from pydantic import BaseModel
+from .matcher import LexiconMatcher
 
 # --- Pydantic model for Oracle validation ---
 class OracleValidation(BaseModel):
@@ -23,13 +25,29 @@ def _is_start_of_sentence(text: str, index: int) -> bool:
         return True
     return False
 
-def _get_paragraph(text: str, index: int) -> str:
-    """Extracts the full paragraph surrounding a match index."""
-    start = text.rfind('\n\n', 0, index) + 2
-    end = text.find('\n\n', index)
-    if end == -1:
-        return text[start:]
-    return text[start:end]
+class _DocumentIndex:
+    """
+    Line-start offsets and paragraph boundaries of a document, built in one pass, so the
+    paragraph around any (line, column) is found by bisection instead of rescanning the text.
+    """
+    def __init__(self, lines: List[str]):
+        self.text = "\n".join(lines)
+        self.line_starts = [0] * len(lines)
+        offset = 0
+        for line_num, line in enumerate(lines):
+            self.line_starts[line_num] = offset
+            offset += len(line) + 1
+        # Every position where a blank line begins, overlapping runs included.
+        self.breaks = [m.start() for m in re.finditer(r'(?=\n\n)', self.text)]
+
+    def paragraph_at(self, line_num: int, column: int) -> str:
+        """Extracts the full paragraph surrounding a position."""
+        index = self.line_starts[line_num] + column
+        before = bisect.bisect_right(self.breaks, index - 2) - 1
+        start = self.breaks[before] + 2 if before >= 0 else 0
+        after = bisect.bisect_left(self.breaks, index)
+        end = self.breaks[after] if after < len(self.breaks) else len(self.text)
+        return self.text[start:end]
 
 def _consult_oracle(paragraph: str, term: str, lexicon: List[str]) -> bool:
     """Calls the Psi Oracle to validate a term's usage."""
@@ -74,22 +92,22 @@ def _consult_oracle(paragraph: str, term: str, lexicon: List[str]) -> bool:
     return False
 
 # --- Main Harmonizer Logic ---
-def harmonize_content(original_content: str, lexicon: Dict[str, str], provider: Any) -> str:
+def harmonize_content(original_content: str, lexicon: Dict[str, str], provider: Any, matcher: LexiconMatcher = None) -> str:
     """
     Applies the "one concept, one primary link" rule to a string of document content,
     using the provided format provider and consulting the Psi Oracle for ambiguous cases.
+    Pass a matcher built once per run when harmonizing many files; otherwise one is built here.
     """
     had_trailing_newline = original_content.endswith('\n')
     clean_content = provider.strip_formatting(original_content)
     lines = clean_content.splitlines()
+    document = _DocumentIndex(lines)
     new_lines = []
     seen_in_file: Set[str] = set()
 
-    all_concepts_sorted = sorted(lexicon.keys(), key=len, reverse=True)
-    
-    master_pattern_str = r'\b(' + '|'.join(re.escape(k) for k in all_concepts_sorted) + r')\b'
-    master_pattern = re.compile(master_pattern_str)
-    
+    if matcher is None:
+        matcher = LexiconMatcher(lexicon)
+
     for line_num, line in enumerate(lines):
         stripped_line = line.strip()
         if stripped_line.startswith(('#', '**Type:**', '-', '*')):
@@ -97,7 +115,7 @@ def harmonize_content(original_content: str, lexicon: Dict[str, str], provider:
             continue
         
         replacements = {}
-        for match in master_pattern.finditer(line):
+        for match in matcher.finditer(line):
             term = match.group(1)
             start, end = match.start(), match.end()
             
@@ -110,10 +128,9 @@ def harmonize_content(original_content: str, lexicon: Dict[str, str], provider:
                 continue
 
             # --- Heuristic Check ---
-            full_text_for_context = "\n".join(lines)
             if _is_start_of_sentence(line, start):
-                paragraph = _get_paragraph(full_text_for_context, full_text_for_context.find(line) + start)
-                if not _consult_oracle(paragraph, term, list(lexicon.keys())):
+                paragraph = document.paragraph_at(line_num, start)
+                if not _consult_oracle(paragraph, term, matcher.terms):
                     continue # Oracle says it's a common noun, so we skip it.
 
             # --- Link Harmonization Logic ---
@@ -0,0 +1,49 @@
+# --- Iota: Lexicon Matcher ---
+# Finds lexicon terms in document text. The lexicon is compiled once per run into a single
+# trie-structured regex, so its cost is paid once rather than for every file harmonized.
+import re
+from typing import Dict, Iterator, List
+
+_END = ''  # Marks a trie node where a complete term ends.
+
+def _build_trie(terms: List[str]) -> dict:
+    """Builds a character trie from the lexicon terms."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[_END] = True
+    return trie
+
+def _trie_to_pattern(node: dict) -> str:
+    """
+    Turns a trie node into a regex. Terms sharing a prefix share its pattern, and a term that
+    ends where a longer one continues becomes an optional suffix. The regex engine tries the
+    longer continuation first and backtracks to the shorter term, so a match is the longest
+    term at that position that is also a whole word.
+    """
+    branches = [re.escape(char) + _trie_to_pattern(child) for char, child in sorted(node.items()) if char != _END]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if _END in node:
+        return '(?:' + body + ')?'
+    return body
+
+class LexiconMatcher:
+    """
+    Matches a lexicon's terms as whole words, leftmost-longest. Build it once from
+    build_lexicon_index() and pass it to harmonize_content() for every file.
+    """
+    def __init__(self, lexicon: Dict[str, str]):
+        self.lexicon = lexicon
+        self.terms = list(lexicon.keys())
+        terms = [term for term in self.terms if term]
+        self._pattern = re.compile(r'\b(' + _trie_to_pattern(_build_trie(terms)) + r')\b') if terms else None
+
+    def finditer(self, text: str) -> Iterator[re.Match]:
+        """Yields non-overlapping matches in text; group(1) is the matched term."""
+        if self._pattern is None:
+            return iter(())
+        return self._pattern.finditer(text)
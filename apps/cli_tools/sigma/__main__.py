@@ -3,10 +3,20 @@ import os
 import sys
 import argparse
 import json
+import time
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 
-from .snapshot import get_ignore_patterns, process_repo, write_snapshot_to_stdout, write_json_snapshot_to_stdout
+from .snapshot import get_ignore_patterns, process_repo, process_file_list, write_snapshot_to_stdout, write_json_snapshot_to_stdout
+from . import cache as snapshot_cache
 from forge.packages.common import ui as loom
 
+def _scan_repo(repo_path: str, global_ignore_patterns: list, selectors: dict) -> tuple:
+    """Scans a single repository, returning its file list and the scan time in seconds."""
+    start = time.perf_counter()
+    repo_files = process_repo(repo_path, global_ignore_patterns, **selectors)
+    return repo_files, time.perf_counter() - start
+
 def main():
     foundation_root = os.environ.get("ENCLAVE_FOUNDATION_ROOT", os.path.expanduser("~/softrecursion/TheEnclaveFoundation"))
     
@@ -18,8 +28,18 @@ def main():
     parser.add_argument('--specs', action='store_true', help="Scrape the 'specs' repository.")
     parser.add_argument('--forge', action='store_true', help="Scrape the 'forge' repository.")
     parser.add_argument('--output-format', type=str, choices=['text', 'json'], default='text', help="The output format.")
+    parser.add_argument('--include', action='append', metavar='PATTERN', help="Only include files matching this gitignore-style pattern (repeatable).")
+    parser.add_argument('--exclude', action='append', metavar='PATTERN', help="Exclude files matching this gitignore-style pattern (repeatable).")
+    parser.add_argument('--subtree', action='append', metavar='DIR', help="Only scan this directory, relative to each repository root (repeatable).")
+    parser.add_argument('--files-from', type=str, metavar='FILE', help="Snapshot the paths listed in FILE, one per line ('-' reads stdin), instead of whole repositories. --include and --exclude still apply.")
+    parser.add_argument('--use-git-index', action='store_true', help="Enumerate files from the git index instead of walking the tree.")
+    parser.add_argument('--dedupe', action='store_true', help="Emit files with identical content as references to their first occurrence.")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the snapshot cache and render a fresh snapshot.")
     parser.add_argument('--help', action='help', help='Show this help message and exit')
     args = parser.parse_args()
+    repo_flags = args.all or args.foundation or args.mycelium or args.specs or args.forge
+    if args.files_from and (repo_flags or args.subtree or args.use_git_index):
+        parser.error("--files-from cannot be combined with repository flags, --subtree or --use-git-index; list the files you want instead")
 
     render_plan = [{"type": "banner", "symbol": "Σ", "color": "cyan"}]
     is_piped = not sys.stdout.isatty()
@@ -46,7 +66,7 @@ def main():
         if args.specs: repos_to_scrape.append('specs')
         if args.forge: repos_to_scrape.append('forge')
 
-    if not repos_to_scrape:
+    if not repos_to_scrape and not args.files_from:
         render_plan.append({"type": "group", "title": "Error", "items": [{"key": "Message", "value": "No repository specified. Use --all or see --help."}]})
         render_plan.append({"type": "end", "text": "Operation aborted.", "color": "red"})
         loom.render(render_plan)
@@ -56,13 +76,44 @@ def main():
     ignore_file = os.path.join(script_dir, ".sigmaignore")
     global_ignore_patterns = get_ignore_patterns(ignore_file)
     all_files_to_process = []
-    
     repo_items = []
-    for repo_name in repos_to_scrape:
-        repo_path = os.path.join(foundation_root, repo_name)
-        repo_files = process_repo(repo_path, global_ignore_patterns)
-        repo_items.append({"key": repo_name, "value": f"({len(repo_files)} files)"})
-        all_files_to_process.extend(repo_files)
+
+    if args.files_from:
+        start = time.perf_counter()
+        if args.files_from == '-':
+            file_list = sys.stdin.read().splitlines()
+        else:
+            try:
+                with open(args.files_from, 'r', encoding='utf-8') as f:
+                    file_list = f.read().splitlines()
+            except FileNotFoundError:
+                render_plan.append({"type": "group", "title": "Error", "items": [{"key": "Message", "value": f"File list not found: {args.files_from}"}]})
+                render_plan.append({"type": "end", "text": "Operation aborted.", "color": "red"})
+                loom.render(render_plan)
+                return
+        all_files_to_process = process_file_list(file_list, foundation_root, global_ignore_patterns, args.include, args.exclude)
+        repo_items.append({"key": "File List", "value": f"({len(all_files_to_process)} files, {time.perf_counter() - start:.2f}s)"})
+    else:
+        selectors = {
+            "use_git_index": args.use_git_index,
+            "include_patterns": args.include,
+            "exclude_patterns": args.exclude,
+            "subtrees": args.subtree,
+        }
+        # Repositories are independent, so they are scanned concurrently. Results are
+        # collected in the order the repositories were requested to keep output deterministic.
+        with ThreadPoolExecutor(max_workers=len(repos_to_scrape)) as executor:
+            futures = [executor.submit(_scan_repo, os.path.join(foundation_root, repo_name), global_ignore_patterns, selectors) for repo_name in repos_to_scrape]
+            try:
+                for repo_name, future in zip(repos_to_scrape, futures):
+                    repo_files, scan_seconds = future.result()
+                    repo_items.append({"key": repo_name, "value": f"({len(repo_files)} files, {scan_seconds:.2f}s)"})
+                    all_files_to_process.extend(repo_files)
+            except ValueError as e:
+                render_plan.append({"type": "group", "title": "Error", "items": [{"key": "Message", "value": str(e)}]})
+                render_plan.append({"type": "end", "text": "Operation aborted.", "color": "red"})
+                loom.render(render_plan)
+                return
     
     render_plan.append({"type": "group", "title": "Scoping Repositories", "items": repo_items})
 
@@ -72,10 +123,18 @@ def main():
     elif is_piped:
          output_dest += " to pipe"
 
+    writes_output = args.output_format == 'json' or is_piped
+    cache_key = None
+    cache_status = "Disabled"
+    if writes_output and not args.no_cache:
+        cache_key = snapshot_cache.compute_fingerprint(all_files_to_process, foundation_root, args.output_format, system_prompt, args.dedupe)
+        cache_status = "Hit" if snapshot_cache.has_snapshot(cache_key) else "Miss"
+
     summary_items = [
         {"key": "Repos Scraped", "value": str(len(repos_to_scrape))},
         {"key": "Files Forged", "value": str(len(all_files_to_process))},
-        {"key": "Output Sent To", "value": output_dest}
+        {"key": "Output Sent To", "value": output_dest},
+        {"key": "Snapshot Cache", "value": cache_status}
     ]
     render_plan.append({"type": "group", "title": "Snapshot Summary", "items": summary_items})
 
@@ -89,10 +148,17 @@ def main():
     loom.render(render_plan)
 
     # Then, as the final step, write the data to stdout if needed
-    if args.output_format == 'json':
-        write_json_snapshot_to_stdout(all_files_to_process, foundation_root)
-    elif is_piped:
-        write_snapshot_to_stdout(all_files_to_process, foundation_root, system_prompt)
+    if not writes_output:
+        return
+    if cache_key and snapshot_cache.stream_snapshot(cache_key):
+        return
+
+    # On a miss the snapshot still streams out as it renders, while being teed into the cache.
+    with snapshot_cache.recording_snapshot(cache_key) if cache_key else contextlib.nullcontext():
+        if args.output_format == 'json':
+            write_json_snapshot_to_stdout(all_files_to_process, foundation_root, args.dedupe)
+        else:
+            write_snapshot_to_stdout(all_files_to_process, foundation_root, system_prompt, args.dedupe)
 
 if __name__ == "__main__":
     main()
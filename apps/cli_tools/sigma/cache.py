@@ -0,0 +1,141 @@
+# --- Sigma: Snapshot Cache ---
+import os
+import sys
+import hashlib
+import tempfile
+import contextlib
+from typing import List, BinaryIO, Iterator, Optional
+
+# --- Configuration ---
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', '.cache', 'sigma')
+CACHE_MAX_BYTES = int(os.environ.get("SIGMA_CACHE_MAX_BYTES", 256 * 1024 * 1024)) # 256 MiB
+CACHE_SCHEMA_VERSION = "1.0"
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+# --- Internal Functions ---
+
+def _get_cache_path(key: str) -> str:
+    """Constructs the full file path for a given cache key."""
+    return os.path.join(CACHE_DIR, f"{key}.snapshot")
+
+def _evict(max_bytes: int):
+    """Deletes the least recently used snapshots until the cache fits within max_bytes."""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith('.snapshot'):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total_bytes -= size
+
+# --- Public API ---
+
+def compute_fingerprint(all_files: List[str], foundation_root: str, output_format: str, system_prompt: Optional[str], dedupe: bool) -> str:
+    """
+    Generates a cache key from the selected file set (paths, sizes and modification times)
+    and every option that affects the rendered snapshot.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_SCHEMA_VERSION}|{os.path.abspath(foundation_root)}|{output_format}|{dedupe}\0".encode('utf-8'))
+    digest.update(hashlib.sha256((system_prompt or '').encode('utf-8')).digest())
+    for file_path in all_files:
+        try:
+            stat = os.stat(file_path)
+            signature = f"{file_path}|{stat.st_size}|{stat.st_mtime_ns}\0"
+        except OSError:
+            signature = f"{file_path}|missing\0"
+        digest.update(signature.encode('utf-8', errors='surrogateescape'))
+    return digest.hexdigest()
+
+def has_snapshot(key: str) -> bool:
+    """Checks whether a rendered snapshot exists for the given key."""
+    return os.path.isfile(_get_cache_path(key))
+
+def stream_snapshot(key: str, out: BinaryIO = None) -> bool:
+    """
+    Streams a cached snapshot to stdout (or the given binary stream). Returns False on a miss,
+    including a cache file that can't be opened or read before any output was written. Errors
+    writing the output are the caller's and propagate.
+    """
+    path = _get_cache_path(key)
+    try:
+        f = open(path, 'rb')
+        chunk = f.read(STREAM_CHUNK_BYTES)
+    except OSError:
+        return False
+    with f:
+        out = out or sys.stdout.buffer
+        sys.stdout.flush()
+        while chunk:
+            out.write(chunk)
+            chunk = f.read(STREAM_CHUNK_BYTES) # Output has started, so a read error can no longer fall back to a fresh render.
+        out.flush()
+    try:
+        os.utime(path) # Mark as recently used for eviction
+    except OSError:
+        pass
+    return True
+
+def _commit(tmp_path: str, key: str, max_bytes: int):
+    """Moves a fully written temporary file into place as the snapshot for key, then evicts."""
+    os.replace(tmp_path, _get_cache_path(key))
+    _evict(max_bytes)
+
+class _Tee:
+    """A text stream that writes to stdout and copies everything into a cache file on the side."""
+    def __init__(self, stream, copy):
+        self.stream = stream
+        self.copy = copy
+        self.failed = False
+
+    def write(self, text: str) -> int:
+        written = self.stream.write(text)
+        if not self.failed:
+            try:
+                self.copy.write(text)
+            except OSError:
+                self.failed = True # A cache that can't be written must never break the snapshot itself.
+        return written
+
+    def flush(self):
+        self.stream.flush()
+
+@contextlib.contextmanager
+def recording_snapshot(key: str, max_bytes: int = CACHE_MAX_BYTES) -> Iterator[None]:
+    """
+    Streams everything printed inside the block to stdout as usual, while teeing it into a
+    temporary file that becomes the cached snapshot for key once the block completes.
+    """
+    tmp_path = None
+    try:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+            copy = open(fd, 'w', encoding='utf-8', newline='')
+        except OSError:
+            yield # Caching is best-effort; render without it.
+            return
+        tee = _Tee(sys.stdout, copy)
+        with copy, contextlib.redirect_stdout(tee):
+            yield
+        if not tee.failed:
+            try:
+                _commit(tmp_path, key, max_bytes)
+            except OSError:
+                pass
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,6 +1,8 @@
 import os
 import fnmatch
-from typing import List
+import hashlib
+import subprocess
+from typing import Dict, Iterable, List, Optional, Tuple
 import json
 from forge.packages.common.ui import eprint, Colors
 import pathspec
@@ -24,44 +26,179 @@ def get_ignore_patterns(ignore_file_path: str) -> List[str]:
     with open(ignore_file_path, 'r') as f:
         return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
 
-def process_repo(repo_path: str, global_ignore_patterns: List[str]) -> List[str]:
-    """Walks a repository path and returns a sorted list of file paths, respecting all ignore files."""
-    if not os.path.isdir(repo_path):
-        return []
-
+def _order_files(file_paths: Iterable[str]) -> List[str]:
+    """Orders file paths with README files first, each group sorted alphabetically."""
     readme_files, other_files = [], []
-    
-    for root, dirs, files in os.walk(repo_path, topdown=True):
-        current_spec_lines = list(global_ignore_patterns)
+    for file_path in file_paths:
+        (readme_files if os.path.basename(file_path).upper() == 'README.MD' else other_files).append(file_path)
+    readme_files.sort()
+    other_files.sort()
+    return readme_files + other_files
+
+def _build_spec(patterns: List[str]) -> pathspec.PathSpec:
+    """Compiles gitignore-style patterns into a PathSpec."""
+    return pathspec.PathSpec.from_lines('gitwildmatch', patterns)
+
+def _is_selected(relative_path: str, ignore_spec: pathspec.PathSpec, include_spec: pathspec.PathSpec | None) -> bool:
+    """Checks a file path against the ignore patterns and the optional include selectors."""
+    if ignore_spec.match_file(relative_path):
+        return False
+    return include_spec is None or include_spec.match_file(relative_path)
+
+def list_git_files(repo_path: str, ignore_patterns: List[str], include_spec: pathspec.PathSpec | None = None, subtrees: List[str] = None) -> List[str] | None:
+    """
+    Enumerates tracked and untracked-but-not-ignored files using the git index.
+    Returns None if the path is not inside a git work tree or git is unavailable.
+    """
+    command = ['git', '-C', repo_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard']
+    if subtrees:
+        command += ['--'] + subtrees
+    try:
+        result = subprocess.run(command, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    relative_paths = [p for p in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if p]
+    ignore_spec = _build_spec(ignore_patterns)
+
+    file_paths = []
+    for relative_path in relative_paths:
+        if not _is_selected(relative_path, ignore_spec, include_spec):
+            continue
+        file_path = os.path.join(repo_path, relative_path)
+        # Deleted-but-staged entries and submodule gitlinks are not regular files.
+        if os.path.isfile(file_path):
+            file_paths.append(file_path)
+    return file_paths
+
+def _walk_files(repo_path: str, walk_root: str, ignore_patterns: List[str], include_spec: pathspec.PathSpec | None) -> List[str]:
+    """Walks walk_root, pruning ignored directories so they are never descended into."""
+    file_paths = []
+
+    for root, dirs, files in os.walk(walk_root, topdown=True):
+        current_spec_lines = list(ignore_patterns)
         gitignore_path = os.path.join(root, '.gitignore')
         if os.path.exists(gitignore_path):
             with open(gitignore_path, 'r') as f:
                 current_spec_lines.extend(f.read().splitlines())
         
-        spec = pathspec.PathSpec.from_lines('gitwildmatch', current_spec_lines)
+        spec = _build_spec(current_spec_lines)
 
         relative_root = os.path.relpath(root, repo_path)
         if relative_root == '.': relative_root = ''
 
-        paths_to_check_dirs = [os.path.join(relative_root, d).replace('\\', '/') for d in dirs]
-        ignored_dirs = set(os.path.basename(p) for p in spec.match_files(paths_to_check_dirs))
-        dirs[:] = [d for d in dirs if d not in ignored_dirs]
+        # Directories are matched with a trailing slash so directory-only patterns prune them.
+        dirs[:] = [d for d in dirs if not spec.match_file(os.path.join(relative_root, d).replace('\\', '/') + '/')]
 
-        paths_to_check_files = [os.path.join(relative_root, f).replace('\\', '/') for f in files]
-        ignored_files = set(os.path.basename(p) for p in spec.match_files(paths_to_check_files))
-        
         for file in files:
-            if file in ignored_files:
-                continue
-            
-            file_path = os.path.join(root, file)
-            (readme_files if file.upper() == 'README.MD' else other_files).append(file_path)
-    
-    readme_files.sort()
-    other_files.sort()
-    return readme_files + other_files
+            if _is_selected(os.path.join(relative_root, file).replace('\\', '/'), spec, include_spec):
+                file_paths.append(os.path.join(root, file))
+
+    return file_paths
+
+def _resolve_subtrees(repo_path: str, subtrees: List[str]) -> List[str]:
+    """
+    Resolves subtree selectors to normalized paths relative to the repository root. Raises
+    ValueError for any selector that resolves outside it, e.g. through '..' or a symlink.
+    """
+    real_root = os.path.realpath(repo_path)
+    resolved = []
+    for subtree in subtrees:
+        real_path = os.path.realpath(os.path.join(real_root, subtree.strip('/')))
+        if os.path.commonpath([real_root, real_path]) != real_root:
+            raise ValueError(f"Subtree is outside the repository root: {subtree}")
+        resolved.append(os.path.relpath(real_path, real_root).replace('\\', '/'))
+    return resolved
 
-def write_snapshot_to_stdout(all_files: List[str], foundation_root: str, system_prompt: str or None):
+def process_repo(repo_path: str, global_ignore_patterns: List[str], use_git_index: bool = False,
+                 include_patterns: List[str] = None, exclude_patterns: List[str] = None, subtrees: List[str] = None) -> List[str]:
+    """
+    Walks a repository path and returns a sorted list of file paths, respecting all ignore files.
+    With use_git_index, files are enumerated from the git index instead, falling back to the walk
+    for directories that are not git repositories.
+
+    Selectors narrow the snapshot: exclude_patterns are treated like extra ignore patterns,
+    include_patterns keep only matching files, and subtrees restrict enumeration to the given
+    directories (relative to the repository root). All patterns use gitignore syntax. Raises
+    ValueError if a subtree resolves outside the repository.
+    """
+    if not os.path.isdir(repo_path):
+        return []
+
+    ignore_patterns = list(global_ignore_patterns) + list(exclude_patterns or [])
+    include_spec = _build_spec(include_patterns) if include_patterns else None
+    subtrees = _resolve_subtrees(repo_path, subtrees) if subtrees else None
+
+    if use_git_index:
+        git_files = list_git_files(repo_path, ignore_patterns, include_spec, subtrees)
+        if git_files is not None:
+            return _order_files(set(git_files))
+
+    walk_roots = [os.path.join(repo_path, s) for s in subtrees] if subtrees else [repo_path]
+    file_paths = set()
+    for walk_root in walk_roots:
+        if os.path.isdir(walk_root):
+            file_paths.update(_walk_files(repo_path, walk_root, ignore_patterns, include_spec))
+
+    return _order_files(file_paths)
+
+def process_file_list(file_list: List[str], foundation_root: str, global_ignore_patterns: List[str],
+                      include_patterns: List[str] = None, exclude_patterns: List[str] = None) -> List[str]:
+    """
+    Resolves an explicit list of file paths (absolute or relative to the foundation root) and
+    returns the existing, non-ignored files in snapshot order. Selectors are matched against
+    paths relative to the foundation root.
+    """
+    ignore_spec = _build_spec(list(global_ignore_patterns) + list(exclude_patterns or []))
+    include_spec = _build_spec(include_patterns) if include_patterns else None
+
+    file_paths = set()
+    for entry in file_list:
+        entry = entry.strip()
+        if not entry:
+            continue
+        file_path = os.path.normpath(entry if os.path.isabs(entry) else os.path.join(foundation_root, entry))
+        relative_path = os.path.relpath(file_path, foundation_root).replace('\\', '/')
+        if os.path.isfile(file_path) and _is_selected(relative_path, ignore_spec, include_spec):
+            file_paths.add(file_path)
+
+    return _order_files(file_paths)
+
+def read_file_content(file_path: str) -> Tuple[str, bool]:
+    """
+    Reads a file for inclusion in a snapshot. Returns the content and whether it is
+    real file content (False for binary or unreadable placeholders).
+    """
+    if is_binary_file(file_path):
+        return "[Binary file content suppressed]", False
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f_in:
+            return f_in.read(), True
+    except Exception as e:
+        return f"Error reading file: {e}", False
+
+class Deduplicator:
+    """Tracks content hashes so repeated files can be emitted as references to their first occurrence."""
+    def __init__(self):
+        self._seen: Dict[str, str] = {}
+
+    def reference_for(self, relative_path: str, content: str) -> str | None:
+        """Returns a duplicate reference if identical content was already emitted, otherwise records it."""
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        first_path = self._seen.get(digest)
+        if first_path is not None:
+            return f"[Duplicate of ./{first_path}]"
+        self._seen[digest] = relative_path
+        return None
+
+def _snapshot_content(file_path: str, relative_path: str, deduplicator: Deduplicator | None) -> str:
+    """Reads a file's snapshot content, replacing it with a duplicate reference when deduplicating."""
+    content, is_text = read_file_content(file_path)
+    if deduplicator is None or not is_text:
+        return content
+    return deduplicator.reference_for(relative_path, content) or content
+
+def write_snapshot_to_stdout(all_files: List[str], foundation_root: str, system_prompt: Optional[str], dedupe: bool = False):
     """Writes the final snapshot content to standard output in text format."""
     if system_prompt:
         print("=== SYSTEM PROMPT ===")
@@ -71,34 +208,19 @@ def write_snapshot_to_stdout(all_files: List[str], foundation_root: str, system_
         print("#                                CONTEXT SNAPSHOT START                              #")
         print("################################################################################\n")
     
+    deduplicator = Deduplicator() if dedupe else None
     for file_path in all_files:
         relative_path = os.path.relpath(file_path, foundation_root).replace('\\', '/')
         print(f"--- START OF FILE: ./{relative_path} ---")
-        
-        if is_binary_file(file_path):
-            print("[Binary file content suppressed]")
-        else:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                    print(f_in.read(), end='')
-            except Exception as e: 
-                print(f"Error reading file: {e}")
-
+        print(_snapshot_content(file_path, relative_path, deduplicator), end='')
         print("\n--- END OF FILE: ./{relative_path} ---\n")
 
-def write_json_snapshot_to_stdout(all_files: List[str], foundation_root: str):
+def write_json_snapshot_to_stdout(all_files: List[str], foundation_root: str, dedupe: bool = False):
     """Writes the final snapshot content to standard output in JSON format."""
     snapshot_data = {}
+    deduplicator = Deduplicator() if dedupe else None
     for file_path in all_files:
         relative_path = os.path.relpath(file_path, foundation_root).replace('\\', '/')
-        
-        if is_binary_file(file_path):
-            snapshot_data[relative_path] = "[Binary file content suppressed]"
-        else:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f_in:
-                    snapshot_data[relative_path] = f_in.read()
-            except Exception as e:
-                snapshot_data[relative_path] = f"Error reading file: {e}"
+        snapshot_data[relative_path] = _snapshot_content(file_path, relative_path, deduplicator)
     
     print(json.dumps(snapshot_data, indent=2))
@@ -2,8 +2,14 @@ import os
 import re
 import yaml
 
-def parse_codex_snapshot(snapshot_content: str) -> dict:
-    """Parses the full codex snapshot into a dictionary of file paths and content."""
+DUPLICATE_REFERENCE_PATTERN = re.compile(r'^\[Duplicate of (.+)\]$')
+
+def parse_codex_snapshot(snapshot_content: str, expand_duplicates: bool = False) -> dict:
+    """
+    Parses the full codex snapshot into a dictionary of file paths and content.
+    If expand_duplicates is set, '[Duplicate of ./path]' references emitted by
+    'sigma --dedupe' are replaced with the content of the referenced file.
+    """
     codex_files = {}
     # Split the entire snapshot by the 'START OF FILE' marker
     # The first item will be empty, so we skip it [1:].
@@ -20,6 +26,12 @@ def parse_codex_snapshot(snapshot_content: str) -> dict:
         # For each content block, split it by the 'END OF FILE' marker and take the first part
         content = file_contents[i].split('--- END OF FILE:')[0].strip()
         codex_files[path.strip()] = content
+
+    if expand_duplicates:
+        for path, content in codex_files.items():
+            match = DUPLICATE_REFERENCE_PATTERN.match(content)
+            if match and match.group(1) in codex_files:
+                codex_files[path] = codex_files[match.group(1)]
         
     return codex_files
 
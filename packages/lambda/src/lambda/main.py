@@ -21,6 +21,7 @@ def main():
     parser.add_argument('-o', '--output-format', choices=['text', 'json'], default='text', help="Output format.")
     parser.add_argument('-v', '--verbose', action='store_true', help="Enable verbose output.")
     parser.add_argument('--auto-fix', action='store_true', help="Generate a delta manifest to fix simple violations.")
+    parser.add_argument('--expand-duplicates', action='store_true', help="Expand '[Duplicate of ...]' references from a deduplicated snapshot.")
     parser.add_argument('--help', action='help', help='Show this help message and exit')
     args = parser.parse_args()
 
@@ -45,7 +46,7 @@ def main():
         entities_config = load_yaml_config(args.entities)
         sovereign_entities = entities_config.get('sovereign_entities', [])
         
-        codex_files = parse_codex_snapshot(snapshot_content)
+        codex_files = parse_codex_snapshot(snapshot_content, args.expand_duplicates)
         
         all_violations = []
         for file_path, file_content in codex_files.items():
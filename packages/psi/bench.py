@@ -0,0 +1,69 @@
+# --- Psi: Benchmark Harness ---
+# Drives many requests through psi.client at a fixed concurrency and summarizes latency,
+# throughput and cache behaviour. Pair it with the 'replay' provider or the stand-in
+# server to measure psi's own overhead without spending API quota.
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from . import client
+
+BENCH_SYSTEM_PROMPT = "You are a benchmark oracle. Repeat the content back verbatim."
+
+def build_requests(count: int, unique: int, model_name: str, content_bytes: int = 256, no_cache: bool = False) -> List[dict]:
+    """Builds count requests that cycle through `unique` distinct contents of roughly content_bytes each."""
+    unique = max(1, min(unique, count))
+    requests = []
+    for index in range(count):
+        prefix = f"benchmark request {index % unique}: "
+        requests.append({
+            "content": prefix + "x" * max(0, content_bytes - len(prefix)),
+            "system_prompt": BENCH_SYSTEM_PROMPT,
+            "model_name": model_name,
+            "no_cache": no_cache,
+            "prompt_file_path": "bench",
+        })
+    return requests
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent * len(sorted_values) / 100.0))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def _timed_call(request: dict) -> tuple:
+    """Runs one request through the client. Returns (result, seconds)."""
+    started = time.perf_counter()
+    result = client.get_oracle_response(**request)
+    return result, time.perf_counter() - started
+
+def run_benchmark(requests: List[dict], concurrency: int) -> Dict[str, object]:
+    """Runs the requests with `concurrency` worker threads and returns the summary statistics."""
+    latencies, hits, errors = [], 0, 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for result, seconds in executor.map(_timed_call, requests):
+            latencies.append(seconds)
+            if result.get('error'):
+                errors += 1
+            elif result.get('__cache_hit__'):
+                hits += 1
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "errors": errors,
+        "cache_hit_ratio": hits / len(requests) if requests else 0.0,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(requests) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 50) * 1000,
+            "p95": _percentile(latencies, 95) * 1000,
+            "p99": _percentile(latencies, 99) * 1000,
+            "max": (latencies[-1] if latencies else 0.0) * 1000,
+        },
+    }
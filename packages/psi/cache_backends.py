@@ -0,0 +1,528 @@
+# --- Psi: Cache Storage Backends ---
+# Backends store raw cache entries by key. Expiry and schema checks live in cache_manager.
+import os
+import json
+import zlib
+import time
+import sqlite3
+import threading
+import urllib.parse
+from collections import Counter
+from typing import Dict, Any, Iterator, Tuple
+
+# Prompts stored more recently than this are never pruned as orphans. A prompt is stored just
+# before the entry that refers to it, so a prune running in between, in this or another
+# process, would otherwise remove it and leave the new entry pointing at nothing.
+PROMPT_GRACE_SECONDS = 10 * 60
+
+class FileCacheBackend:
+    """
+    The original layout: one pretty-printed JSON file per key under <cache_dir>/<2-hex>/<key>.
+    System prompts are stored once each as plain text under <cache_dir>/prompts/<sha256>.
+    """
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.prompts_dir = os.path.join(cache_dir, 'prompts')
+        self.prompt_grace_seconds = PROMPT_GRACE_SECONDS
+
+    def _get_cache_path(self, key: str) -> str:
+        """Constructs the full file path for a given cache key."""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def read(self, key: str) -> Dict[str, Any] | None:
+        """Reads the raw entry for a key, or None if it is missing or unreadable."""
+        path = self._get_cache_path(key)
+        if not os.path.exists(path):
+            return None
+        entry = self._load(path)
+        if entry is not None:
+            try:
+                os.utime(path) # The modification time doubles as the last access time for eviction.
+            except OSError:
+                pass
+        return entry
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Any] | None:
+        """Parses a cache file without marking it as accessed."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return None
+
+    def write(self, key: str, entry: Dict[str, Any]):
+        """Writes the raw entry for a key."""
+        path = self._get_cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, indent=2)
+        except IOError:
+            pass
+
+    def delete(self, key: str):
+        """Removes the entry for a key if present."""
+        try:
+            os.remove(self._get_cache_path(key))
+        except OSError:
+            pass
+
+    def write_prompt(self, prompt_hash: str, system_prompt: str):
+        """
+        Stores a system prompt under its hash unless it is already stored. An existing file
+        has its modification time refreshed, so prune's grace period covers it.
+        """
+        path = os.path.join(self.prompts_dir, prompt_hash)
+        try:
+            os.utime(path)
+            return
+        except OSError:
+            pass
+        try:
+            os.makedirs(self.prompts_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(system_prompt)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def read_prompt(self, prompt_hash: str) -> str | None:
+        """Returns the system prompt stored under a hash, or None."""
+        try:
+            with open(os.path.join(self.prompts_dir, prompt_hash), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def iter_prompts(self) -> Iterator[Tuple[str, str]]:
+        """Yields (hash, system_prompt) for every stored prompt."""
+        if not os.path.isdir(self.prompts_dir):
+            return
+        for prompt_hash in sorted(os.listdir(self.prompts_dir)):
+            system_prompt = self.read_prompt(prompt_hash)
+            if system_prompt is not None:
+                yield prompt_hash, system_prompt
+
+    def _scan_prompts(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Yields (hash, path, stat) for every stored prompt without reading it."""
+        if not os.path.isdir(self.prompts_dir):
+            return
+        for prompt_hash in os.listdir(self.prompts_dir):
+            path = os.path.join(self.prompts_dir, prompt_hash)
+            try:
+                yield prompt_hash, path, os.stat(path)
+            except OSError:
+                continue
+
+    def _remove_orphaned_prompts(self, referenced: set, grace_seconds: float = 0):
+        """Removes stored prompts that no remaining entry refers to and that are older than grace_seconds."""
+        cutoff = time.time() - grace_seconds
+        for prompt_hash, path, stat in list(self._scan_prompts()):
+            if prompt_hash not in referenced and (not grace_seconds or stat.st_mtime < cutoff):
+                self._remove_path(path)
+
+    def iter_entries(self) -> Iterator[Tuple[str, Dict[str, Any] | None]]:
+        """Yields (key, entry) for every stored file. Unreadable files yield None as the entry."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in sorted(os.listdir(self.cache_dir)):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for key in sorted(os.listdir(shard_dir)):
+                yield key, self._load(os.path.join(shard_dir, key))
+
+    def _scan(self) -> Iterator[Tuple[str, str, os.stat_result]]:
+        """Yields (key, path, stat) for every stored file without reading it."""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, key)
+                try:
+                    yield key, path, os.stat(path)
+                except OSError:
+                    continue
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the entry and prompt counts and the total size of the cache, prompts included."""
+        sizes = [stat.st_size for _, _, stat in self._scan()]
+        prompt_sizes = [stat.st_size for _, _, stat in self._scan_prompts()]
+        return {"backend": "file", "location": self.cache_dir, "entries": len(sizes), "bytes": sum(sizes) + sum(prompt_sizes),
+                "prompts": len(prompt_sizes), "prompt_bytes": sum(prompt_sizes)}
+
+    def prune(self, ttl_seconds: float, max_bytes: int, schema_version: str) -> Dict[str, int]:
+        """
+        Removes expired, outdated and unreadable entries, then evicts the least recently
+        used entries until the cache, stored prompts included, fits within max_bytes. A
+        prompt's bytes are freed along with the last entry that refers to it.
+        """
+        cutoff = time.time() - ttl_seconds
+        expired, survivors = 0, []
+        for _, path, stat in self._scan():
+            # A file untouched since the cutoff cannot hold an entry written after it.
+            entry = self._load(path) if stat.st_mtime >= cutoff else None
+            if entry is None or entry.get('cache_schema_version') != schema_version or entry.get('timestamp', 0) < cutoff:
+                self._remove_path(path)
+                expired += 1
+            else:
+                survivors.append((stat.st_mtime, stat.st_size, path, entry.get('prompt_hash')))
+
+        references = Counter(prompt_hash for *_, prompt_hash in survivors if prompt_hash)
+        grace_cutoff = time.time() - self.prompt_grace_seconds
+        prompt_sizes, total_bytes = {}, sum(size for _, size, _, _ in survivors)
+        for prompt_hash, _, stat in self._scan_prompts():
+            # Orphans past the grace period are removed below, so only the rest count against the budget.
+            if prompt_hash in references or stat.st_mtime >= grace_cutoff:
+                prompt_sizes[prompt_hash] = stat.st_size
+                total_bytes += stat.st_size
+
+        evicted = 0
+        referenced = set()
+        for _, size, path, prompt_hash in sorted(survivors):
+            if total_bytes <= max_bytes:
+                referenced.add(prompt_hash)
+                continue
+            self._remove_path(path)
+            total_bytes -= size
+            evicted += 1
+            if prompt_hash in references:
+                references[prompt_hash] -= 1
+                if references[prompt_hash] == 0:
+                    total_bytes -= prompt_sizes.get(prompt_hash, 0)
+        self._remove_orphaned_prompts(referenced, self.prompt_grace_seconds)
+        return {"expired": expired, "evicted": evicted}
+
+    def clear(self) -> int:
+        """Removes every entry. Returns the number removed."""
+        removed = 0
+        for _, path, _ in list(self._scan()):
+            self._remove_path(path)
+            removed += 1
+        self._remove_orphaned_prompts(set())
+        return removed
+
+    @staticmethod
+    def _remove_path(path: str):
+        """Removes a cache file, ignoring races with other processes."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    schema_version TEXT NOT NULL,
+    model_name TEXT,
+    prompt_identifier TEXT,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    prompt_hash TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entries_created_at ON entries(created_at);
+CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+CREATE TABLE IF NOT EXISTS prompts (
+    hash TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+class SQLiteCacheBackend:
+    """
+    A single-file cache store. Responses are stored as zlib-compressed compact JSON next to
+    indexed timestamp columns. WAL mode lets many processes read while one writes. System
+    prompts are stored once each in a content-addressed prompts table that entries reference.
+    """
+    # Reads only refresh last_access when it is older than this, so hot keys don't turn every read into a write.
+    ACCESS_RESOLUTION_SECONDS = 60
+
+    def __init__(self, db_path: str, busy_timeout_seconds: float = 30.0):
+        self.db_path = db_path
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self.prompt_grace_seconds = PROMPT_GRACE_SECONDS
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_seconds, isolation_level=None)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL") # Only takes effect when the database is created.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._add_prompt_hash_column(conn)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _add_prompt_hash_column(conn: sqlite3.Connection):
+        """Upgrades stores created before entries referenced their prompt."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        if 'prompt_hash' not in columns:
+            try:
+                conn.execute("ALTER TABLE entries ADD COLUMN prompt_hash TEXT")
+            except sqlite3.OperationalError:
+                pass # Another process upgraded it first.
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> bytes:
+        """Compresses an entry's response as compact JSON."""
+        return zlib.compress(json.dumps(entry.get('response', {}), separators=(',', ':')).encode('utf-8'))
+
+    def read(self, key: str) -> Dict[str, Any] | None:
+        """Reads the raw entry for a key, or None if it is missing or unreadable."""
+        try:
+            row = self._connect().execute(
+                "SELECT schema_version, model_name, prompt_identifier, created_at, payload, prompt_hash FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = self._decode_row(*row)
+            self._touch(key)
+        except (sqlite3.Error, zlib.error, json.JSONDecodeError):
+            return None
+        return entry
+
+    @staticmethod
+    def _decode_row(schema_version, model_name, prompt_identifier, created_at, payload, prompt_hash) -> Dict[str, Any]:
+        """Rebuilds a raw entry from its stored columns."""
+        return {
+            "cache_schema_version": schema_version,
+            "prompt_identifier": prompt_identifier,
+            "prompt_hash": prompt_hash,
+            "timestamp": created_at,
+            "model_name": model_name,
+            "response": json.loads(zlib.decompress(payload))
+        }
+
+    def _touch(self, key: str):
+        """Refreshes an entry's last access time, at most once per ACCESS_RESOLUTION_SECONDS."""
+        now = time.time()
+        self._connect().execute(
+            "UPDATE entries SET last_access = ? WHERE key = ? AND last_access < ?", (now, key, now - self.ACCESS_RESOLUTION_SECONDS)
+        )
+
+    def write(self, key: str, entry: Dict[str, Any]):
+        """Writes the raw entry for a key, replacing any existing row."""
+        payload = self._encode(entry)
+        timestamp = entry.get('timestamp', 0)
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO entries (key, schema_version, model_name, prompt_identifier, created_at, last_access, size, payload, prompt_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.get('cache_schema_version'), entry.get('model_name'), entry.get('prompt_identifier'), timestamp, timestamp, len(payload), payload, entry.get('prompt_hash'))
+            )
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key: str):
+        """Removes the entry for a key if present."""
+        try:
+            self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def write_prompt(self, prompt_hash: str, system_prompt: str):
+        """
+        Stores a system prompt under its hash unless it is already stored. An existing row
+        has created_at refreshed (at most once per ACCESS_RESOLUTION_SECONDS), so prune's
+        grace period covers it.
+        """
+        payload = zlib.compress(system_prompt.encode('utf-8'))
+        try:
+            self._connect().execute(
+                "INSERT INTO prompts (hash, created_at, size, payload) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET created_at = excluded.created_at WHERE prompts.created_at < excluded.created_at - ?",
+                (prompt_hash, time.time(), len(payload), payload, self.ACCESS_RESOLUTION_SECONDS)
+            )
+        except sqlite3.Error:
+            pass
+
+    def read_prompt(self, prompt_hash: str) -> str | None:
+        """Returns the system prompt stored under a hash, or None."""
+        try:
+            row = self._connect().execute("SELECT payload FROM prompts WHERE hash = ?", (prompt_hash,)).fetchone()
+            return zlib.decompress(row[0]).decode('utf-8') if row else None
+        except (sqlite3.Error, zlib.error):
+            return None
+
+    def iter_entries(self) -> Iterator[Tuple[str, Dict[str, Any] | None]]:
+        """Yields (key, entry) for every stored row. Unreadable rows yield None as the entry."""
+        rows = self._connect().execute(
+            "SELECT key, schema_version, model_name, prompt_identifier, created_at, payload, prompt_hash FROM entries ORDER BY key"
+        )
+        for key, *columns in rows:
+            try:
+                yield key, self._decode_row(*columns)
+            except (zlib.error, json.JSONDecodeError):
+                yield key, None
+
+    def iter_prompts(self) -> Iterator[Tuple[str, str]]:
+        """Yields (hash, system_prompt) for every stored prompt."""
+        for prompt_hash, payload in self._connect().execute("SELECT hash, payload FROM prompts ORDER BY hash"):
+            try:
+                yield prompt_hash, zlib.decompress(payload).decode('utf-8')
+            except zlib.error:
+                continue
+
+    def import_prompts(self, prompts: Iterator[Tuple[str, str]]) -> int:
+        """Bulk-imports (hash, system_prompt) pairs in one transaction, keeping existing hashes. Returns the count imported."""
+        now = time.time()
+        rows = []
+        for prompt_hash, system_prompt in prompts:
+            payload = zlib.compress(system_prompt.encode('utf-8'))
+            rows.append((prompt_hash, now, len(payload), payload))
+        conn = self._connect()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("INSERT OR IGNORE INTO prompts (hash, created_at, size, payload) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def seal(self):
+        """
+        Leaves WAL mode, compacts the store and closes this thread's connection, so the
+        database is one self-contained file that can be copied and opened read-only.
+        """
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("VACUUM")
+        self.close()
+
+    def close(self):
+        """Closes this thread's connection, if open. The next call reopens it."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def import_entries(self, entries: Iterator[Tuple[str, Dict[str, Any] | None]]) -> int:
+        """Bulk-imports (key, entry) pairs in one transaction, keeping existing keys. Returns the count imported."""
+        rows = []
+        for key, entry in entries:
+            if not entry or 'response' not in entry:
+                continue
+            payload = self._encode(entry)
+            timestamp = entry.get('timestamp', 0)
+            rows.append((key, entry.get('cache_schema_version', ''), entry.get('model_name'), entry.get('prompt_identifier'), timestamp, timestamp, len(payload), payload, entry.get('prompt_hash')))
+
+        conn = self._connect()
+        before = conn.total_changes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (key, schema_version, model_name, prompt_identifier, created_at, last_access, size, payload, prompt_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        return conn.total_changes - before
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the entry count, payload size and on-disk size of the store."""
+        conn = self._connect()
+        entries, payload_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        prompts, prompt_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM prompts").fetchone()
+        file_bytes = sum(os.path.getsize(p) for p in (self.db_path, self.db_path + "-wal") if os.path.exists(p))
+        return {"backend": "sqlite", "location": self.db_path, "entries": entries, "bytes": payload_bytes + prompt_bytes,
+                "prompts": prompts, "prompt_bytes": prompt_bytes, "file_bytes": file_bytes}
+
+    def prune(self, ttl_seconds: float, max_bytes: int, schema_version: str) -> Dict[str, int]:
+        """
+        Removes expired and outdated entries, then evicts the least recently used entries
+        until the stored payloads and prompts fit within max_bytes. A prompt's bytes are
+        freed along with the last entry that refers to it.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute(
+                "DELETE FROM entries WHERE created_at < ? OR schema_version != ?", (time.time() - ttl_seconds, schema_version)
+            ).rowcount
+            self._delete_orphaned_prompts(conn)
+
+            excess = (conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                      + conn.execute("SELECT COALESCE(SUM(size), 0) FROM prompts").fetchone()[0] - max_bytes)
+            victims = []
+            if excess > 0:
+                references = dict(conn.execute("SELECT prompt_hash, COUNT(*) FROM entries WHERE prompt_hash IS NOT NULL GROUP BY prompt_hash"))
+                prompt_sizes = dict(conn.execute("SELECT hash, size FROM prompts"))
+                for key, size, prompt_hash in conn.execute("SELECT key, size, prompt_hash FROM entries ORDER BY last_access"):
+                    if excess <= 0:
+                        break
+                    victims.append((key,))
+                    excess -= size
+                    if prompt_hash in references:
+                        references[prompt_hash] -= 1
+                        if references[prompt_hash] == 0:
+                            excess -= prompt_sizes.get(prompt_hash, 0)
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                self._delete_orphaned_prompts(conn)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return {"expired": expired, "evicted": len(victims)}
+
+    def _delete_orphaned_prompts(self, conn: sqlite3.Connection):
+        """Deletes prompts no entry refers to, except those stored within the grace period."""
+        conn.execute(
+            "DELETE FROM prompts WHERE created_at < ? AND hash NOT IN (SELECT prompt_hash FROM entries WHERE prompt_hash IS NOT NULL)",
+            (time.time() - self.prompt_grace_seconds,)
+        )
+
+    def clear(self) -> int:
+        """Removes every entry. Returns the number removed."""
+        conn = self._connect()
+        removed = conn.execute("DELETE FROM entries").rowcount
+        conn.execute("DELETE FROM prompts")
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        return removed
+
+class SQLiteBundleBackend(SQLiteCacheBackend):
+    """
+    A sealed SQLite store opened read-only, used as a lower cache tier. The file is opened
+    as immutable, so it can live on a read-only mount and is never locked or written.
+    """
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's read-only connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        uri = "file:" + urllib.parse.quote(os.path.abspath(self.db_path)) + "?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, isolation_level=None)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _touch(self, key: str):
+        """Bundles don't track access."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the entry and prompt counts of the bundle."""
+        conn = self._connect()
+        entries, payload_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        prompts = conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0]
+        return {"backend": "bundle", "location": self.db_path, "entries": entries, "bytes": payload_bytes,
+                "prompts": prompts, "file_bytes": os.path.getsize(self.db_path)}
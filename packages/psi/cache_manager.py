@@ -1,77 +1,327 @@
 # --- Psi: Cache Manager ---
 import os
-import json
+import re
+import glob
+import shutil
 import hashlib
 import time
-from typing import Dict, Any
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List
+
+from .cache_backends import FileCacheBackend, SQLiteBundleBackend, SQLiteCacheBackend
 
 # --- Configuration ---
 CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'psi')
 CACHE_TTL_SECONDS = 60 * 60 * 24 * 7 # 7 days
-CACHE_SCHEMA_VERSION = "1.1"
+CACHE_SCHEMA_VERSION = "1.2"
+CACHE_BACKEND = os.environ.get("PSI_CACHE_BACKEND", "sqlite") # 'sqlite' or 'file'
+CACHE_DB_FILENAME = "cache.sqlite3"
+CACHE_MAX_BYTES = int(os.environ.get("PSI_CACHE_MAX_BYTES", 512 * 1024 * 1024)) # 512 MiB
+# Chance that a write triggers an opportunistic prune, amortizing sweeps across writes and processes.
+CACHE_SWEEP_PROBABILITY = float(os.environ.get("PSI_CACHE_SWEEP_PROBABILITY", 0.01))
+# Opt-in: ignore trailing spaces and runs of blank lines in system prompts when keying the cache.
+NORMALIZE_PROMPT_WHITESPACE = os.environ.get("PSI_NORMALIZE_PROMPT_WHITESPACE") == "1"
+# Read-only bundles consulted after the local store: <CACHE_DIR>/bundles plus any files or
+# directories listed in PSI_CACHE_BUNDLES (separated by os.pathsep).
+CACHE_BUNDLES = [p for p in os.environ.get("PSI_CACHE_BUNDLES", "").split(os.pathsep) if p]
+BUNDLES_DIRNAME = "bundles"
+BUNDLE_SUFFIX = ".psibundle"
+
+_backend = None
+_bundles = None
+_backend_lock = threading.Lock()
+
+# Recently computed prompt hashes, keyed by the prompt's built-in hash and length rather than
+# the prompt itself, so multi-megabyte prompts are not kept alive for the life of the process.
+PROMPT_HASH_MEMO_SIZE = 64
+_prompt_hashes = OrderedDict()
+_prompt_hashes_lock = threading.Lock()
 
 # --- Internal Functions ---
 
+def _normalize_prompt(system_prompt: str) -> str:
+    """Strips trailing whitespace from each line and collapses runs of blank lines."""
+    lines = [line.rstrip() for line in system_prompt.strip().splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', "\n".join(lines))
+
+def _digest_prompt(system_prompt: str, normalize: bool) -> str:
+    """Computes the SHA-256 content address of a system prompt."""
+    if normalize:
+        system_prompt = _normalize_prompt(system_prompt)
+    return hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+
+def _hash_prompt(system_prompt: str, normalize: bool) -> str:
+    """
+    Hashes a system prompt. Memoized, since callers send the same large prompt many times.
+    Python caches a string's built-in hash on the object, so a repeat call with the same
+    prompt object costs O(1) and the memo never holds the prompt text.
+    """
+    memo_key = (hash(system_prompt), len(system_prompt), normalize)
+    with _prompt_hashes_lock:
+        digest = _prompt_hashes.get(memo_key)
+        if digest is not None:
+            _prompt_hashes.move_to_end(memo_key)
+            return digest
+    digest = _digest_prompt(system_prompt, normalize)
+    with _prompt_hashes_lock:
+        _prompt_hashes[memo_key] = digest
+        while len(_prompt_hashes) > PROMPT_HASH_MEMO_SIZE:
+            _prompt_hashes.popitem(last=False)
+    return digest
+
 def _get_cache_key(content: str, system_prompt: str, model_name: str) -> str:
-    """Generates a consistent SHA-256 hash for the request."""
-    payload = f"{content}|{system_prompt}|{model_name}"
+    """Generates a consistent SHA-256 hash for the request, referencing the system prompt by its hash."""
+    payload = f"{content}|{get_prompt_hash(system_prompt)}|{model_name}"
     return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
-def _get_cache_path(key: str) -> str:
-    """Constructs the full file path for a given cache key."""
-    return os.path.join(CACHE_DIR, key[:2], key)
+def _current_file_entries(cache_dir: str):
+    """
+    Yields the per-file entries written under the current schema. Entries from older schemas
+    were keyed differently and can't be looked up again, so they are not imported.
+    """
+    for key, entry in FileCacheBackend(cache_dir).iter_entries():
+        if entry and entry.get("cache_schema_version") == CACHE_SCHEMA_VERSION:
+            yield key, entry
+
+def _create_backend():
+    """Creates the configured backend. A new SQLite store imports any current-schema per-file entries."""
+    if CACHE_BACKEND == "file":
+        return FileCacheBackend(CACHE_DIR)
+
+    db_path = os.path.join(CACHE_DIR, CACHE_DB_FILENAME)
+    is_new_store = not os.path.exists(db_path)
+    backend = SQLiteCacheBackend(db_path)
+    if is_new_store:
+        try:
+            backend.import_entries(_current_file_entries(CACHE_DIR))
+        except Exception:
+            pass # Migration is best-effort; the store itself is still usable.
+    return backend
+
+def _get_backend():
+    """Returns the process-wide cache backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_backend()
+    return _backend
+
+def _find_bundles() -> List[str]:
+    """Lists bundle files from the local bundles directory and PSI_CACHE_BUNDLES, in lookup order."""
+    paths = []
+    for location in [os.path.join(CACHE_DIR, BUNDLES_DIRNAME)] + CACHE_BUNDLES:
+        if os.path.isdir(location):
+            paths.extend(sorted(glob.glob(os.path.join(location, f"*{BUNDLE_SUFFIX}"))))
+        elif os.path.isfile(location):
+            paths.append(location)
+    return list(dict.fromkeys(os.path.abspath(p) for p in paths))
+
+def _get_bundles() -> List[SQLiteBundleBackend]:
+    """Returns the mounted read-only bundles, discovering them on first use."""
+    global _bundles
+    if _bundles is None:
+        with _backend_lock:
+            if _bundles is None:
+                _bundles = [SQLiteBundleBackend(path) for path in _find_bundles()]
+    return _bundles
+
+def _file_digest(path: str) -> str:
+    """Returns the SHA-256 of a file's bytes, which names a bundle by its content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _is_expired(cached_data: Dict[str, Any]) -> bool:
+    """Checks whether a cache entry is older than the TTL."""
+    return (time.time() - cached_data.get('timestamp', 0)) > CACHE_TTL_SECONDS
 
 # --- Public API ---
 
-def get_cached_response(content: str, system_prompt: str, model_name: str) -> Dict[str, Any] | None:
+def set_cache_dir(cache_dir: str):
+    """Points the cache at another directory, e.g. a scratch cache for benchmarks."""
+    global CACHE_DIR, _backend, _bundles
+    with _backend_lock:
+        CACHE_DIR = cache_dir
+        _backend = None
+        _bundles = None
+
+def get_prompt_hash(system_prompt: str) -> str:
+    """Returns the content address of a system prompt."""
+    return _hash_prompt(system_prompt, NORMALIZE_PROMPT_WHITESPACE)
+
+def store_prompt(system_prompt: str) -> str:
+    """Stores a system prompt once under its content address. Returns the address."""
+    prompt_hash = get_prompt_hash(system_prompt)
+    _get_backend().write_prompt(prompt_hash, system_prompt)
+    return prompt_hash
+
+def get_prompt(prompt_hash: str) -> str | None:
+    """Returns the stored system prompt for a content address, checking the local store, then the bundles."""
+    system_prompt = _get_backend().read_prompt(prompt_hash)
+    if system_prompt is None:
+        for bundle in _get_bundles():
+            system_prompt = bundle.read_prompt(prompt_hash)
+            if system_prompt is not None:
+                break
+    return system_prompt
+
+def is_entry_valid(cached_data: Dict[str, Any]) -> bool:
+    """Checks that a cache entry matches the current schema version and has not expired."""
+    return cached_data.get("cache_schema_version") == CACHE_SCHEMA_VERSION and not _is_expired(cached_data)
+
+def read_entry(key: str) -> Dict[str, Any] | None:
     """
-    Retrieves a cached response if it exists and is not expired.
-    Returns a reconstructed dictionary that mimics a live response.
+    Reads the raw cache entry for a key, removing it if it has expired. Local misses fall
+    through to the read-only bundles, whose entries are used as they are and never copied.
     """
-    key = _get_cache_key(content, system_prompt, model_name)
-    path = _get_cache_path(key)
+    backend = _get_backend()
+    cached_data = backend.read(key)
+    if cached_data is not None and cached_data.get("cache_schema_version") == CACHE_SCHEMA_VERSION:
+        if not _is_expired(cached_data):
+            return cached_data
+        backend.delete(key)
 
-    if not os.path.exists(path):
-        return None
+    for bundle in _get_bundles():
+        cached_data = bundle.read(key)
+        if cached_data is not None and is_entry_valid(cached_data):
+            return cached_data
+    return None
 
+def write_entry(key: str, cache_data: Dict[str, Any]):
+    """Writes a raw cache entry for a key, occasionally sweeping the cache afterwards."""
+    _get_backend().write(key, cache_data)
+    if random.random() < CACHE_SWEEP_PROBABILITY:
+        try:
+            prune_cache()
+        except Exception:
+            pass # A failed sweep must never fail the write; the next one will retry.
+
+def prune_cache(max_bytes: int = None) -> Dict[str, int]:
+    """
+    Removes expired, outdated and unreadable entries, then evicts the least recently used
+    entries until the cache fits within max_bytes (default CACHE_MAX_BYTES).
+    """
+    return _get_backend().prune(CACHE_TTL_SECONDS, CACHE_MAX_BYTES if max_bytes is None else max_bytes, CACHE_SCHEMA_VERSION)
+
+def clear_cache() -> int:
+    """Removes every cache entry. Returns the number removed."""
+    return _get_backend().clear()
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Returns the backend's entry count and size along with the configured limits."""
+    stats = _get_backend().stats()
+    stats["max_bytes"] = CACHE_MAX_BYTES
+    stats["ttl_seconds"] = CACHE_TTL_SECONDS
+    stats["bundles"] = [_bundle_stats(b) for b in _get_bundles()]
+    return stats
+
+def _bundle_stats(bundle: SQLiteBundleBackend) -> Dict[str, Any]:
+    """Summarizes one bundle. A bundle that can't be read is reported as unavailable rather than failing the stats."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            cached_data = json.load(f)
-        
-        if cached_data.get("cache_schema_version") != CACHE_SCHEMA_VERSION:
-            return None
-
-        if (time.time() - cached_data.get('timestamp', 0)) > CACHE_TTL_SECONDS:
-            os.remove(path)
-            return None
-            
-        # Reconstruct the result object to match the live call structure
-        result = cached_data.get('response', {})
-        result['__cache_hit__'] = True
-        result['provider_used'] = cached_data.get('response', {}).get('provider_used')
-        result['model_name'] = cached_data.get('model_name')
-        return result
-
-    except (json.JSONDecodeError, IOError):
-        return None
+        return {"location": bundle.db_path, "entries": bundle.stats()["entries"]}
+    except (sqlite3.Error, OSError) as e:
+        return {"location": bundle.db_path, "entries": None, "error": str(e)}
+
+def export_bundle(destination: str = ".") -> Dict[str, Any]:
+    """
+    Writes every live entry and the prompts they reference to a sealed, compressed SQLite
+    bundle. If destination is a directory, the bundle is named by its content digest.
+    """
+    backend = _get_backend()
+    entries = [(key, entry) for key, entry in backend.iter_entries() if entry and is_entry_valid(entry)]
+    referenced = {entry.get('prompt_hash') for _, entry in entries} - {None}
+
+    directory = destination if os.path.isdir(destination) else os.path.dirname(os.path.abspath(destination))
+    tmp_path = os.path.join(directory, f".psi-bundle.{os.getpid()}.tmp")
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    bundle = SQLiteCacheBackend(tmp_path)
+    try:
+        bundle.import_entries(entries)
+        prompts = bundle.import_prompts((h, p) for h, p in ((h, backend.read_prompt(h)) for h in sorted(referenced)) if p is not None)
+        bundle.seal()
+
+        digest = _file_digest(tmp_path)
+        path = os.path.join(destination, f"{digest[:16]}{BUNDLE_SUFFIX}") if os.path.isdir(destination) else destination
+        os.replace(tmp_path, path)
+    finally:
+        bundle.close()
+        for leftover in (tmp_path, tmp_path + "-wal", tmp_path + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return {"path": path, "digest": digest, "entries": len(entries), "prompts": prompts, "bytes": os.path.getsize(path)}
 
-def set_cached_response(content: str, system_prompt: str, model_name: str, response: Dict[str, Any], prompt_file_path: str):
-    """Saves a response to the cache with extra metadata."""
-    key = _get_cache_key(content, system_prompt, model_name)
-    path = _get_cache_path(key)
+def import_bundle(source: str) -> Dict[str, Any]:
+    """
+    Installs a bundle into <CACHE_DIR>/bundles, where it is mounted as a read-only lower
+    tier. Bundles are named by content digest, so importing the same bundle twice is a no-op.
+    """
+    global _bundles
+    entries = SQLiteBundleBackend(source).stats()["entries"] # Fails early on files that aren't bundles.
+    digest = _file_digest(source)
+    bundles_dir = os.path.join(CACHE_DIR, BUNDLES_DIRNAME)
+    path = os.path.join(bundles_dir, f"{digest[:16]}{BUNDLE_SUFFIX}")
+    installed = not os.path.exists(path)
+    if installed:
+        os.makedirs(bundles_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    with _backend_lock:
+        _bundles = None
+    return {"path": path, "digest": digest, "entries": entries, "installed": installed}
 
-    os.makedirs(os.path.dirname(path), exist_ok=True)
+def migrate_file_cache(source_dir: str = None) -> int:
+    """
+    Imports one-file-per-key entries written under the current schema into the SQLite store,
+    keeping existing keys. Returns the number of entries imported.
+    """
+    backend = _get_backend()
+    if not isinstance(backend, SQLiteCacheBackend):
+        return 0
+    return backend.import_entries(_current_file_entries(source_dir or CACHE_DIR))
 
-    cache_data = {
+def make_entry(model_name: str, response: Dict[str, Any], prompt_file_path: str, prompt_hash: str = None) -> Dict[str, Any]:
+    """Builds a cache entry for a response with extra metadata. The prompt is referenced by its hash."""
+    return {
         "cache_schema_version": CACHE_SCHEMA_VERSION,
         "prompt_identifier": prompt_file_path,
+        "prompt_hash": prompt_hash,
         'timestamp': time.time(),
         'model_name': model_name,
         'response': response
     }
 
-    try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=2)
-    except IOError:
-        pass
+def entry_to_response(cached_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reconstructs a result dictionary that mimics a live response from a cache entry."""
+    result = dict(cached_data.get('response', {}))
+    result['__cache_hit__'] = True
+    result['provider_used'] = cached_data.get('response', {}).get('provider_used')
+    result['model_name'] = cached_data.get('model_name')
+    return result
+
+def get_cached_response(content: str, system_prompt: str, model_name: str) -> Dict[str, Any] | None:
+    """
+    Retrieves a cached response if it exists and is not expired.
+    Returns a reconstructed dictionary that mimics a live response.
+    """
+    cached_data = read_entry(_get_cache_key(content, system_prompt, model_name))
+    if cached_data is None:
+        return None
+    return entry_to_response(cached_data)
+
+def set_cached_response(content: str, system_prompt: str, model_name: str, response: Dict[str, Any], prompt_file_path: str) -> Dict[str, Any]:
+    """Saves a response to the cache with extra metadata. Returns the stored entry."""
+    cache_data = make_entry(model_name, response, prompt_file_path, store_prompt(system_prompt))
+    write_entry(_get_cache_key(content, system_prompt, model_name), cache_data)
+    return cache_data
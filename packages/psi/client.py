@@ -1,49 +1,226 @@
 # --- Psi: Oracle Client ---
 import os
 import sys
+import json
 import yaml
+import time
+import asyncio
+import hashlib
+import importlib
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pydantic import BaseModel
-from typing import Type
+from typing import Iterable, Iterator, List, Type
 
-from .providers import google, local
 from . import cache_manager
 from . import config
+from . import metrics
+from . import rate_limiter
+from . import reliability
+from .daemon import DaemonClient
+from .memory_cache import MemoryCache
+from .single_flight import SingleFlight
 
 # --- Provider Dispatcher ---
+# Provider modules (and their SDKs) are imported on first dispatch, so runs that only
+# hit the cache or use a single provider never pay for the others.
 PROVIDER_MAP = {
-    'google': google,
-    'local': local,
+    'google': '.providers.google',
+    'local': '.providers.local',
+    'replay': '.providers.replay',
 }
 
-def load_provider_config() -> dict:
-    """Loads the providers.yaml config and builds a model-to-provider map."""
+_config_lock = threading.Lock()
+_model_to_provider_map = None
+_rate_limits = {"providers": {}, "models": {}}
+_model_settings = {} # model_name -> its providers.yaml entry
+
+# Top-level providers.yaml keys that configure psi itself rather than naming a provider.
+RATE_LIMITS_KEY = 'rate_limits'
+RATE_LIMIT_SETTINGS = ('requests_per_minute', 'tokens_per_minute')
+
+def _get_provider_module(provider_name: str):
+    """Imports and returns the module for a provider, or an error dict if it cannot be loaded."""
     try:
-        providers_path = os.path.join(os.path.dirname(__file__), 'providers.yaml')
-        with open(providers_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f)
-    
-        model_map = {}
-        for provider, models in cfg.items():
-            for model_info in models:
-                model_map[model_info['model_name']] = provider
-        return model_map
-    except Exception as e:
-        # In a library context, we should raise an exception or return an error dict
-        return {"error": True, "error_type": "CONFIG_ERROR", "message": f"Failed to load or parse providers.yaml: {e}"}
+        return importlib.import_module(PROVIDER_MAP[provider_name], __package__)
+    except ImportError as e:
+        return {"error": True, "error_type": "CONFIG_ERROR", "message": f"Provider '{provider_name}' could not be loaded.", "provider": provider_name, "details": str(e)}
 
-def get_oracle_response(content: str, system_prompt: str, model_name: str, no_cache: bool = False, validation_model: Type[BaseModel] = None, prompt_file_path: str = "dynamic") -> dict:
+# --- In-Memory Cache ---
+# Repeat lookups within a process are served from memory instead of re-reading the disk cache.
+_memory_cache = MemoryCache(is_valid=cache_manager.is_entry_valid)
+
+def _get_cached_response(key: str) -> dict | None:
+    """Looks a key up in the in-memory cache, then on disk, promoting disk hits into memory."""
+    entry = _memory_cache.get(key)
+    if entry is None:
+        entry = cache_manager.read_entry(key)
+        if entry is None:
+            return None
+        _memory_cache.put(key, entry)
+    return cache_manager.entry_to_response(entry)
+
+def get_cache_stats() -> dict:
+    """Returns the in-memory cache's hit/miss counters and footprint."""
+    return _memory_cache.stats()
+
+def get_metrics() -> dict:
+    """Returns the recorded call, token and cache metrics (empty unless PSI_METRICS is enabled)."""
+    return metrics.snapshot()
+
+def load_provider_config() -> dict:
     """
-    The core, reusable function for getting a response from an LLM Oracle.
-    This function handles provider dispatch, caching, and validation.
-    It does NOT handle CLI-specific tasks like UI rendering or arg parsing.
+    Loads the providers.yaml config and builds a model-to-provider map, collecting each
+    model's settings (rate limits, fallbacks, hedging) along the way. The config is parsed
+    once per process; failures are not cached so they can be retried.
     """
-    result = None
-    if not no_cache:
-        result = cache_manager.get_cached_response(content, system_prompt, model_name)
-    
-    if result:
+    global _model_to_provider_map, _rate_limits, _model_settings
+    if _model_to_provider_map is not None:
+        return _model_to_provider_map
+
+    with _config_lock:
+        if _model_to_provider_map is not None:
+            return _model_to_provider_map
+        try:
+            providers_path = os.path.join(os.path.dirname(__file__), 'providers.yaml')
+            with open(providers_path, 'r', encoding='utf-8') as f:
+                cfg = yaml.safe_load(f)
+        
+            model_map = {}
+            model_limits = {}
+            model_settings = {}
+            for provider, models in cfg.items():
+                if provider == RATE_LIMITS_KEY:
+                    continue
+                for model_info in models:
+                    model_map[model_info['model_name']] = provider
+                    model_limits[model_info['model_name']] = {k: model_info[k] for k in RATE_LIMIT_SETTINGS if model_info.get(k)}
+                    model_settings[model_info['model_name']] = model_info
+            _rate_limits = {"providers": cfg.get(RATE_LIMITS_KEY) or {}, "models": model_limits}
+            _model_settings = model_settings
+            _model_to_provider_map = model_map
+            return model_map
+        except Exception as e:
+            # In a library context, we should raise an exception or return an error dict
+            return {"error": True, "error_type": "CONFIG_ERROR", "message": f"Failed to load or parse providers.yaml: {e}"}
+
+def _get_rate_limit_buckets(provider_name: str, model_name: str) -> list:
+    """Returns the rate limiter buckets configured for a provider and model (empty if unlimited)."""
+    return rate_limiter.buckets_for(
+        provider_name, model_name,
+        _rate_limits["providers"].get(provider_name), _rate_limits["models"].get(model_name)
+    )
+
+def _estimate_tokens(content: str, system_prompt: str) -> int:
+    """Estimates a request's input tokens (4 chars/token) to reserve from token budgets before the call."""
+    return (len(content) + len(system_prompt)) // 4
+
+def _lookup(content: str, system_prompt: str, model_name: str, no_cache: bool) -> tuple:
+    """Returns (cache_key, cached_result). Both are None when caching is bypassed."""
+    if no_cache:
+        return None, None
+    cache_key = cache_manager._get_cache_key(content, system_prompt, model_name)
+    result = _get_cached_response(cache_key)
+    metrics.inc("psi_cache_lookups_total", {"model": model_name, "result": "hit" if result else "miss"})
+    return cache_key, result
+
+# --- Single-Flight ---
+# Concurrent misses for the same cache key share one provider call, within and across processes.
+_single_flight = SingleFlight()
+
+# --- Daemon ---
+# When 'psi serve' is running, misses are sent to it so they use its warm provider clients,
+# connection pools and caches. Without a daemon (or with PSI_NO_DAEMON=1) they run in-process.
+_daemon = DaemonClient()
+# Settings that change which cache or provider answers a request. The daemon only answers for
+# a client whose settings match its own, so a process with its own cache directory or provider
+# settings (psi bench, tests, a different .env) runs in-process.
+_DAEMON_SENSITIVE_ENV_PREFIXES = ("PSI_", "LOCAL_MODEL_", "GOOGLE_", "OPENAI_")
+_DAEMON_NEUTRAL_ENV = ("PSI_NO_DAEMON", "PSI_DAEMON_SOCKET")
+
+def _provider_env() -> dict:
+    """The current values of every setting that would make the daemon answer differently."""
+    return {k: v for k, v in os.environ.items() if k.startswith(_DAEMON_SENSITIVE_ENV_PREFIXES) and k not in _DAEMON_NEUTRAL_ENV}
+
+def _daemon_settings() -> str:
+    """Fingerprints the cache location and provider settings, read when a request is sent (after any .env is loaded)."""
+    settings = {"cache_dir": os.path.realpath(cache_manager.CACHE_DIR), "env": _provider_env()}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _record_call_metrics(provider_name: str, model_name: str, result: dict, seconds: float):
+    """Records latency, outcome and token usage for one provider call."""
+    if not metrics.ENABLED:
+        return
+    labels = {"provider": provider_name, "model": model_name}
+    metrics.observe("psi_call_latency_seconds", seconds, labels)
+    if result.get('error'):
+        metrics.inc("psi_call_errors_total", dict(labels, error_type=result.get('error_type', 'UNKNOWN')))
+        return
+    metrics.inc("psi_calls_total", labels)
+    usage = result.get('usage') or {}
+    metrics.inc("psi_tokens_total", dict(labels, direction="input"), usage.get('input_tokens', 0))
+    metrics.inc("psi_tokens_total", dict(labels, direction="output"), usage.get('output_tokens', 0))
+    if usage.get('cached_input_tokens'):
+        # A subset of the input tokens, served from a provider-side prefix cache at a reduced rate.
+        metrics.inc("psi_tokens_total", dict(labels, direction="cached_input"), usage['cached_input_tokens'])
+
+def _dispatch(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel], prompt_file_path: str, cache_key: str | None) -> dict:
+    """
+    Sends a request to the running daemon, or else to the model's provider, coalescing
+    concurrent identical requests. Uncached requests always go to the provider.
+    """
+    result = _daemon.get_response(content, system_prompt, model_name, cache_key is None, validation_model, prompt_file_path, _daemon_settings())
+    if result is not None:
         return result
+    if not cache_key:
+        return _call_provider(content, system_prompt, model_name, validation_model, prompt_file_path, cache_key)
+    return _single_flight.do(
+        cache_key,
+        lambda: _call_provider(content, system_prompt, model_name, validation_model, prompt_file_path, cache_key),
+        recheck=lambda: _get_cached_response(cache_key),
+        lock_dir=os.path.join(cache_manager.CACHE_DIR, 'locks')
+    )
+
+def _call_provider(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel], prompt_file_path: str, cache_key: str | None) -> dict:
+    """
+    Gets a response for model_name, caching a successful result under cache_key. When the
+    model has a 'fallback' chain, transient failures move on to the next model; with
+    'hedge_after_ms', the first fallback is also started if the model is slow to answer.
+    Fallback answers are returned but never cached under the original model's key.
+    """
+    def call_primary() -> dict:
+        result = _call_model(content, system_prompt, model_name, validation_model)
+        if cache_key and not result.get('error'):
+            entry = cache_manager.make_entry(model_name, dict(result), prompt_file_path, cache_manager.store_prompt(system_prompt))
+            cache_manager.write_entry(cache_key, entry)
+            _memory_cache.put(cache_key, entry)
+        return result
+
+    def call_fallback(fallback_model: str) -> dict:
+        result = _call_model(content, system_prompt, fallback_model, validation_model)
+        if not result.get('error'):
+            result['fallback_from'] = model_name
+        return result
+
+    load_provider_config()
+    settings = _model_settings.get(model_name, {})
+    fallbacks = list(settings.get('fallback') or [])
+    if fallbacks and settings.get('hedge_after_ms'):
+        hedge_model = fallbacks.pop(0)
+        result = reliability.hedge(call_primary, lambda: call_fallback(hedge_model), settings['hedge_after_ms'] / 1000.0)
+    else:
+        result = call_primary()
+
+    for fallback_model in fallbacks:
+        if not reliability.is_transient(result):
+            break
+        metrics.inc("psi_fallbacks_total", {"model": model_name, "fallback": fallback_model})
+        result = call_fallback(fallback_model)
+    return result
 
+def _call_model(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel]) -> dict:
+    """Sends a request to one model's provider, honouring its rate limits and circuit breaker."""
     model_to_provider_map = load_provider_config()
     if model_to_provider_map.get("error"):
         return model_to_provider_map
@@ -52,17 +229,153 @@ def get_oracle_response(content: str, system_prompt: str, model_name: str, no_ca
     if not provider_name or not PROVIDER_MAP.get(provider_name):
         return {"error": True, "error_type": "CONFIG_ERROR", "message": f"Model '{model_name}' or its provider is not configured."}
     
-    provider_module = PROVIDER_MAP.get(provider_name)
-    result = provider_module.get_response(
-        content, 
-        system_prompt, 
-        model_name,
-        validation_model=validation_model
-    )
-    
-    # Cache the new result if successful
-    if not no_cache and not result.get('error'):
-        cache_manager.set_cached_response(content, system_prompt, model_name, result, prompt_file_path)
+    provider_module = _get_provider_module(provider_name)
+    if isinstance(provider_module, dict):
+        return provider_module
+
+    breaker = reliability.get_breaker(provider_name)
+    if not breaker.allow():
+        metrics.inc("psi_circuit_rejections_total", {"provider": provider_name})
+        return reliability.circuit_open_error(provider_name)
+
+    # Wait for room in the shared request/token budgets instead of tripping the provider's quota.
+    buckets = _get_rate_limit_buckets(provider_name, model_name)
+    estimated_tokens = _estimate_tokens(content, system_prompt)
+    if buckets:
+        try:
+            waited = rate_limiter.get_limiter().acquire(buckets, estimated_tokens)
+        except BaseException:
+            breaker.release() # The call never reached the provider; don't hold the half-open trial slot.
+            raise
+        metrics.inc("psi_rate_limit_wait_seconds_total", {"provider": provider_name, "model": model_name}, waited)
+
+    started = time.perf_counter()
+    result = {"error": True, "error_type": "API_ERROR", "message": "The provider raised an exception.", "provider": provider_name}
+    try:
+        result = provider_module.get_response(
+            content, 
+            system_prompt, 
+            model_name,
+            validation_model=validation_model
+        )
+    finally:
+        breaker.record(result)
+    _record_call_metrics(provider_name, model_name, result, time.perf_counter() - started)
 
+    # Settle the budget against the tokens the provider actually reported.
+    usage = result.get('usage') or {}
+    if buckets and usage:
+        actual_tokens = usage.get('input_tokens', 0) + usage.get('output_tokens', 0)
+        rate_limiter.get_limiter().record_usage(buckets, actual_tokens - estimated_tokens)
     return result
 
+def get_oracle_response(content: str, system_prompt: str, model_name: str, no_cache: bool = False, validation_model: Type[BaseModel] = None, prompt_file_path: str = "dynamic") -> dict:
+    """
+    The core, reusable function for getting a response from an LLM Oracle.
+    This function handles provider dispatch, caching, and validation.
+    It does NOT handle CLI-specific tasks like UI rendering or arg parsing.
+    """
+    cache_key, result = _lookup(content, system_prompt, model_name, no_cache)
+    if result:
+        return result
+    return _dispatch(content, system_prompt, model_name, validation_model, prompt_file_path, cache_key)
+
+# --- Async & Batch API ---
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+def _normalize_request(request: dict) -> dict:
+    """Fills in get_oracle_response defaults for a batch request dict."""
+    return {
+        "content": request["content"],
+        "system_prompt": request["system_prompt"],
+        "model_name": request["model_name"],
+        "no_cache": request.get("no_cache", False),
+        "validation_model": request.get("validation_model"),
+        "prompt_file_path": request.get("prompt_file_path", "dynamic"),
+    }
+
+def _dispatch_safely(request: dict, cache_key: str | None) -> dict:
+    """Dispatches one batch request, converting unexpected exceptions into an error result."""
+    try:
+        return _dispatch(request["content"], request["system_prompt"], request["model_name"],
+                         request["validation_model"], request["prompt_file_path"], cache_key)
+    except Exception as e:
+        return {"error": True, "error_type": "API_ERROR", "message": "An unexpected error occurred during dispatch.", "details": str(e)}
+
+async def get_oracle_response_async(content: str, system_prompt: str, model_name: str, no_cache: bool = False, validation_model: Type[BaseModel] = None, prompt_file_path: str = "dynamic") -> dict:
+    """
+    Async variant of get_oracle_response. The cache lookup and, on a miss, the dispatch run
+    in worker threads, so neither a locked cache store nor the synchronous provider SDKs
+    block the event loop.
+    """
+    cache_key, result = await asyncio.to_thread(_lookup, content, system_prompt, model_name, no_cache)
+    if result:
+        return result
+    return await asyncio.to_thread(_dispatch, content, system_prompt, model_name, validation_model, prompt_file_path, cache_key)
+
+async def get_oracle_responses_async(requests: List[dict], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> List[dict]:
+    """
+    Resolves many requests at once. Each request is a dict of get_oracle_response keyword
+    arguments. All cache lookups run first; only the misses are dispatched, at most
+    max_concurrency at a time. Results are returned in input order. The lookups run in a
+    worker thread, so a locked cache store doesn't stall the event loop.
+    """
+    max_concurrency = max(1, max_concurrency)
+    requests = [_normalize_request(r) for r in requests]
+    results: List[dict] = [None] * len(requests)
+    misses = []
+    lookups = await asyncio.to_thread(lambda: [_lookup(r["content"], r["system_prompt"], r["model_name"], r["no_cache"]) for r in requests])
+    for index, (cache_key, result) in enumerate(lookups):
+        if result:
+            results[index] = result
+        else:
+            misses.append((index, cache_key))
+
+    if not misses:
+        return results
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(misses))) as executor:
+        async def run(index: int, cache_key: str | None):
+            async with semaphore:
+                results[index] = await loop.run_in_executor(executor, _dispatch_safely, requests[index], cache_key)
+        await asyncio.gather(*(run(index, cache_key) for index, cache_key in misses))
+    return results
+
+def get_oracle_responses(requests: List[dict], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> List[dict]:
+    """Synchronous wrapper around get_oracle_responses_async. Must not be called from a running event loop."""
+    return asyncio.run(get_oracle_responses_async(requests, max_concurrency))
+
+def iter_oracle_responses(requests: Iterable[dict], max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> Iterator[dict]:
+    """
+    Resolves a stream of requests, yielding results in input order as soon as each is ready.
+    Cache hits are answered inline; misses run on at most max_concurrency worker threads.
+    Only a bounded window of requests is held at once, so the stream may be arbitrarily long.
+    Items that are already error dicts are passed through in place.
+    """
+    max_concurrency = max(1, max_concurrency)
+    window = deque()
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        for request in requests:
+            window.append(_submit(executor, request))
+            while window and (len(window) > max_concurrency * 4 or not isinstance(window[0], Future) or window[0].done()):
+                item = window.popleft()
+                yield item.result() if isinstance(item, Future) else item
+        while window:
+            item = window.popleft()
+            yield item.result() if isinstance(item, Future) else item
+
+def _submit(executor: ThreadPoolExecutor, request: dict) -> dict | Future:
+    """Answers a streamed request from the cache, or submits it to the executor."""
+    if request.get('error'):
+        return request
+    try:
+        request = _normalize_request(request)
+    except KeyError as e:
+        return {"error": True, "error_type": "BAD_REQUEST_ERROR", "message": "Request is missing a required field.", "details": str(e)}
+    cache_key, result = _lookup(request["content"], request["system_prompt"], request["model_name"], request["no_cache"])
+    if result:
+        return result
+    return executor.submit(_dispatch_safely, request, cache_key)
@@ -0,0 +1,239 @@
+# --- Psi: Daemon ---
+# 'psi serve' keeps provider clients, connection pools, the in-memory cache and the rate
+# limiters warm in one long-lived process. Clients talk to it over a Unix domain socket
+# with newline-delimited JSON, one request and one response per line.
+import os
+import json
+import time
+import stat
+import signal
+import socket
+import tempfile
+import importlib
+import threading
+import socketserver
+from typing import Any, Dict, Type
+from pydantic import BaseModel
+
+def _default_socket_path() -> str:
+    """A socket inside a directory only this user can open: $XDG_RUNTIME_DIR, or a private temp directory."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "psi.sock")
+    uid = os.getuid() if hasattr(os, 'getuid') else 'user'
+    return os.path.join(tempfile.gettempdir(), f"psi-{uid}", "psi.sock")
+
+# --- Configuration ---
+SOCKET_PATH = os.environ.get("PSI_DAEMON_SOCKET") or _default_socket_path()
+# PSI_NO_DAEMON=1 makes clients always run in-process. The daemon sets it for itself.
+# Without Unix sockets or user ids, a socket's owner can't be verified, so the daemon is never used.
+DISABLED = os.environ.get("PSI_NO_DAEMON") == "1" or not hasattr(socket, "AF_UNIX") or not hasattr(os, "getuid")
+RETRY_AFTER_SECONDS = 5 # After a failed connect, clients stay in-process this long before trying again.
+CONNECT_TIMEOUT_SECONDS = 1.0
+
+def _model_path(validation_model: Type[BaseModel] | None) -> str | None:
+    """Names a validation model so the daemon can import it."""
+    return f"{validation_model.__module__}:{validation_model.__qualname__}" if validation_model else None
+
+def _resolve_model(path: str | None) -> Type[BaseModel] | None:
+    """Imports a validation model named by _model_path."""
+    if not path:
+        return None
+    module_name, _, qualname = path.partition(':')
+    target = importlib.import_module(module_name)
+    for part in qualname.split('.'):
+        target = getattr(target, part)
+    return target
+
+def _is_transferable(validation_model: Type[BaseModel] | None) -> bool:
+    """
+    Checks that the daemon can import the model by name, which rules out models defined in
+    __main__, inside functions or built at runtime.
+    """
+    if validation_model is None:
+        return True
+    if validation_model.__module__ == "__main__" or "<locals>" in validation_model.__qualname__:
+        return False
+    try:
+        return _resolve_model(_model_path(validation_model)) is validation_model
+    except Exception:
+        return False
+
+def _is_trusted_socket(path: str) -> bool:
+    """Checks that path is a socket owned by this user, so no other user can impersonate the daemon."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == os.getuid()
+
+def _ensure_private_dir(directory: str):
+    """Creates the socket's directory with mode 0700, refusing one that another user could open."""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError(f"Refusing to use {directory} for the psi daemon socket: it must be a directory owned by you with mode 0700.")
+
+# --- Client ---
+
+class DaemonClient:
+    """Sends requests to a running daemon over per-thread connections. Every failure means 'run in-process'."""
+    def __init__(self, socket_path: str = SOCKET_PATH):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        self._unavailable_until = 0.0
+        self._declined = {} # settings fingerprint -> when the daemon last declined it
+
+    def _connection(self):
+        """Returns this thread's (socket, reader) pair, connecting on first use."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+            sock.connect(self.socket_path)
+            sock.settimeout(None) # Provider calls can legitimately take minutes.
+            connection = self._local.connection = (sock, sock.makefile('r', encoding='utf-8'))
+        return connection
+
+    def _close(self):
+        """Drops this thread's connection so the next request reconnects."""
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def request(self, message: Dict[str, Any]) -> Dict[str, Any] | None:
+        """Sends one message and returns the daemon's reply, or None if no daemon could answer."""
+        if DISABLED or time.monotonic() < self._unavailable_until or not _is_trusted_socket(self.socket_path):
+            return None
+        try:
+            sock, reader = self._connection()
+            sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("The daemon closed the connection.")
+            return json.loads(line)
+        except (OSError, ValueError):
+            self._close()
+            self._unavailable_until = time.monotonic() + RETRY_AFTER_SECONDS
+            return None
+
+    def ping(self) -> Dict[str, Any] | None:
+        """Returns the daemon's status over a fresh connection, or None if none is listening. Ignores PSI_NO_DAEMON."""
+        if not _is_trusted_socket(self.socket_path):
+            return None
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+                sock.connect(self.socket_path)
+                sock.sendall(b'{"op": "ping"}\n')
+                reply = json.loads(sock.makefile('r', encoding='utf-8').readline())
+                return reply if reply.get("ok") else None
+        except (OSError, ValueError):
+            return None
+
+    def get_response(self, content: str, system_prompt: str, model_name: str, no_cache: bool,
+                     validation_model: Type[BaseModel], prompt_file_path: str, settings: str = None) -> dict | None:
+        """
+        Asks the daemon for an oracle response. Returns None to signal an in-process fallback,
+        including when the daemon declines because its settings fingerprint differs from ours.
+        """
+        if time.monotonic() < self._declined.get(settings, 0.0) or not _is_transferable(validation_model):
+            return None
+        reply = self.request({
+            "op": "get_response", "content": content, "system_prompt": system_prompt, "model_name": model_name,
+            "no_cache": no_cache, "validation_model": _model_path(validation_model), "prompt_file_path": prompt_file_path,
+            "settings": settings,
+        })
+        if reply and reply.get("declined") == "settings":
+            self._declined[settings] = time.monotonic() + RETRY_AFTER_SECONDS
+        return reply.get("result") if reply else None
+
+# --- Server ---
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answers newline-delimited JSON requests until the client disconnects."""
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                reply = {"result": {"error": True, "error_type": "API_ERROR", "message": "The psi daemon failed to handle the request.", "details": str(e)}}
+            self.wfile.write((json.dumps(reply, default=str) + "\n").encode('utf-8'))
+            self.wfile.flush()
+
+class PsiDaemon(socketserver.ThreadingUnixStreamServer):
+    """The 'psi serve' server. Requests are answered by psi.client inside this process."""
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = SOCKET_PATH):
+        from . import client
+        self.client = client
+        self.started_at = time.time()
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self.socket_path = socket_path
+        if socket_path == _default_socket_path():
+            _ensure_private_dir(os.path.dirname(socket_path))
+        if os.path.lexists(socket_path):
+            if not _is_trusted_socket(socket_path):
+                raise OSError(f"{socket_path} exists and is not a socket owned by you; refusing to replace it.")
+            if DaemonClient(socket_path).ping():
+                raise OSError(f"A psi daemon is already listening on {socket_path}.")
+            os.remove(socket_path) # Left behind by a daemon that did not shut down cleanly.
+        previous_umask = os.umask(0o077) # Only the owner may connect.
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(previous_umask)
+
+    def dispatch(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Handles one decoded request."""
+        op = message.get("op")
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid(), "uptime_seconds": time.time() - self.started_at,
+                    "requests": self.requests, "memory_cache": self.client.get_cache_stats()}
+        if op == "get_response":
+            if message.get("settings") != self.client._daemon_settings():
+                return {"declined": "settings", "details": "The client's cache or provider settings differ from the daemon's."}
+            try:
+                validation_model = _resolve_model(message.get("validation_model"))
+            except Exception as e:
+                return {"declined": "validation_model", "details": f"The daemon could not import the validation model: {e}"}
+            with self._count_lock:
+                self.requests += 1
+            result = self.client.get_oracle_response(
+                message["content"], message["system_prompt"], message["model_name"],
+                no_cache=message.get("no_cache", False),
+                validation_model=validation_model,
+                prompt_file_path=message.get("prompt_file_path", "dynamic"),
+            )
+            return {"result": result}
+        return {"result": {"error": True, "error_type": "BAD_REQUEST_ERROR", "message": f"Unknown daemon operation '{op}'."}}
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(socket_path: str = SOCKET_PATH, on_ready=None):
+    """Runs the daemon in the foreground until interrupted or terminated, then removes the socket."""
+    global DISABLED
+    DISABLED = True # Requests handled here must never be forwarded back to a daemon.
+    os.environ["PSI_NO_DAEMON"] = "1"
+    server = PsiDaemon(socket_path)
+    signal.signal(signal.SIGTERM, _terminate)
+    if on_ready:
+        on_ready(server)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
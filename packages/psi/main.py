@@ -2,11 +2,15 @@
 # --- Psi (Ψ/ψ) | The Oracle (CLI Wrapper) ---
 import sys
 import argparse
+import contextlib
 import json
 import os
+import time
+import sqlite3
 from dotenv import load_dotenv
 
-from .client import get_oracle_response
+from .client import get_oracle_response, iter_oracle_responses, DEFAULT_MAX_CONCURRENCY
+from . import cache_manager
 from . import config
 from . import models
 from forge.packages.common import ui as loom
@@ -16,21 +20,259 @@ MODEL_REGISTRY = {
     'SimpleResponse': models.SimpleResponse,
 }
 
+def _format_bytes(num_bytes: int) -> str:
+    """Formats a byte count for display."""
+    for unit in ('B', 'KiB', 'MiB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GiB"
+
+def run_cache_command(argv: list):
+    """Handles the 'psi cache stats|prune|clear|export|import' management subcommands."""
+    parser = argparse.ArgumentParser(prog="psi cache", description="Manage the Psi response cache.", add_help=False)
+    parser.add_argument('action', choices=['stats', 'prune', 'clear', 'export', 'import'], help="The cache operation to run.")
+    parser.add_argument('path', nargs='?', help="Bundle file (or, for export, a directory) to export to or import from.")
+    parser.add_argument('--max-bytes', type=int, help="Size limit to prune to (defaults to PSI_CACHE_MAX_BYTES).")
+    parser.add_argument('--help', action='help', help='Show this help message and exit')
+    args = parser.parse_args(argv)
+    if args.action == 'import' and not args.path:
+        parser.error("'import' requires the path of a bundle")
+
+    render_plan = [{"type": "banner", "symbol": "Ψ", "color": "cyan"}]
+    if args.action == 'prune':
+        result = cache_manager.prune_cache(args.max_bytes)
+        render_plan.append({"type": "group", "title": "Cache Pruned", "items": [
+            {"key": "Expired Or Unreadable", "value": str(result['expired'])},
+            {"key": "Evicted (LRU)", "value": str(result['evicted'])}
+        ]})
+    elif args.action == 'clear':
+        result = {"removed": cache_manager.clear_cache()}
+        render_plan.append({"type": "group", "title": "Cache Cleared", "items": [{"key": "Removed", "value": str(result['removed'])}]})
+    elif args.action == 'export':
+        result = cache_manager.export_bundle(args.path or ".")
+        render_plan.append({"type": "group", "title": "Bundle Exported", "items": [
+            {"key": "Path", "value": os.path.abspath(result['path'])},
+            {"key": "Entries", "value": str(result['entries'])},
+            {"key": "Prompts", "value": str(result['prompts'])},
+            {"key": "Size", "value": _format_bytes(result['bytes'])}
+        ]})
+    elif args.action == 'import':
+        try:
+            result = cache_manager.import_bundle(args.path)
+        except (OSError, sqlite3.Error) as e:
+            print(json.dumps({"error": True, "error_type": "CONFIG_ERROR", "message": f"Could not import bundle: {args.path}", "details": str(e)}))
+            sys.exit(1)
+        render_plan.append({"type": "group", "title": "Bundle Imported", "items": [
+            {"key": "Path", "value": result['path']},
+            {"key": "Entries", "value": str(result['entries'])},
+            {"key": "Status", "value": "Installed" if result['installed'] else "Already installed"}
+        ]})
+
+    stats = cache_manager.get_cache_stats()
+    render_plan.append({"type": "group", "title": "Cache Statistics", "items": [
+        {"key": "Backend", "value": stats['backend']},
+        {"key": "Location", "value": os.path.abspath(stats['location'])},
+        {"key": "Entries", "value": str(stats['entries'])},
+        {"key": "Stored Prompts", "value": str(stats['prompts'])},
+        {"key": "Size", "value": f"{_format_bytes(stats['bytes'])} of {_format_bytes(stats['max_bytes'])}"},
+        {"key": "Bundles", "value": _format_bundles(stats['bundles'])}
+    ]})
+    render_plan.append({"type": "end"})
+    loom.render(render_plan)
+
+    if not sys.stdout.isatty():
+        output = {"stats": stats}
+        if args.action != 'stats':
+            output[args.action] = result
+        print(json.dumps(output, indent=2))
+
+def _format_bundles(bundles: list) -> str:
+    """Summarizes the mounted bundles, noting any that could not be read."""
+    unavailable = sum(1 for b in bundles if b['entries'] is None)
+    summary = f"{len(bundles)} ({sum(b['entries'] or 0 for b in bundles)} entries)"
+    return f"{summary}, {unavailable} unavailable" if unavailable else summary
+
+def run_bench_command(argv: list):
+    """Handles 'psi bench', which measures latency, throughput and cache hit ratio without spending API quota."""
+    import tempfile
+    from . import bench, client, daemon
+    from .stand_in import StandInServer
+
+    parser = argparse.ArgumentParser(prog="psi bench", description="Benchmark Psi against the replay provider or a stand-in local server.", add_help=False)
+    parser.add_argument('--requests', type=int, default=200, help="Total number of requests to send.")
+    parser.add_argument('--concurrency', type=int, default=8, help="Number of requests in flight at once.")
+    parser.add_argument('--unique', type=int, help="Number of distinct requests; the rest repeat them (defaults to --requests).")
+    parser.add_argument('--model', default='replay', help="Model to benchmark (default: replay).")
+    parser.add_argument('--content-bytes', type=int, default=256, help="Approximate size of each request's content.")
+    parser.add_argument('--latency-ms', help="Synthetic latency for the replay provider or stand-in server, e.g. '50' or '20-80'.")
+    parser.add_argument('--error-rate', type=float, help="Fraction of replay calls that fail.")
+    parser.add_argument('--stand-in', action='store_true', help="Serve the local provider from an in-process stand-in server.")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the cache for every request.")
+    parser.add_argument('--keep-cache', action='store_true', help="Use the real cache directory instead of a scratch cache.")
+    parser.add_argument('--help', action='help', help='Show this help message and exit')
+    args = parser.parse_args(argv)
+
+    # The benchmark measures this process with its own cache and provider settings, never a running daemon.
+    daemon.DISABLED = True
+    os.environ["PSI_NO_DAEMON"] = "1"
+    if args.latency_ms is not None:
+        os.environ["PSI_REPLAY_LATENCY_MS"] = args.latency_ms
+    if args.error_rate is not None:
+        os.environ["PSI_REPLAY_ERROR_RATE"] = str(args.error_rate)
+    requests = bench.build_requests(args.requests, args.unique or args.requests, args.model, args.content_bytes, args.no_cache)
+
+    with contextlib.ExitStack() as stack:
+        if not args.keep_cache:
+            cache_manager.set_cache_dir(stack.enter_context(tempfile.TemporaryDirectory(prefix="psi-bench-")))
+        if args.stand_in:
+            latency_ms = float(args.latency_ms.partition('-')[0]) if args.latency_ms else 0
+            stand_in = stack.enter_context(StandInServer(latency_ms=latency_ms))
+            os.environ["LOCAL_MODEL_ENDPOINT"] = stand_in.endpoint
+        client._memory_cache.clear()
+        summary = bench.run_benchmark(requests, args.concurrency)
+
+    latency = summary['latency_ms']
+    loom.render([
+        {"type": "banner", "symbol": "Ψ", "color": "cyan"},
+        {"type": "group", "title": "Benchmark", "items": [
+            {"key": "Model", "value": args.model},
+            {"key": "Requests", "value": f"{summary['requests']} at concurrency {summary['concurrency']}"},
+            {"key": "Errors", "value": str(summary['errors'])},
+            {"key": "Cache Hit Ratio", "value": f"{summary['cache_hit_ratio']:.1%}"},
+            {"key": "Throughput", "value": f"{summary['throughput_rps']:.1f} req/s"},
+            {"key": "Latency (p50/p95/p99)", "value": f"{latency['p50']:.1f} / {latency['p95']:.1f} / {latency['p99']:.1f} ms"}
+        ]},
+        {"type": "end"}
+    ])
+    if not sys.stdout.isatty():
+        print(json.dumps(summary, indent=2))
+
+def run_serve_command(argv: list):
+    """Handles 'psi serve', which runs the daemon in the foreground, or reports on one with --status."""
+    from . import daemon
+
+    parser = argparse.ArgumentParser(prog="psi serve", description="Run a long-lived Psi daemon on a Unix domain socket.", add_help=False)
+    parser.add_argument('--socket', default=daemon.SOCKET_PATH, help="Socket path (defaults to PSI_DAEMON_SOCKET, or psi.sock in $XDG_RUNTIME_DIR or a private per-user temp directory).")
+    parser.add_argument('--status', action='store_true', help="Report whether a daemon is listening instead of starting one.")
+    parser.add_argument('--help', action='help', help='Show this help message and exit')
+    args = parser.parse_args(argv)
+
+    if args.status:
+        status = daemon.DaemonClient(args.socket).ping()
+        items = [{"key": "Socket", "value": args.socket}, {"key": "Status", "value": "Running" if status else "Not running"}]
+        if status:
+            items += [{"key": "PID", "value": str(status['pid'])}, {"key": "Requests Served", "value": str(status['requests'])}]
+        loom.render([{"type": "banner", "symbol": "Ψ", "color": "cyan"}, {"type": "group", "title": "Daemon", "items": items}, {"type": "end"}])
+        if not sys.stdout.isatty():
+            print(json.dumps({"socket": args.socket, "running": bool(status), "status": status}, indent=2))
+        return
+
+    def on_ready(server):
+        loom.render([
+            {"type": "banner", "symbol": "Ψ", "color": "cyan"},
+            {"type": "group", "title": "Daemon", "items": [{"key": "Socket", "value": args.socket}, {"key": "PID", "value": str(os.getpid())}]},
+            {"type": "end", "text": "Serving. Press Ctrl+C to stop."}
+        ])
+    daemon.serve(args.socket, on_ready=on_ready)
+
+# --- Batch Mode ---
+
+def _resolve_prompt_path(prompt_file: str) -> str:
+    """Resolves a prompt file path relative to the project root."""
+    return prompt_file if os.path.isabs(prompt_file) else os.path.join(config.FOUNDATION_ROOT, prompt_file)
+
+def _read_batch_requests(stream, args, stats: dict):
+    """
+    Parses JSONL batch requests into client request dicts. Each line may set content,
+    prompt_file (or an inline system_prompt), model, validate_with and no_cache; the CLI
+    flags supply defaults. Lines that cannot be parsed become error results in place.
+    """
+    prompts = {}
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        stats["requests"] += 1
+        try:
+            item = json.loads(line)
+            prompt_file = item.get('prompt_file', args.prompt_file)
+            system_prompt = item.get('system_prompt')
+            if system_prompt is None:
+                if not prompt_file:
+                    raise ValueError("No prompt_file or system_prompt given.")
+                if prompt_file not in prompts:
+                    with open(_resolve_prompt_path(prompt_file), 'r', encoding='utf-8') as f:
+                        prompts[prompt_file] = f.read()
+                system_prompt = prompts[prompt_file]
+            validate_with = item.get('validate_with', args.validate_with)
+            if validate_with and validate_with not in MODEL_REGISTRY:
+                raise ValueError(f"Unknown validation model '{validate_with}'.")
+            yield {
+                "content": item['content'],
+                "system_prompt": system_prompt,
+                "model_name": item.get('model', args.model),
+                "no_cache": item.get('no_cache', args.no_cache),
+                "validation_model": MODEL_REGISTRY.get(validate_with) if validate_with else None,
+                "prompt_file_path": prompt_file or "dynamic",
+            }
+        except (ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+            yield {"error": True, "error_type": "BAD_REQUEST_ERROR", "message": f"Invalid batch request on line {line_number}.", "details": str(e)}
+
+def run_batch(args):
+    """Handles 'psi --batch': JSONL requests on stdin, JSONL results on stdout in input order."""
+    stats = {"requests": 0, "errors": 0, "cache_hits": 0}
+    started = time.perf_counter()
+    for result in iter_oracle_responses(_read_batch_requests(sys.stdin, args, stats), args.concurrency):
+        if result.get('error'):
+            stats["errors"] += 1
+        elif result.get('__cache_hit__'):
+            stats["cache_hits"] += 1
+        sys.stdout.write(json.dumps(result, default=str) + "\n")
+        sys.stdout.flush()
+
+    loom.render([
+        {"type": "banner", "symbol": "Ψ", "color": "cyan"},
+        {"type": "group", "title": "Batch", "items": [
+            {"key": "Requests", "value": str(stats['requests'])},
+            {"key": "Cache Hits", "value": str(stats['cache_hits'])},
+            {"key": "Errors", "value": str(stats['errors'])},
+            {"key": "Elapsed", "value": f"{time.perf_counter() - started:.2f}s"}
+        ]},
+        {"type": "end"}
+    ])
+
 def main():
     """Main entry point for the Psi CLI tool."""
     load_dotenv(dotenv_path=os.path.join(config.FOUNDATION_ROOT, '.env'))
+    if len(sys.argv) > 1 and sys.argv[1] == 'cache':
+        run_cache_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        run_bench_command(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        run_serve_command(sys.argv[2:])
+        return
     is_piped = not sys.stdout.isatty()
 
     parser = argparse.ArgumentParser(description="Psi (Ψ): The Oracle for qualitative analysis.", add_help=False)
-    parser.add_argument('--prompt-file', required=True, type=str, help="Path to a file containing the system prompt (relative to project root).")
-    parser.add_argument('--model', required=True, type=str, help="The specific model to use.")
+    parser.add_argument('--prompt-file', type=str, help="Path to a file containing the system prompt (relative to project root).")
+    parser.add_argument('--model', type=str, help="The specific model to use.")
     parser.add_argument('--validate-with', type=str, choices=MODEL_REGISTRY.keys(), help="The Pydantic model to validate the response against.")
     parser.add_argument('--no-cache', action='store_true', help="Bypass the cache for a fresh response.")
     parser.add_argument('--verbose', action='store_true', help="Output the full, raw JSON response to stdout.")
     parser.add_argument('--response', action='store_true', help="Output the LLM's response.")
     parser.add_argument('--metadata', action='store_true', help="Print a formatted metadata report to stderr.")
+    parser.add_argument('--batch', action='store_true', help="Read JSONL requests from stdin and write JSONL results to stdout, in input order.")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY, help="Maximum concurrent provider calls in batch mode.")
     parser.add_argument('--help', action='help', help='Show this help message and exit')
     args = parser.parse_args()
+
+    if args.batch:
+        run_batch(args)
+        return
+    if not args.prompt_file or not args.model:
+        parser.error("--prompt-file and --model are required (except in --batch mode, where requests may supply them).")
     
     render_plan = []
     
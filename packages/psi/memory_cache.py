@@ -0,0 +1,81 @@
+# --- Psi: In-Memory Cache Layer ---
+import os
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+# --- Configuration ---
+DEFAULT_MAX_ENTRIES = int(os.environ.get("PSI_MEMORY_CACHE_MAX_ENTRIES", 4096))
+DEFAULT_MAX_BYTES = int(os.environ.get("PSI_MEMORY_CACHE_MAX_BYTES", 64 * 1024 * 1024)) # 64 MiB
+
+def _estimate_size(entry: Dict[str, Any]) -> int:
+    """Approximates an entry's footprint by the length of its compact JSON encoding."""
+    return len(json.dumps(entry, separators=(',', ':'), default=str))
+
+class MemoryCache:
+    """
+    A bounded, thread-safe LRU of cache entries that sits in front of the disk cache.
+    Entries are evicted once either the entry count or the approximate byte size is exceeded.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 is_valid: Callable[[Dict[str, Any]], bool] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._is_valid = is_valid
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """Returns the entry for a key, or None if it is absent or no longer valid."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self._is_valid and not self._is_valid(item[0]):
+                self._remove(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Stores an entry, evicting the least recently used entries to stay within bounds."""
+        size = _estimate_size(entry)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def discard(self, key: str):
+        """Removes a key if present."""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss counters and the current footprint."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def _remove(self, key: str):
+        """Removes a key without taking the lock. Callers must hold it."""
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
@@ -0,0 +1,119 @@
+# --- Psi: Metrics Registry ---
+# In-process counters and latency histograms. Recording is a no-op unless metrics are
+# enabled, so instrumented hot paths cost one attribute check when they are off.
+#
+# PSI_METRICS=1              Enable recording (read it with client.get_metrics()).
+# PSI_METRICS_JSON=<path>    Enable recording and write a JSON snapshot to <path> at exit.
+# PSI_METRICS_PROMETHEUS=<path>  Enable recording and write Prometheus text format to <path> at exit.
+# Paths may contain '{pid}' so concurrent processes don't overwrite each other's files.
+import os
+import json
+import atexit
+import bisect
+import threading
+from typing import Dict, Tuple
+
+# --- Configuration ---
+JSON_PATH = os.environ.get("PSI_METRICS_JSON")
+PROMETHEUS_PATH = os.environ.get("PSI_METRICS_PROMETHEUS")
+ENABLED = os.environ.get("PSI_METRICS") == "1" or bool(JSON_PATH or PROMETHEUS_PATH)
+# Upper bounds (seconds) of the latency histogram buckets; an implicit +Inf bucket follows.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple, float] = {}
+_histograms: Dict[Tuple, list] = {} # key -> [bucket counts..., +Inf count, sum, count]
+
+def _key(name: str, labels: Dict[str, str] | None) -> Tuple:
+    """Builds the registry key for a metric name and label set."""
+    return (name,) + tuple(sorted((labels or {}).items()))
+
+def inc(name: str, labels: Dict[str, str] = None, value: float = 1):
+    """Adds value to a counter."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, value: float, labels: Dict[str, str] = None):
+    """Records one observation (in seconds) in a latency histogram."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    index = bisect.bisect_left(LATENCY_BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0, 0]
+        histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+def reset():
+    """Drops every recorded value."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def snapshot() -> Dict[str, list]:
+    """Returns every counter and histogram as JSON-serializable data."""
+    with _lock:
+        counters = [{"name": key[0], "labels": dict(key[1:]), "value": value} for key, value in sorted(_counters.items())]
+        histograms = []
+        for key, histogram in sorted(_histograms.items()):
+            buckets = dict(zip([str(b) for b in LATENCY_BUCKETS] + ["+Inf"], histogram[:-2]))
+            histograms.append({"name": key[0], "labels": dict(key[1:]), "buckets": buckets, "sum": histogram[-2], "count": histogram[-1]})
+    return {"counters": counters, "histograms": histograms}
+
+def _escape(value) -> str:
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, str], extra: Dict[str, str] = None) -> str:
+    """Formats a label set as {name="value",...}."""
+    items = list(labels.items()) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def to_prometheus() -> str:
+    """Renders the registry in the Prometheus text exposition format."""
+    data = snapshot()
+    lines, typed = [], set()
+    for counter in data["counters"]:
+        if counter["name"] not in typed:
+            lines.append(f"# TYPE {counter['name']} counter")
+            typed.add(counter["name"])
+        lines.append(f"{counter['name']}{_format_labels(counter['labels'])} {counter['value']}")
+    for histogram in data["histograms"]:
+        name = histogram["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in histogram["buckets"].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(histogram['labels'], {'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(histogram['labels'])} {histogram['sum']}")
+        lines.append(f"{name}_count{_format_labels(histogram['labels'])} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def _write(path: str, text: str):
+    """Writes an export atomically so scrapers never read a partial file."""
+    path = path.format(pid=os.getpid())
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def export():
+    """Writes the configured JSON and/or Prometheus exports."""
+    if JSON_PATH:
+        _write(JSON_PATH, json.dumps(snapshot(), indent=2))
+    if PROMETHEUS_PATH:
+        _write(PROMETHEUS_PATH, to_prometheus())
+
+if JSON_PATH or PROMETHEUS_PATH:
+    atexit.register(export)
@@ -0,0 +1,87 @@
+# --- Psi: Prompt Prefix Cache ---
+# Callers such as Iota and Lambda send the same large system prompt with every call, so only
+# the content changes. Providers that can keep a processed prompt prefix on the server side
+# (e.g. Gemini context caching) use this registry to notice repeated prompts and to hold the
+# server-side handles, so the prefix is uploaded and processed once instead of on every call.
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from . import metrics
+
+# --- Configuration ---
+ENABLED = os.environ.get("PSI_PREFIX_CACHE", "1") != "0"
+# A prefix is cached server-side once the same (model, system prompt) has been sent this many times.
+MIN_REPEATS = int(os.environ.get("PSI_PREFIX_CACHE_MIN_REPEATS", 2))
+# Lifetime requested for server-side caches. Handles are replaced shortly before they expire.
+TTL_SECONDS = float(os.environ.get("PSI_PREFIX_CACHE_TTL_SECONDS", 3600))
+REFRESH_MARGIN_SECONDS = 60
+MAX_TRACKED_PREFIXES = 256
+
+_FAILED = object() # Marks a prefix the provider refused to cache, so it isn't retried on every call.
+
+class PrefixCache:
+    """
+    Counts uses of each prefix key and, once a key repeats, holds the handle returned by the
+    provider's create function until it nears expiry. Keys are evicted least recently used.
+    """
+    def __init__(self, provider_name: str, min_repeats: int = MIN_REPEATS, ttl_seconds: float = TTL_SECONDS):
+        self.provider_name = provider_name
+        self.min_repeats = min_repeats
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict() # key -> [uses, handle, expires_at]
+        self._creating = set()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, model_name: str, create: Callable[[], Any]) -> Any | None:
+        """
+        Records a use of key and returns its server-side handle, creating it with create() on
+        the use that reaches min_repeats. Returns None when the prefix should be sent inline:
+        too few repeats so far, caching failed, or another thread is creating the handle.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [0, None, 0.0]
+                while len(self._entries) > MAX_TRACKED_PREFIXES:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(key)
+            entry[0] += 1
+            if entry[1] is _FAILED or entry[0] < self.min_repeats:
+                return None
+            if entry[1] is not None and now < entry[2]:
+                return entry[1]
+            if key in self._creating:
+                return None
+            self._creating.add(key)
+
+        labels = {"provider": self.provider_name, "model": model_name}
+        try:
+            handle = create()
+        except Exception:
+            handle = _FAILED
+            metrics.inc("psi_prefix_cache_failures_total", labels)
+        else:
+            metrics.inc("psi_prefix_cache_creations_total", labels)
+        with self._lock:
+            self._creating.discard(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = handle
+                entry[2] = now + max(self.ttl_seconds - REFRESH_MARGIN_SECONDS, 0)
+        return None if handle is _FAILED else handle
+
+    def discard(self, key: Hashable):
+        """Forgets a handle the provider no longer honours; the next use creates a new one."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = None
+
+    def clear(self):
+        """Forgets every key and handle."""
+        with self._lock:
+            self._entries.clear()
@@ -3,18 +3,88 @@ import google.generativeai as genai
 from google.api_core import exceptions as google_exceptions
 import os
 import time
+import datetime
+import threading
 from typing import Type
 from pydantic import BaseModel
 
+from .. import cache_manager
+from .. import metrics
+from .. import prefix_cache
+from .. import reliability
 from .. import validator
 
 # --- Configuration ---
 MAX_RETRIES = 1 # Re-prompting is a form of retry, so we limit network retries
 INITIAL_BACKOFF_SECONDS = 1
+# Gemini only caches contexts above a minimum size, so smaller prompts are always sent inline.
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("PSI_GOOGLE_CONTEXT_CACHE_MIN_TOKENS", 32768))
 
-def _call_api(model, prompt):
+# --- Model Cache ---
+# Configuring the SDK and building a GenerativeModel are done once per API key and model
+# name rather than on every call.
+_models = {}
+_configured_api_key = None
+_models_lock = threading.Lock()
+_context_caches = prefix_cache.PrefixCache("google")
+
+def _get_model(model_name: str, api_key: str):
+    """Returns a configured GenerativeModel for model_name, reconfiguring if the API key changed."""
+    global _configured_api_key
+    with _models_lock:
+        if api_key != _configured_api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+            _models.clear()
+            _context_caches.clear() # Cached contexts belong to the previous key's project.
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = genai.GenerativeModel(model_name=model_name)
+        return model
+
+def _context_key(model_name: str, system_prompt: str) -> tuple:
+    """Identifies a cached context by model and exact prompt text."""
+    return (model_name, cache_manager._hash_prompt(system_prompt, False))
+
+def _get_cached_context_model(model_name: str, system_prompt: str):
+    """
+    Returns a model bound to a Gemini context cache holding system_prompt once the prompt has
+    repeated, or None when the prompt should be sent inline with the content.
+    """
+    if not prefix_cache.ENABLED or len(system_prompt) // 4 < CONTEXT_CACHE_MIN_TOKENS:
+        return None
+
+    def create():
+        cached_content = genai.caching.CachedContent.create(
+            model=model_name, system_instruction=system_prompt,
+            ttl=datetime.timedelta(seconds=prefix_cache.TTL_SECONDS)
+        )
+        return genai.GenerativeModel.from_cached_content(cached_content=cached_content)
+
+    return _context_caches.get(_context_key(model_name, system_prompt), model_name, create)
+
+def _call_api(model, prompt, generation_config: dict = None):
     """Internal function to make a single API call."""
-    return model.generate_content(prompt)
+    if generation_config is None:
+        return model.generate_content(prompt)
+    return model.generate_content(prompt, generation_config=generation_config)
+
+def _structured_output_config(validation_model: Type[BaseModel] | None) -> dict | None:
+    """Asks Gemini to constrain its output to the validation model's schema, so replies parse first time."""
+    if validation_model is None:
+        return None
+    return {"response_mime_type": "application/json", "response_schema": validation_model}
+
+def _get_usage(response) -> tuple:
+    """Reads (input_tokens, output_tokens) from a response's own usage metadata."""
+    usage_metadata = getattr(response, 'usage_metadata', None)
+    input_tokens = getattr(usage_metadata, 'prompt_token_count', 0) or 0
+    output_tokens = getattr(usage_metadata, 'candidates_token_count', 0) or 0
+    return input_tokens, output_tokens
+
+def _get_cached_tokens(response) -> int:
+    """Reads how many of a response's input tokens were served from a context cache."""
+    return getattr(getattr(response, 'usage_metadata', None), 'cached_content_token_count', 0) or 0
 
 def get_response(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel] = None) -> dict:
     """
@@ -24,23 +94,30 @@ def get_response(content: str, system_prompt: str, model_name: str, validation_m
     if not api_key:
         return {"error": True, "error_type": "CONFIG_ERROR", "message": "Google API key not found."}
 
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel(model_name=model_name)
-    full_prompt = f"{system_prompt}\n\n--- CONTENT TO ANALYZE ---\n\n{content}"
-    
+    model = _get_model(model_name, api_key)
+    generation_config = _structured_output_config(validation_model)
+    inline_prompt = f"{system_prompt}\n\n--- CONTENT TO ANALYZE ---\n\n{content}"
+    full_prompt = inline_prompt
+    # A repeated large system prompt is processed once into a context cache; only the content is sent.
+    cached_model = _get_cached_context_model(model_name, system_prompt)
+    if cached_model is not None:
+        model, full_prompt = cached_model, f"--- CONTENT TO ANALYZE ---\n\n{content}"
+
     last_error = None
     for attempt in range(MAX_RETRIES + 1): # Allow for one initial call + retries
         try:
             # --- API Call ---
-            response = _call_api(model, full_prompt)
+            response = _call_api(model, full_prompt, generation_config)
             final_response_text = response.text
+            input_tokens, output_tokens = _get_usage(response)
+            cached_tokens = _get_cached_tokens(response)
             pydantic_object = None
 
             # --- Validation and Re-prompt Logic ---
             if validation_model:
                 validation_attempt = validator.validate_response(final_response_text, validation_model)
                 
-                # If the first validation attempt fails, re-prompt the model once.
+                # Schema-constrained output and local repair make this rare; re-prompt once as a last resort.
                 if isinstance(validation_attempt, dict) and validation_attempt.get("error"):
                     reprompt_prompt = (
                         f"{full_prompt}\n\n"
@@ -48,8 +125,14 @@ def get_response(content: str, system_prompt: str, model_name: str, validation_m
                         f"{validation_attempt['details']}\n\n"
                         "Please correct your response and output only the valid JSON object."
                     )
-                    reprompt_response = _call_api(model, reprompt_prompt)
+                    metrics.inc("psi_reprompts_total", {"provider": "google", "model": model_name})
+                    reprompt_response = _call_api(model, reprompt_prompt, generation_config)
                     final_response_text = reprompt_response.text
+                    # Both calls are billed, so their usage is summed.
+                    reprompt_input_tokens, reprompt_output_tokens = _get_usage(reprompt_response)
+                    input_tokens += reprompt_input_tokens
+                    output_tokens += reprompt_output_tokens
+                    cached_tokens += _get_cached_tokens(reprompt_response)
                     
                     # Second and final validation attempt
                     final_validation_result = validator.validate_response(final_response_text, validation_model)
@@ -62,13 +145,13 @@ def get_response(content: str, system_prompt: str, model_name: str, validation_m
                     pydantic_object = validation_attempt # Success on the first try
             
             # --- Success Case ---
-            input_tokens = model.count_tokens(full_prompt).total_tokens
-            output_tokens = model.count_tokens(final_response_text).total_tokens
-            
+            usage = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+            if cached_tokens:
+                usage["cached_input_tokens"] = cached_tokens # Included in input_tokens, billed at the cached rate.
             return {
                 "provider_used": "google", "model_name": model_name,
                 "response_text": final_response_text,
-                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+                "usage": usage,
                 "validation_result": pydantic_object.model_dump() if pydantic_object else None
             }
 
@@ -78,7 +161,13 @@ def get_response(content: str, system_prompt: str, model_name: str, validation_m
             return {"error": True, "error_type": "BAD_REQUEST_ERROR", "message": "Invalid request.", "provider": "google", "details": str(e)}
         except Exception as e:
             last_error = e
-            time.sleep(INITIAL_BACKOFF_SECONDS)
-            continue
+            if cached_model is not None:
+                # The context cache may have expired or been deleted; retry with the prompt inline.
+                _context_caches.discard(_context_key(model_name, system_prompt))
+                cached_model = None
+                model, full_prompt = _get_model(model_name, api_key), inline_prompt
+            if attempt < MAX_RETRIES:
+                metrics.inc("psi_retries_total", {"provider": "google", "model": model_name})
+                time.sleep(reliability.backoff_delay(attempt, INITIAL_BACKOFF_SECONDS))
     
     return {"error": True, "error_type": "API_ERROR", "message": "An unexpected API error occurred.", "provider": "google", "details": str(last_error)}
\ No newline at end of file
@@ -1,71 +1,262 @@
 # This module contains the logic for interacting with a local LLM endpoint.
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
 import time
+import threading
+from typing import Iterator, Type
+from pydantic import BaseModel
+
+from .. import metrics
+from .. import reliability
+from .. import validator
 
 # --- Configuration ---
 MAX_RETRIES = 3
 INITIAL_BACKOFF_SECONDS = 1
+DEFAULT_POOL_SIZE = 10
+REQUEST_TIMEOUT_SECONDS = 120
+# LOCAL_MODEL_CACHE_PROMPT=1 asks llama.cpp-style servers to keep the processed prompt prefix
+# between requests ('cache_prompt'). vLLM's automatic prefix caching needs no request field.
+CACHE_PROMPT = os.getenv("LOCAL_MODEL_CACHE_PROMPT") == "1"
+
+# --- Connection Pool ---
+# A single keep-alive session is shared by every call (and thread) in the process, so
+# repeated calls reuse TCP/TLS connections instead of paying a fresh handshake each time.
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """Returns the module-level pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = int(os.getenv("LOCAL_MODEL_POOL_SIZE", DEFAULT_POOL_SIZE))
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
 
 def _estimate_tokens(text: str) -> int:
     """Provides a rough estimation of token count. A common heuristic is 4 chars/token."""
     return len(text) // 4
 
-def get_response(content: str, system_prompt: str, model_name: str) -> dict:
+def _config_error() -> dict:
+    """The standard error for a missing endpoint."""
+    return {
+        "error": True, "error_type": "CONFIG_ERROR",
+        "message": "Local model endpoint not found in environment.",
+        "provider": "local", "details": "Please set LOCAL_MODEL_ENDPOINT in your .env file."
+    }
+
+def _build_payload(content: str, system_prompt: str, model_name: str, stream: bool, validation_model: Type[BaseModel] = None) -> dict:
     """
-    Sends a request to a local LLM API endpoint and returns the response,
-    including standardized error handling.
+    Builds an OpenAI-style chat completion request body. With a validation model, the
+    model's JSON schema is sent as response_format so servers that support constrained
+    decoding (vLLM, llama.cpp, Ollama) can only produce conforming JSON.
     """
-    endpoint_url = os.getenv("LOCAL_MODEL_ENDPOINT")
-    if not endpoint_url:
-        return {
-            "error": True, "error_type": "CONFIG_ERROR",
-            "message": "Local model endpoint not found in environment.",
-            "provider": "local", "details": "Please set LOCAL_MODEL_ENDPOINT in your .env file."
-        }
-
-    headers = {"Content-Type": "application/json"}
-    full_prompt = f"{system_prompt}\n\n--- CONTENT TO ANALYZE ---\n\n{content}"
     payload = {
         "model": model_name,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": content}
         ],
-        "stream": False
+        "stream": stream
     }
-    last_error = None
+    if CACHE_PROMPT:
+        payload["cache_prompt"] = True
+    if validation_model is not None:
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": validation_model.__name__, "schema": validator.get_json_schema(validation_model)}
+        }
+    return payload
 
+def _post_structured(endpoint_url: str, payload: dict, stream: bool = False):
+    """
+    Posts a payload, retrying once without response_format if the endpoint rejects the
+    request outright, since older servers answer unknown fields with a 400.
+    """
+    response = _post(endpoint_url, payload, stream=stream)
+    status = getattr(getattr(response, 'response', None), 'status_code', None)
+    if isinstance(response, Exception) and status == 400 and "response_format" in payload:
+        payload = {k: v for k, v in payload.items() if k != "response_format"}
+        response = _post(endpoint_url, payload, stream=stream)
+    return response
+
+def _get_cached_tokens(response_data: dict) -> int:
+    """
+    Reads how many prompt tokens the server reused from its prefix cache: OpenAI/vLLM report
+    usage.prompt_tokens_details.cached_tokens, llama.cpp reports timings.cache_n.
+    """
+    details = (response_data.get('usage') or {}).get('prompt_tokens_details') or {}
+    return details.get('cached_tokens') or (response_data.get('timings') or {}).get('cache_n') or 0
+
+def _post(endpoint_url: str, payload: dict, stream: bool = False):
+    """
+    Posts a payload through the pooled session, retrying connection failures, 5xx and 429
+    responses with jittered exponential backoff. Returns the response, or the last exception
+    once retries are exhausted or the endpoint rejects the request.
+    """
+    headers = {"Content-Type": "application/json"}
+    last_error = None
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.post(endpoint_url, headers=headers, data=json.dumps(payload), timeout=120)
+            response = _get_session().post(endpoint_url, headers=headers, data=json.dumps(payload), timeout=REQUEST_TIMEOUT_SECONDS, stream=stream)
             response.raise_for_status()
-            response_data = response.json()
-            response_text = ""
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                if 'message' in response_data['choices'][0]:
-                     response_text = response_data['choices'][0]['message'].get('content', '')
-            response_data['usage'] = {
-                "input_tokens": _estimate_tokens(full_prompt),
-                "output_tokens": _estimate_tokens(response_text),
-                "note": "Token count is an estimation for local models."
-            }
-            return response_data
+            return response
         except requests.exceptions.RequestException as e:
             last_error = e
-            backoff = INITIAL_BACKOFF_SECONDS * (2 ** attempt)
-            time.sleep(backoff)
-            continue
+            status = getattr(e.response, 'status_code', None)
+            if status is not None and status < 500 and status != 429:
+                break # A rejected request will not succeed on retry.
+            if attempt < MAX_RETRIES - 1:
+                metrics.inc("psi_retries_total", {"provider": "local", "model": payload.get("model")})
+                time.sleep(reliability.backoff_delay(attempt, INITIAL_BACKOFF_SECONDS))
+    return last_error
+
+def _network_error(last_error: Exception) -> dict:
+    """The standard error for a failed request, classified by the endpoint's HTTP status if it answered."""
+    status = getattr(getattr(last_error, 'response', None), 'status_code', None)
+    if status in (401, 403):
+        error_type, message = "API_AUTH_ERROR", "The local model endpoint rejected the credentials."
+    elif status is not None and status < 500 and status != 429:
+        error_type, message = "BAD_REQUEST_ERROR", "The local model endpoint rejected the request."
+    elif status is not None:
+        error_type, message = "API_ERROR", "The local model endpoint kept failing after multiple retries."
+    else:
+        error_type, message = "NETWORK_ERROR", "Failed to connect to local model endpoint after multiple retries."
+    return {"error": True, "error_type": error_type, "message": message, "provider": "local", "details": str(last_error)}
+
+class LocalStream:
+    """
+    Iterates over the text deltas of a streaming (SSE) chat completion. After the first
+    delta arrives, time_to_first_token holds the seconds elapsed since the request was sent.
+    The full text received so far is available as text. The pooled connection is released
+    once the stream is exhausted or closed; use it as a context manager when a caller may
+    stop iterating early.
+    """
+    def __init__(self, response: requests.Response, started_at: float):
+        self._response = response
+        self._started_at = started_at
+        self.time_to_first_token = None
+        self.total_time = None
+        self.text = ""
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for line in self._response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                delta = (choices[0].get('delta') or {}).get('content')
+                if not delta:
+                    continue
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - self._started_at
+                self.text += delta
+                yield delta
+        finally:
+            self.close()
+
+    def close(self):
+        """Releases the connection. Safe to call more than once."""
+        if self.total_time is None:
+            self.total_time = time.perf_counter() - self._started_at
+        self._response.close()
+
+    def __enter__(self) -> 'LocalStream':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def stream_response(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel] = None) -> LocalStream | dict:
+    """
+    Sends a streaming request to the local endpoint. Returns a LocalStream of text deltas,
+    or a standardized error dictionary if the request could not be made. A validation
+    model's schema is sent as response_format, as in get_response; the deltas themselves
+    are not validated.
+    """
+    endpoint_url = os.getenv("LOCAL_MODEL_ENDPOINT")
+    if not endpoint_url:
+        return _config_error()
+
+    started_at = time.perf_counter()
+    payload = _build_payload(content, system_prompt, model_name, stream=True, validation_model=validation_model)
+    response = _post_structured(endpoint_url, payload, stream=True)
+    if isinstance(response, Exception):
+        return _network_error(response)
+    return LocalStream(response, started_at)
+
+def get_response(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel] = None) -> dict:
+    """
+    Sends a request to a local LLM API endpoint and returns the response,
+    including standardized error handling. Set LOCAL_MODEL_STREAM=1 to stream the
+    completion and record time-to-first-token in the result's 'timing'.
+    """
+    endpoint_url = os.getenv("LOCAL_MODEL_ENDPOINT")
+    if not endpoint_url:
+        return _config_error()
+
+    full_prompt = f"{system_prompt}\n\n--- CONTENT TO ANALYZE ---\n\n{content}"
+
+    if os.getenv("LOCAL_MODEL_STREAM") == "1":
+        stream = stream_response(content, system_prompt, model_name, validation_model=validation_model)
+        if isinstance(stream, dict):
+            return stream
+        with stream:
+            try:
+                response_text = "".join(stream)
+            except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
+                return {
+                    "error": True, "error_type": "API_ERROR",
+                    "message": "Failed to read streaming response from local model.",
+                    "provider": "local", "details": str(e)
+                }
+        response_data = {
+            "model": model_name,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": response_text}}],
+            "timing": {"time_to_first_token": stream.time_to_first_token, "total": stream.total_time}
+        }
+    else:
+        payload = _build_payload(content, system_prompt, model_name, stream=False, validation_model=validation_model)
+        response = _post_structured(endpoint_url, payload)
+        if isinstance(response, Exception):
+            return _network_error(response)
+        try:
+            response_data = response.json()
         except json.JSONDecodeError as e:
             return {
                 "error": True, "error_type": "API_ERROR",
                 "message": "Failed to decode JSON response from local model.",
                 "provider": "local", "details": response.text
             }
+        response_text = ""
+        if 'choices' in response_data and len(response_data['choices']) > 0:
+            if 'message' in response_data['choices'][0]:
+                 response_text = response_data['choices'][0]['message'].get('content', '')
 
-    return {
-        "error": True, "error_type": "NETWORK_ERROR",
-        "message": "Failed to connect to local model endpoint after multiple retries.",
-        "provider": "local", "details": str(last_error)
-    }
\ No newline at end of file
+    cached_tokens = _get_cached_tokens(response_data)
+    response_data['usage'] = {
+        "input_tokens": _estimate_tokens(full_prompt),
+        "output_tokens": _estimate_tokens(response_text),
+        "note": "Token count is an estimation for local models."
+    }
+    if cached_tokens:
+        response_data['usage']['cached_input_tokens'] = cached_tokens
+
+    if validation_model:
+        validation_result = validator.validate_response(response_text, validation_model)
+        if isinstance(validation_result, dict):
+            return validation_result
+        response_data['validation_result'] = validation_result.model_dump()
+
+    return response_data
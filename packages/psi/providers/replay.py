@@ -0,0 +1,101 @@
+# This module serves recorded or synthetic responses without calling a real LLM, for
+# benchmarks and tests that must not spend API quota.
+import os
+import json
+import time
+import random
+import threading
+from typing import Any, Dict, Type
+from pydantic import BaseModel
+
+from .. import validator
+from .. import cache_manager
+from .. import prefix_cache
+
+# --- Configuration ---
+# PSI_REPLAY_FILE: JSONL recordings, one {"content", "system_prompt", "model_name", "response"} object per line.
+# PSI_REPLAY_LATENCY_MS: a fixed latency ("50") or a uniform range ("20-80") added to every call.
+# PSI_REPLAY_ERROR_RATE: the fraction of calls (0.0-1.0) that fail with an API_ERROR.
+# Echoed responses report a repeated system prompt as cached_input_tokens, like a provider
+# with prefix caching (disabled by PSI_PREFIX_CACHE=0).
+
+_recordings = None
+_recordings_path = None
+_recordings_lock = threading.Lock()
+# System prompts already sent per model, to simulate a provider-side prefix cache.
+_seen_prefixes = set()
+_seen_prefixes_lock = threading.Lock()
+
+def _load_recordings() -> Dict[str, Dict[str, Any]]:
+    """Loads PSI_REPLAY_FILE into a map of cache key to recorded response, reloading if the path changed."""
+    global _recordings, _recordings_path
+    path = os.getenv("PSI_REPLAY_FILE")
+    with _recordings_lock:
+        if _recordings is not None and path == _recordings_path:
+            return _recordings
+        recordings = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    key = cache_manager._get_cache_key(record['content'], record['system_prompt'], record['model_name'])
+                    recordings[key] = record['response']
+        _recordings, _recordings_path = recordings, path
+        return recordings
+
+def _latency_seconds() -> float:
+    """Draws this call's synthetic latency from PSI_REPLAY_LATENCY_MS."""
+    spec = os.getenv("PSI_REPLAY_LATENCY_MS", "0")
+    low, _, high = spec.partition('-')
+    return random.uniform(float(low), float(high or low)) / 1000.0
+
+def _cached_prefix_tokens(system_prompt: str, model_name: str) -> int:
+    """Simulates prefix caching: a system prompt sent before to the same model counts as cached tokens."""
+    if not prefix_cache.ENABLED:
+        return 0
+    key = (model_name, cache_manager._hash_prompt(system_prompt, False))
+    with _seen_prefixes_lock:
+        cached = key in _seen_prefixes
+        _seen_prefixes.add(key)
+    return len(system_prompt) // 4 if cached else 0
+
+def record(path: str, content: str, system_prompt: str, model_name: str, response: Dict[str, Any]):
+    """Appends a response to a recordings file so it can be replayed later."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"content": content, "system_prompt": system_prompt, "model_name": model_name, "response": response}) + "\n")
+
+def get_response(content: str, system_prompt: str, model_name: str, validation_model: Type[BaseModel] = None) -> dict:
+    """
+    Returns the recorded response for this request, or a synthetic echo of the content when
+    none was recorded, after the configured latency. Fails at the configured error rate.
+    """
+    time.sleep(_latency_seconds())
+    if random.random() < float(os.getenv("PSI_REPLAY_ERROR_RATE", 0)):
+        return {
+            "error": True, "error_type": "API_ERROR",
+            "message": "Synthetic failure from the replay provider.",
+            "provider": "replay", "details": "Injected by PSI_REPLAY_ERROR_RATE."
+        }
+
+    recorded = _load_recordings().get(cache_manager._get_cache_key(content, system_prompt, model_name))
+    if recorded is not None:
+        result = dict(recorded)
+    else:
+        result = {
+            "provider_used": "replay",
+            "model_name": model_name,
+            "response_text": content,
+            "usage": {"input_tokens": (len(system_prompt) + len(content)) // 4, "output_tokens": len(content) // 4}
+        }
+        cached_tokens = _cached_prefix_tokens(system_prompt, model_name)
+        if cached_tokens:
+            result["usage"]["cached_input_tokens"] = cached_tokens
+
+    if validation_model:
+        validation_result = validator.validate_response(result.get('response_text', ''), validation_model)
+        if isinstance(validation_result, dict):
+            return validation_result
+        result['validation_result'] = validation_result.model_dump()
+    return result
@@ -0,0 +1,148 @@
+# --- Psi: Rate Limiter ---
+# Token buckets for requests-per-minute and tokens-per-minute budgets. Bucket state lives in
+# a small SQLite file so that every process sharing a quota draws from the same buckets.
+import os
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import Dict, List
+
+# --- Configuration ---
+STATE_PATH = os.environ.get(
+    "PSI_RATE_LIMIT_STATE",
+    os.path.join(os.path.dirname(__file__), '..', '..', '.cache', 'psi', 'rate_limits.sqlite3')
+)
+MAX_WAIT_SLICE_SECONDS = 1.0 # Waiters re-check at least this often in case other processes release budget.
+
+# A bucket holds up to `per_minute` units and refills continuously at per_minute / 60 units per second.
+Bucket = namedtuple('Bucket', ['name', 'per_minute'])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    level REAL NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+def buckets_for(provider_name: str, model_name: str, provider_limits: Dict, model_limits: Dict) -> List[Bucket]:
+    """
+    Builds the buckets that apply to a call from the 'requests_per_minute' and
+    'tokens_per_minute' settings of its provider and model.
+    """
+    buckets = []
+    for scope, limits in ((f"provider:{provider_name}", provider_limits or {}), (f"model:{model_name}", model_limits or {})):
+        if limits.get('requests_per_minute'):
+            buckets.append(Bucket(f"{scope}:requests", float(limits['requests_per_minute'])))
+        if limits.get('tokens_per_minute'):
+            buckets.append(Bucket(f"{scope}:tokens", float(limits['tokens_per_minute'])))
+    return buckets
+
+def _amount(bucket: Bucket, tokens: int) -> float:
+    """The units a call draws from a bucket, clamped so a single call can always fit a full bucket."""
+    amount = 1.0 if bucket.name.endswith(':requests') else float(tokens)
+    return min(amount, bucket.per_minute)
+
+class RateLimiter:
+    """Coordinates token buckets across threads and processes through a shared SQLite state file."""
+    def __init__(self, state_path: str = STATE_PATH):
+        self.state_path = state_path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening a new one after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        conn = sqlite3.connect(self.state_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _levels(self, conn: sqlite3.Connection, buckets: List[Bucket], now: float) -> Dict[str, float]:
+        """Reads each bucket's current level, including the refill since it was last updated."""
+        levels = {}
+        for bucket in buckets:
+            row = conn.execute("SELECT level, updated_at FROM buckets WHERE name = ?", (bucket.name,)).fetchone()
+            if row is None:
+                levels[bucket.name] = bucket.per_minute
+            else:
+                level, updated_at = row
+                levels[bucket.name] = min(bucket.per_minute, level + max(0.0, now - updated_at) * bucket.per_minute / 60.0)
+        return levels
+
+    def _store(self, conn: sqlite3.Connection, levels: Dict[str, float], now: float):
+        """Writes bucket levels back to the state file."""
+        conn.executemany(
+            "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+            [(name, level, now) for name, level in levels.items()]
+        )
+
+    def acquire(self, buckets: List[Bucket], tokens: int = 0) -> float:
+        """
+        Blocks until every bucket can cover the call, then draws from all of them atomically.
+        Waits only as long as the emptiest bucket needs to refill. Returns the seconds waited.
+        """
+        if not buckets:
+            return 0.0
+        conn = self._connect()
+        waited = 0.0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                levels = self._levels(conn, buckets, now)
+                wait = max(
+                    (_amount(b, tokens) - levels[b.name]) * 60.0 / b.per_minute
+                    for b in buckets
+                )
+                if wait <= 0:
+                    for bucket in buckets:
+                        levels[bucket.name] -= _amount(bucket, tokens)
+                    self._store(conn, levels, now)
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            if wait <= 0:
+                return waited
+            pause = min(wait, MAX_WAIT_SLICE_SECONDS)
+            time.sleep(pause)
+            waited += pause
+
+    def record_usage(self, buckets: List[Bucket], extra_tokens: int):
+        """
+        Draws tokens that were used beyond the estimate taken at acquire time. Buckets may go
+        negative, which delays later calls until the overspend has been refilled.
+        """
+        token_buckets = [b for b in buckets if b.name.endswith(':tokens')]
+        if not token_buckets or extra_tokens == 0:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            levels = self._levels(conn, token_buckets, now)
+            for bucket in token_buckets:
+                levels[bucket.name] -= extra_tokens
+            self._store(conn, levels, now)
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter() -> RateLimiter:
+    """Returns the process-wide rate limiter, creating it on first use."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,126 @@
+# --- Psi: Reliability Layer ---
+# Shared retry timing, per-provider circuit breakers and request hedging.
+import os
+import time
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict
+
+# --- Configuration ---
+MAX_BACKOFF_SECONDS = 30.0
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("PSI_BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.environ.get("PSI_BREAKER_RESET_SECONDS", 30))
+# Error types that indicate an unhealthy provider (as opposed to a bad request or bad config).
+TRANSIENT_ERROR_TYPES = {"API_ERROR", "NETWORK_ERROR"}
+
+def backoff_delay(attempt: int, base_seconds: float, cap_seconds: float = MAX_BACKOFF_SECONDS) -> float:
+    """
+    Exponential backoff with full jitter: a random delay between zero and base * 2^attempt
+    (capped), so clients that failed together don't retry in lockstep.
+    """
+    return random.uniform(0, min(cap_seconds, base_seconds * (2 ** attempt)))
+
+def is_transient(result: dict) -> bool:
+    """Checks whether a result is an error worth retrying elsewhere."""
+    return bool(result.get('error')) and result.get('error_type') in TRANSIENT_ERROR_TYPES
+
+# --- Circuit Breakers ---
+
+class CircuitBreaker:
+    """
+    Stops calls to a provider after failure_threshold consecutive transient failures. After
+    reset_seconds one trial call is let through: success closes the circuit, failure re-opens it.
+    """
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """One of "closed", "open" or "half-open" (open, but ready for a trial call)."""
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        """Checks whether a call may proceed, claiming the trial slot when half-open."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Gives back a claimed trial slot without recording an outcome, for calls abandoned before they were sent."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, result: dict):
+        """Updates the breaker with a call's outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+            if is_transient(result):
+                self.failures += 1
+                if self.opened_at is not None or self.failures >= self.failure_threshold:
+                    self.opened_at = time.monotonic()
+            else:
+                self.failures = 0
+                self.opened_at = None
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(provider_name: str) -> CircuitBreaker:
+    """Returns the process-wide breaker for a provider."""
+    with _breakers_lock:
+        breaker = _breakers.get(provider_name)
+        if breaker is None:
+            breaker = _breakers[provider_name] = CircuitBreaker()
+        return breaker
+
+def circuit_open_error(provider_name: str) -> dict:
+    """The standard error for a call refused by an open circuit."""
+    return {
+        "error": True, "error_type": "API_ERROR",
+        "message": f"Provider '{provider_name}' is failing; calls are paused by its circuit breaker.",
+        "provider": provider_name, "details": f"Retrying after {BREAKER_RESET_SECONDS:g}s without new failures."
+    }
+
+# --- Hedging ---
+
+_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="psi-hedge")
+
+def hedge(primary: Callable[[], dict], secondary: Callable[[], dict], hedge_after_seconds: float) -> dict:
+    """
+    Runs primary and, if it hasn't answered within hedge_after_seconds, also starts secondary.
+    A primary that fails transiently (or raises) before then starts secondary at once, so
+    hedging never gives up the failover a plain fallback would have made.
+    Returns the first successful result. An attempt that raises counts as failed, so the other
+    one is still awaited. If both fail, the primary's error is returned (or the secondary's,
+    if only the primary raised), and an exception is raised only if both raised. A losing
+    primary keeps running in the background so its own side effects, such as caching, still happen.
+    """
+    primary_future = _hedge_executor.submit(primary)
+    done, _ = wait([primary_future], timeout=hedge_after_seconds)
+    if done and primary_future.exception() is None and not is_transient(primary_future.result()):
+        return primary_future.result()
+
+    secondary_future = _hedge_executor.submit(secondary)
+    pending = {primary_future, secondary_future}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and not future.result().get('error'):
+                return future.result()
+    for future in (primary_future, secondary_future):
+        if future.exception() is None:
+            return future.result()
+    return primary_future.result()
@@ -0,0 +1,79 @@
+# --- Psi: Single-Flight Request Coalescing ---
+# Identical requests that miss the cache at the same time are collapsed into one provider
+# call. Threads share a future; processes take turns on a lock file per key and re-check
+# the cache once they hold it.
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; coalescing is then per-process only.
+    fcntl = None
+
+class _FileLock:
+    """An exclusive flock on <lock_dir>/<key>.lock, removed again by the holder on release."""
+    def __init__(self, lock_dir: str, key: str):
+        self.path = os.path.join(lock_dir, f"{key}.lock")
+        self._fd = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # A previous holder may have unlinked the file while we waited; lock the live one instead.
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    self._fd = fd
+                    return self
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def __exit__(self, *exc):
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+class SingleFlight:
+    """Runs at most one call per key at a time, handing its result to every concurrent caller."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], recheck: Callable[[], Any], lock_dir: str = None) -> Any:
+        """
+        Returns fn()'s result for key. Callers that arrive while the same key is in flight in
+        this process wait for and share that result. The caller that runs the call takes the
+        key's lock file in lock_dir and then calls recheck(); a truthy result (typically a
+        cache entry written meanwhile by another caller) is returned instead of calling fn().
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            result = future.result()
+            return dict(result) if isinstance(result, dict) else result
+
+        try:
+            if lock_dir and fcntl is not None:
+                with _FileLock(lock_dir, key):
+                    result = recheck() or fn()
+            else:
+                result = recheck() or fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
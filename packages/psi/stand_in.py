@@ -0,0 +1,104 @@
+# --- Psi: Stand-In Completion Server ---
+# A small OpenAI-compatible chat completion server for exercising the 'local' provider
+# (benchmarks and tests) without a real model behind it.
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+DEFAULT_REPLY = '{"name": "stand-in", "value": 1, "is_correct": true}'
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Answers chat completions as JSON, or as SSE chunks when streaming is requested."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # Headers and body go out as separate writes; avoid delayed-ACK stalls.
+
+    def do_POST(self):
+        stand_in = self.server.stand_in
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        stand_in._record(self.client_address, payload)
+        if any(field in payload for field in stand_in.reject_fields):
+            self.send_error(400, "Unsupported request field")
+            return
+        time.sleep(stand_in.latency_ms / 1000.0)
+        if payload.get("stream"):
+            chunks = [{"choices": [{"delta": {"content": chunk}}]} for chunk in stand_in.stream_chunks]
+            body = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": stand_in.reply}}],
+                "usage": stand_in._usage(payload)
+            })
+            content_type = "application/json"
+        encoded = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    """A threading server with a listen backlog deep enough for concurrent benchmark clients."""
+    request_queue_size = 128
+    daemon_threads = True
+
+class StandInServer:
+    """
+    Runs the stand-in server on a free localhost port in a background thread. Use it as a
+    context manager and point LOCAL_MODEL_ENDPOINT at its endpoint. Streaming replies are
+    sent as stream_chunks (the whole reply in one chunk by default). Requests carrying any
+    of reject_fields get a 400, like an older server that doesn't know those fields. Like a
+    server with prefix caching, it reports a repeated system prompt as cached prompt tokens.
+    """
+    def __init__(self, reply: str = DEFAULT_REPLY, stream_chunks: List[str] = None, latency_ms: float = 0, reject_fields: Tuple[str, ...] = ()):
+        self.reply = reply
+        self.stream_chunks = stream_chunks or [reply]
+        self.latency_ms = latency_ms
+        self.reject_fields = reject_fields
+        self.requests = 0
+        self.payloads = []
+        self._seen_prefixes = set()
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1/chat/completions"
+
+    def _record(self, client_address, payload: dict):
+        with self._lock:
+            self.requests += 1
+            self.payloads.append(payload)
+            self.connections.add(client_address)
+
+    def _usage(self, payload: dict) -> dict:
+        """Estimates usage (4 chars/token), counting a previously seen system prompt as cached."""
+        messages = payload.get("messages") or []
+        prefix = messages[0]["content"] if messages and messages[0].get("role") == "system" else ""
+        with self._lock:
+            cached = prefix in self._seen_prefixes
+            self._seen_prefixes.add(prefix)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        return {
+            "prompt_tokens": prompt_chars // 4, "completion_tokens": len(self.reply) // 4,
+            "prompt_tokens_details": {"cached_tokens": len(prefix) // 4 if cached else 0}
+        }
+
+    def __enter__(self):
+        self._server = _StandInHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self._server.stand_in = self
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
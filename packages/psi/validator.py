@@ -1,11 +1,55 @@
 # --- Psi: Pydantic Response Validator ---
-import json
-from typing import Type
-from pydantic import BaseModel, ValidationError
+import re
+import functools
+from typing import Iterator, Type
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from . import metrics
+
+_FENCED_BLOCK = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+@functools.lru_cache(maxsize=None)
+def _get_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Builds the validator for a model once; later validations reuse it."""
+    return TypeAdapter(model)
+
+@functools.lru_cache(maxsize=None)
+def get_json_schema(model: Type[BaseModel]) -> dict:
+    """Returns a model's JSON schema, for providers with native structured output."""
+    return model.model_json_schema()
+
+def extract_json(text: str) -> str | None:
+    """Pulls the outermost JSON object or array out of a response wrapped in markdown fences or prose."""
+    match = _FENCED_BLOCK.search(text)
+    if match:
+        text = match.group(1)
+    starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+    if not starts:
+        return None
+    end = max(text.rfind('}'), text.rfind(']'))
+    start = min(starts)
+    return text[start:end + 1] if end > start else None
+
+def repair_json(text: str) -> str:
+    """Fixes the most common LLM JSON slip: trailing commas before a closing bracket."""
+    return _TRAILING_COMMA.sub(r"\1", text)
+
+def _candidates(json_string: str) -> Iterator[str]:
+    """Yields the extracted and repaired forms of a response that differ from the original."""
+    seen = {json_string}
+    extracted = extract_json(json_string)
+    for candidate in (extracted, repair_json(extracted) if extracted else None):
+        if candidate and candidate not in seen:
+            seen.add(candidate)
+            yield candidate
 
 def validate_response(json_string: str, model: Type[BaseModel]):
     """
     Attempts to parse and validate a JSON string against a given Pydantic model.
+    Parsing and validation happen in a single pass. If the raw text fails, JSON is
+    extracted from markdown fences or surrounding prose and repaired locally before
+    giving up, so callers only need to re-prompt when the content itself is wrong.
 
     Args:
         json_string: The JSON string response from the LLM.
@@ -15,21 +59,30 @@ def validate_response(json_string: str, model: Type[BaseModel]):
         An instance of the Pydantic model on success, or a standardized
         error dictionary on failure.
     """
+    adapter = _get_adapter(model)
     try:
-        data = json.loads(json_string)
-        validated_model = model.model_validate(data)
-        return validated_model
+        return adapter.validate_json(json_string)
     except ValidationError as e:
-        return {
-            "error": True,
-            "error_type": "VALIDATION_ERROR",
-            "message": "The LLM response did not conform to the required format.",
-            "details": str(e)
-        }
-    except json.JSONDecodeError as e:
+        first_error = e
+
+    for candidate in _candidates(json_string):
+        try:
+            validated_model = adapter.validate_json(candidate)
+        except ValidationError:
+            continue
+        metrics.inc("psi_validation_repairs_total", {"model": model.__name__})
+        return validated_model
+
+    if any(error['type'] == 'json_invalid' for error in first_error.errors()):
         return {
             "error": True,
             "error_type": "VALIDATION_ERROR",
             "message": "The LLM response was not valid JSON.",
-            "details": str(e)
-        }
\ No newline at end of file
+            "details": str(first_error)
+        }
+    return {
+        "error": True,
+        "error_type": "VALIDATION_ERROR",
+        "message": "The LLM response did not conform to the required format.",
+        "details": str(first_error)
+    }
@@ -0,0 +1,16 @@
+import pytest
+from forge.packages.psi import cache_manager, client, daemon
+
+@pytest.fixture
+def isolated_cache(monkeypatch, tmp_path):
+    """
+    Points the Psi client at an empty cache in a temporary directory, with no bundles mounted,
+    a fresh in-memory LRU and no running daemon, so no state leaks between tests.
+    """
+    monkeypatch.setattr(daemon, "DISABLED", True)
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_manager, "CACHE_BUNDLES", [])
+    monkeypatch.setattr(cache_manager, "_backend", None)
+    monkeypatch.setattr(cache_manager, "_bundles", None)
+    monkeypatch.setattr(client, "_memory_cache", client.MemoryCache(is_valid=cache_manager.is_entry_valid))
+    return tmp_path
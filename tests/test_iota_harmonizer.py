@@ -0,0 +1,30 @@
+from forge.apps.cli_tools.iota import harmonizer
+from forge.apps.cli_tools.iota.formats.obsidian import ObsidianFormatProvider
+
+def test_oracle_gets_the_paragraph_of_each_match(monkeypatch):
+    """Tests that a repeated line is given its own paragraph as context, including the first one."""
+    # --- Arrange ---
+    paragraphs = []
+    monkeypatch.setattr(harmonizer, "_consult_oracle", lambda paragraph, term, lexicon: paragraphs.append(paragraph) or True)
+    content = "Echo starts here.\n\nOther words.\nEcho starts here.\n\n\nLast words.\n"
+
+    # --- Act ---
+    result = harmonizer.harmonize_content(content, {"Echo": "World/Echo"}, ObsidianFormatProvider())
+
+    # --- Assert ---
+    assert paragraphs == ["Echo starts here.", "Other words.\nEcho starts here."]
+    assert result == "[[World/Echo|Echo]] starts here.\n\nOther words.\n`Echo` starts here.\n\n\nLast words.\n"
+
+def test_document_index_matches_a_text_scan():
+    """Tests that bisecting the paragraph index finds the same paragraph as scanning the text."""
+    lines = ["a b", "", "c d", "e f", "", "", "g h", "i"]
+    document = harmonizer._DocumentIndex(lines)
+    text = "\n".join(lines)
+
+    for line_num, line in enumerate(lines):
+        for column in range(len(line)):
+            index = document.line_starts[line_num] + column
+            start = text.rfind('\n\n', 0, index)
+            end = text.find('\n\n', index)
+            expected = text[start + 2 if start != -1 else 0:end if end != -1 else len(text)]
+            assert document.paragraph_at(line_num, column) == expected
@@ -0,0 +1,42 @@
+import re
+import random
+from forge.apps.cli_tools.iota.matcher import LexiconMatcher
+from forge.apps.cli_tools.iota.harmonizer import harmonize_content
+from forge.apps.cli_tools.iota.formats.obsidian import ObsidianFormatProvider
+
+def _terms(matcher: LexiconMatcher, text: str) -> list:
+    return [m.group(1) for m in matcher.finditer(text)]
+
+def test_matches_are_leftmost_longest_whole_words():
+    """Tests that the longest term wins, falling back to a shorter one when the longer isn't a whole word."""
+    # --- Arrange ---
+    matcher = LexiconMatcher({"Echo": "Echo", "Echo Chamber": "Echo-Chamber", "Prime": "Prime"})
+
+    # --- Act & Assert ---
+    assert _terms(matcher, "An Echo Chamber and an Echo.") == ["Echo Chamber", "Echo"]
+    assert _terms(matcher, "An Echo Chamberlain, Primer and Prime.") == ["Echo", "Prime"]
+    assert _terms(LexiconMatcher({}), "Echo") == []
+
+def test_matches_agree_with_a_sorted_alternation():
+    """Tests that the trie regex finds exactly what the longest-first alternation it replaces found."""
+    rng = random.Random(7)
+    words = ["Echo", "Echoes", "Prime", "Prime Resonance", "Res", "Resonance", "Void", "Void-Walker", "C++", "a.b"]
+    lexicon = {w: w for w in words}
+    alternation = re.compile(r'\b(' + '|'.join(re.escape(k) for k in sorted(lexicon, key=len, reverse=True)) + r')\b')
+    matcher = LexiconMatcher(lexicon)
+
+    for _ in range(200):
+        text = " ".join(rng.choice(words + ["the", "Echoing", "Primes", "x"]) for _ in range(12))
+        assert [(m.start(), m.group(1)) for m in matcher.finditer(text)] == [(m.start(), m.group(1)) for m in alternation.finditer(text)]
+
+def test_harmonize_content_reuses_a_shared_matcher():
+    """Tests that a matcher built once can harmonize several documents."""
+    lexicon = {"Echo": "World/Echo"}
+    matcher = LexiconMatcher(lexicon)
+    provider = ObsidianFormatProvider()
+
+    first = harmonize_content("We met an Echo and another Echo.\n", lexicon, provider, matcher)
+    second = harmonize_content("Nothing here.\n", lexicon, provider, matcher)
+
+    assert first == "We met an [[World/Echo|Echo]] and another `Echo`.\n"
+    assert second == "Nothing here.\n"
@@ -0,0 +1,48 @@
+import io
+import json
+import sys
+import time
+import types
+from forge.packages.psi import client, main as psi_main
+
+def test_iter_responses_streams_in_input_order(monkeypatch, isolated_cache):
+    """Tests that results come back in input order even when later requests finish first."""
+    # --- Arrange ---
+    def get_response(content, system_prompt, model_name, validation_model=None):
+        time.sleep(0.05 if content == "slow" else 0)
+        return {"response_text": content}
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: types.SimpleNamespace(get_response=get_response))
+    requests = [{"content": c, "system_prompt": "p", "model_name": "replay"} for c in ("slow", "fast-1", "fast-2")]
+    requests.insert(1, {"error": True, "error_type": "BAD_REQUEST_ERROR", "message": "bad line"})
+
+    # --- Act ---
+    results = list(client.iter_oracle_responses(iter(requests), max_concurrency=3))
+
+    # --- Assert ---
+    assert [r.get("response_text", r.get("message")) for r in results] == ["slow", "bad line", "fast-1", "fast-2"]
+
+def test_batch_cli_reads_jsonl_and_writes_jsonl(monkeypatch, tmp_path, isolated_cache):
+    """Tests 'psi --batch' end to end with the replay model, including per-line errors."""
+    # --- Arrange ---
+    prompt_file = tmp_path / "prompt.txt"
+    prompt_file.write_text("Echo the content.")
+    lines = [
+        json.dumps({"content": "first"}),
+        "not json",
+        json.dumps({"content": "second", "validate_with": "Missing"}),
+        json.dumps({"content": "first"}),
+    ]
+    monkeypatch.setattr(sys, "argv", ["psi", "--batch", "--model", "replay", "--prompt-file", str(prompt_file), "--concurrency", "1"])
+    monkeypatch.setattr(sys, "stdin", io.StringIO("\n".join(lines) + "\n"))
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", stdout)
+
+    # --- Act ---
+    psi_main.main()
+
+    # --- Assert ---
+    results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert results[0]["response_text"] == "first"
+    assert results[1]["error_type"] == "BAD_REQUEST_ERROR" and "line 2" in results[1]["message"]
+    assert "Unknown validation model" in results[2]["details"]
+    assert results[3]["response_text"] == "first"
@@ -0,0 +1,63 @@
+from forge.packages.psi import bench
+from forge.packages.psi.providers import replay
+
+# --- Tests for the replay provider ---
+
+def test_replay_serves_recorded_responses(monkeypatch, tmp_path):
+    """Tests that a recorded response is replayed and unrecorded requests are echoed."""
+    # --- Arrange ---
+    recordings = tmp_path / "recordings.jsonl"
+    replay.record(str(recordings), "question", "prompt", "replay", {"provider_used": "google", "response_text": "recorded answer"})
+    monkeypatch.setenv("PSI_REPLAY_FILE", str(recordings))
+
+    # --- Act ---
+    recorded = replay.get_response("question", "prompt", "replay")
+    echoed = replay.get_response("something else", "prompt", "replay")
+
+    # --- Assert ---
+    assert recorded["response_text"] == "recorded answer"
+    assert echoed["response_text"] == "something else"
+    assert echoed["provider_used"] == "replay"
+
+def test_replay_injects_errors(monkeypatch):
+    """Tests that PSI_REPLAY_ERROR_RATE produces standardized API errors."""
+    monkeypatch.setenv("PSI_REPLAY_ERROR_RATE", "1.0")
+
+    result = replay.get_response("question", "prompt", "replay")
+
+    assert result["error"] is True
+    assert result["error_type"] == "API_ERROR"
+    assert result["provider"] == "replay"
+
+# --- Tests for the benchmark harness ---
+
+def test_benchmark_reports_hit_ratio_and_percentiles(isolated_cache):
+    """Tests that a sequential run over repeated requests reports the expected hit ratio."""
+    # --- Arrange ---
+    requests = bench.build_requests(count=20, unique=5, model_name="replay")
+
+    # --- Act ---
+    summary = bench.run_benchmark(requests, concurrency=1)
+
+    # --- Assert ---
+    assert summary["requests"] == 20
+    assert summary["errors"] == 0
+    assert summary["cache_hit_ratio"] == 0.75
+    assert 0 <= summary["latency_ms"]["p50"] <= summary["latency_ms"]["p95"] <= summary["latency_ms"]["p99"] <= summary["latency_ms"]["max"]
+    assert summary["throughput_rps"] > 0
+
+def test_percentile_uses_nearest_rank():
+    """Tests the nearest-rank percentile on a small sample."""
+    values = [float(v) for v in range(1, 101)]
+
+    assert bench._percentile(values, 50) == 50.0
+    assert bench._percentile(values, 99) == 99.0
+    assert bench._percentile([], 50) == 0.0
+
+def test_percentile_rounds_the_rank_up():
+    """Tests that a fractional rank rounds up, so p95 of ten samples is the slowest one."""
+    values = [float(v) for v in range(1, 11)]
+
+    assert bench._percentile(values, 95) == 10.0
+    assert bench._percentile(values, 50) == 5.0
+    assert bench._percentile(values, 1) == 1.0
@@ -1,3 +1,4 @@
+import sys
 import hashlib
 from forge.packages.psi import cache_manager
 
@@ -38,4 +39,41 @@ def test_get_cache_key_sensitivity():
     
     # --- Assert ---
     assert key_original != key_content_changed
-    assert key_original != key_prompt_changed
\ No newline at end of file
+    assert key_original != key_prompt_changed
+
+def test_prompt_hash_is_memoized(monkeypatch):
+    """
+    Tests that a repeated system prompt is only hashed once per process, without the memo keeping the prompt alive.
+    """
+    # --- Arrange ---
+    monkeypatch.setattr(cache_manager, "_prompt_hashes", cache_manager.OrderedDict())
+    digests = []
+    original_digest = cache_manager._digest_prompt
+    monkeypatch.setattr(cache_manager, "_digest_prompt", lambda prompt, normalize: digests.append(1) or original_digest(prompt, normalize))
+    system_prompt = "A large system prompt. " * 10_000
+    references_before = sys.getrefcount(system_prompt)
+
+    # --- Act ---
+    keys = {cache_manager._get_cache_key("content", system_prompt, "gemini-1.5-pro") for _ in range(5)}
+
+    # --- Assert ---
+    assert len(digests) == 1
+    assert len(keys) == 1
+    assert sys.getrefcount(system_prompt) == references_before
+
+def test_prompt_whitespace_normalization_is_opt_in(monkeypatch):
+    """
+    Tests that trailing spaces and extra blank lines only stop mattering when normalization is enabled.
+    """
+    # --- Arrange ---
+    prompt = "Rule one.\n\nRule two."
+    messy_prompt = "Rule one.   \n\n\n\nRule two.\n"
+
+    # --- Act ---
+    strict = cache_manager._get_cache_key("c", prompt, "m") == cache_manager._get_cache_key("c", messy_prompt, "m")
+    monkeypatch.setattr(cache_manager, "NORMALIZE_PROMPT_WHITESPACE", True)
+    normalized = cache_manager._get_cache_key("c", prompt, "m") == cache_manager._get_cache_key("c", messy_prompt, "m")
+
+    # --- Assert ---
+    assert strict is False
+    assert normalized is True
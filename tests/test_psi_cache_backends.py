@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+from forge.packages.psi import cache_manager
+from forge.packages.psi.cache_backends import FileCacheBackend, SQLiteCacheBackend
+
+def _entry(text: str, timestamp: float = None) -> dict:
+    """Builds a cache entry in the current schema."""
+    entry = cache_manager.make_entry("gemini-1.5-pro", {"response_text": text, "provider_used": "google"}, "prompt.txt")
+    if timestamp is not None:
+        entry["timestamp"] = timestamp
+    return entry
+
+def test_sqlite_backend_round_trip(tmp_path):
+    """Tests that an entry survives a write/read cycle through the SQLite store."""
+    # --- Arrange ---
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+    entry = _entry("hello " * 100)
+
+    # --- Act ---
+    backend.write("k1", entry)
+    loaded = backend.read("k1")
+
+    # --- Assert ---
+    assert loaded == entry
+    assert backend.read("missing") is None
+    backend.delete("k1")
+    assert backend.read("k1") is None
+
+def test_sqlite_backend_concurrent_writers(tmp_path):
+    """Tests that several threads can write to the same store without losing entries."""
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+
+    def writer(offset):
+        for i in range(20):
+            backend.write(f"k{offset}-{i}", _entry(str(i)))
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert all(backend.read(f"k{n}-{i}") is not None for n in range(4) for i in range(20))
+
+def test_new_sqlite_store_migrates_file_entries(tmp_path, monkeypatch):
+    """Tests that legacy per-file entries are imported when the SQLite store is first created."""
+    # --- Arrange ---
+    FileCacheBackend(str(tmp_path)).write("ab" + "0" * 62, _entry("legacy"))
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_manager, "CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(cache_manager, "_backend", None)
+
+    # --- Act ---
+    entry = cache_manager.read_entry("ab" + "0" * 62)
+
+    # --- Assert ---
+    assert entry["response"]["response_text"] == "legacy"
+    assert (tmp_path / cache_manager.CACHE_DB_FILENAME).exists()
+
+def test_migration_skips_entries_from_older_schemas(tmp_path, monkeypatch):
+    """Tests that legacy entries keyed under an older schema are not imported under their stale keys."""
+    # --- Arrange ---
+    legacy = FileCacheBackend(str(tmp_path))
+    outdated = _entry("outdated")
+    outdated["cache_schema_version"] = "1.0"
+    legacy.write("ab" + "1" * 62, outdated)
+    legacy.write("ab" + "2" * 62, _entry("current"))
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_manager, "CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(cache_manager, "_backend", None)
+
+    # --- Act ---
+    stats = cache_manager.get_cache_stats()
+
+    # --- Assert ---
+    assert stats["entries"] == 1
+    assert cache_manager._get_backend().read("ab" + "1" * 62) is None
+    assert cache_manager.migrate_file_cache() == 0
+
+def test_expired_entries_are_removed(tmp_path, monkeypatch):
+    """Tests that entries older than the TTL are treated as misses and deleted."""
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_manager, "_backend", None)
+    stale_time = time.time() - cache_manager.CACHE_TTL_SECONDS - 10
+    cache_manager.write_entry("stale", _entry("old", timestamp=stale_time))
+
+    assert cache_manager.read_entry("stale") is None
+    assert cache_manager._get_backend().read("stale") is None
+
+# --- Tests for pruning ---
+
+def test_sqlite_prune_evicts_least_recently_used(tmp_path):
+    """Tests that pruning drops expired entries first, then the least recently accessed ones."""
+    # --- Arrange ---
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+    now = time.time()
+    backend.write("expired", _entry("x", timestamp=now - 1000))
+    backend.write("old", _entry("a" * 500, timestamp=now - 30))
+    backend.write("new", _entry("b" * 500, timestamp=now - 20))
+    entry_size = len(SQLiteCacheBackend._encode(_entry("b" * 500)))
+
+    # --- Act ---
+    result = backend.prune(ttl_seconds=500, max_bytes=entry_size + 1, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+
+    # --- Assert ---
+    assert result == {"expired": 1, "evicted": 1}
+    assert backend.read("old") is None
+    assert backend.read("new") is not None
+
+def test_file_prune_removes_unreadable_and_expired(tmp_path):
+    """Tests that the file backend's prune cleans up unreadable and expired files."""
+    backend = FileCacheBackend(str(tmp_path))
+    backend.write("aa1", _entry("fresh"))
+    backend.write("aa2", _entry("stale", timestamp=time.time() - 1000))
+    (tmp_path / "aa" / "aa3").write_text("{not json")
+
+    result = backend.prune(ttl_seconds=500, max_bytes=10_000_000, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+
+    assert result == {"expired": 2, "evicted": 0}
+    assert backend.read("aa1") is not None
+    assert backend.stats()["entries"] == 1
+
+def test_clear_cache(tmp_path, monkeypatch):
+    """Tests that clearing removes every entry."""
+    monkeypatch.setattr(cache_manager, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache_manager, "_backend", None)
+    cache_manager.write_entry("k1", _entry("one"))
+    cache_manager.write_entry("k2", _entry("two"))
+
+    assert cache_manager.clear_cache() == 2
+    assert cache_manager.get_cache_stats()["entries"] == 0
+
+# --- Tests for content-addressed prompts ---
+
+def test_prompts_are_stored_once_and_pruned_with_their_entries(tmp_path):
+    """Tests that entries share one stored prompt, which is removed once no entry refers to it."""
+    # --- Arrange ---
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"))
+    backend.prompt_grace_seconds = 0
+    prompt = "You are a meticulous reviewer. " * 1000
+    prompt_hash = cache_manager.get_prompt_hash(prompt)
+    for key in ("k1", "k2"):
+        backend.write_prompt(prompt_hash, prompt)
+        entry = _entry(key)
+        entry["prompt_hash"] = prompt_hash
+        backend.write(key, entry)
+
+    # --- Act ---
+    stats = backend.stats()
+    backend.prune(ttl_seconds=500, max_bytes=0, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+
+    # --- Assert ---
+    assert stats["prompts"] == 1
+    assert stats["prompt_bytes"] < len(prompt)
+    assert backend.read("k1") is None
+    assert backend.read_prompt(prompt_hash) is None
+
+def test_prune_keeps_prompts_stored_within_the_grace_period(tmp_path):
+    """Tests that a prompt stored just before its entry survives a prune that runs in between."""
+    for backend in (SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")), FileCacheBackend(str(tmp_path / "files"))):
+        # --- Arrange ---
+        backend.write_prompt("ab" * 32, "system prompt")
+
+        # --- Act ---
+        backend.prune(ttl_seconds=500, max_bytes=0, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+        kept = backend.read_prompt("ab" * 32)
+        backend.prompt_grace_seconds = 0
+        backend.prune(ttl_seconds=500, max_bytes=0, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+
+        # --- Assert ---
+        assert kept == "system prompt"
+        assert backend.read_prompt("ab" * 32) is None
+
+def test_prompt_bytes_count_against_the_size_budget(tmp_path):
+    """Tests that prune evicts entries until their prompts, too, fit within max_bytes."""
+    for backend in (SQLiteCacheBackend(str(tmp_path / "cache.sqlite3")), FileCacheBackend(str(tmp_path / "files"))):
+        # --- Arrange ---
+        backend.prompt_grace_seconds = 0
+        for i in range(20):
+            prompt = os.urandom(10_000).hex() # Unique per call and incompressible, like Iota's prompts.
+            prompt_hash = cache_manager.get_prompt_hash(prompt)
+            backend.write_prompt(prompt_hash, prompt)
+            entry = _entry(str(i), timestamp=time.time() - 20 + i)
+            entry["prompt_hash"] = prompt_hash
+            backend.write(f"ab{i:02d}", entry)
+
+        # --- Act ---
+        result = backend.prune(ttl_seconds=500, max_bytes=100_000, schema_version=cache_manager.CACHE_SCHEMA_VERSION)
+        stats = backend.stats()
+
+        # --- Assert ---
+        assert result["evicted"] > 0
+        assert stats["bytes"] <= 100_000
+        assert stats["prompts"] == stats["entries"] > 0
+
+def test_file_backend_stores_prompts_by_hash(tmp_path):
+    """Tests that the file backend keeps prompts as plain files outside the entry shards."""
+    backend = FileCacheBackend(str(tmp_path))
+    backend.write_prompt("ab" * 32, "system prompt")
+
+    assert backend.read_prompt("ab" * 32) == "system prompt"
+    assert backend.stats() == {"backend": "file", "location": str(tmp_path), "entries": 0, "bytes": 13, "prompts": 1, "prompt_bytes": 13}
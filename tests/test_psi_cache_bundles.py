@@ -0,0 +1,68 @@
+import os
+import pytest
+from forge.packages.psi import cache_manager
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """Points the cache at an empty scratch directory with no extra bundles mounted."""
+    original_dir = cache_manager.CACHE_DIR
+    monkeypatch.setattr(cache_manager, "CACHE_BUNDLES", [])
+    cache_manager.set_cache_dir(str(tmp_path / "cache"))
+    yield tmp_path
+    cache_manager.set_cache_dir(original_dir)
+
+def test_exported_bundle_warms_an_empty_cache(cache_dir):
+    """Tests that entries exported from one cache are served from a bundle in another."""
+    # --- Arrange ---
+    cache_manager.set_cached_response("content", "prompt", "gemini-1.5-pro", {"response_text": "answer", "provider_used": "google"}, "p.txt")
+    exported = cache_manager.export_bundle(str(cache_dir))
+    cache_manager.set_cache_dir(str(cache_dir / "fresh"))
+
+    # --- Act ---
+    imported = cache_manager.import_bundle(exported["path"])
+    result = cache_manager.get_cached_response("content", "prompt", "gemini-1.5-pro")
+
+    # --- Assert ---
+    assert exported["entries"] == 1 and exported["prompts"] == 1
+    assert os.path.basename(exported["path"]) == f"{exported['digest'][:16]}{cache_manager.BUNDLE_SUFFIX}"
+    assert imported["installed"] and imported["entries"] == 1
+    assert result["response_text"] == "answer"
+    assert cache_manager.get_prompt(cache_manager.get_prompt_hash("prompt")) == "prompt"
+    assert cache_manager._get_backend().stats()["entries"] == 0 # Served from the bundle, not copied.
+
+def test_local_entries_take_precedence_over_bundles(cache_dir, monkeypatch):
+    """Tests that lookups try the local store before a bundle listed in PSI_CACHE_BUNDLES."""
+    cache_manager.set_cached_response("content", "prompt", "gemini-1.5-pro", {"response_text": "old"}, "p.txt")
+    bundle_path = cache_manager.export_bundle(str(cache_dir / "shared.psibundle"))["path"]
+    cache_manager.set_cache_dir(str(cache_dir / "fresh"))
+    monkeypatch.setattr(cache_manager, "CACHE_BUNDLES", [bundle_path])
+
+    assert cache_manager.get_cached_response("content", "prompt", "gemini-1.5-pro")["response_text"] == "old"
+    cache_manager.set_cached_response("content", "prompt", "gemini-1.5-pro", {"response_text": "new"}, "p.txt")
+
+    assert cache_manager.get_cached_response("content", "prompt", "gemini-1.5-pro")["response_text"] == "new"
+    assert cache_manager.import_bundle(bundle_path)["installed"] is True
+    assert cache_manager.import_bundle(bundle_path)["installed"] is False
+
+def test_unreadable_bundle_is_reported_as_unavailable(cache_dir, monkeypatch):
+    """Tests that stats still work when a mounted bundle can't be read."""
+    broken = cache_dir / "broken.psibundle"
+    broken.write_bytes(b"not a database")
+    monkeypatch.setattr(cache_manager, "CACHE_BUNDLES", [str(broken)])
+
+    bundles = cache_manager.get_cache_stats()["bundles"]
+
+    assert bundles[0]["location"] == str(broken)
+    assert bundles[0]["entries"] is None and bundles[0]["error"]
+
+def test_failed_export_leaves_no_temporary_file(cache_dir, monkeypatch):
+    """Tests that an export failing part-way removes its temporary bundle."""
+    cache_manager.set_cached_response("content", "prompt", "gemini-1.5-pro", {"response_text": "answer"}, "p.txt")
+    def fail(path):
+        raise OSError("disk full")
+    monkeypatch.setattr(cache_manager, "_file_digest", fail)
+
+    with pytest.raises(OSError):
+        cache_manager.export_bundle(str(cache_dir))
+
+    assert not [name for name in os.listdir(cache_dir) if name.startswith(".psi-bundle")]
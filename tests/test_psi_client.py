@@ -0,0 +1,167 @@
+import os
+import sys
+import types
+import subprocess
+import asyncio
+import threading
+import time
+import yaml
+from forge.packages.psi import client
+
+def _fake_provider(calls: list):
+    """Builds a stand-in provider module that records each dispatched request."""
+    def get_response(content, system_prompt, model_name, validation_model=None):
+        calls.append(content)
+        return {"provider_used": "fake", "model_name": model_name, "response_text": f"echo: {content}"}
+    return types.SimpleNamespace(get_response=get_response)
+
+# --- Tests for provider configuration ---
+
+def test_importing_client_does_not_import_provider_sdks():
+    """Tests that provider modules are only imported on first dispatch."""
+    code = (
+        "import sys; import forge.packages.psi.client; "
+        "print(any(m.startswith(('forge.packages.psi.providers.', 'google', 'requests')) for m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.strip() == "False"
+
+def test_provider_config_is_parsed_once(monkeypatch):
+    """Tests that providers.yaml is parsed once per process."""
+    # --- Arrange ---
+    parse_count = []
+    original_safe_load = yaml.safe_load
+    monkeypatch.setattr(client, "_model_to_provider_map", None)
+    monkeypatch.setattr(client.yaml, "safe_load", lambda f: parse_count.append(1) or original_safe_load(f))
+
+    # --- Act ---
+    first = client.load_provider_config()
+    second = client.load_provider_config()
+
+    # --- Assert ---
+    assert first is second
+    assert first["gemini-1.5-pro"] == "google"
+    assert len(parse_count) == 1
+
+# --- Tests for cached dispatch ---
+
+def test_repeat_calls_are_served_from_cache(monkeypatch, isolated_cache):
+    """Tests that a repeated request is answered from the cache without dispatching."""
+    # --- Arrange ---
+    calls = []
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: _fake_provider(calls))
+
+    # --- Act ---
+    live = client.get_oracle_response("hello", "prompt", "llama3-8b-instruct")
+    cached = client.get_oracle_response("hello", "prompt", "llama3-8b-instruct")
+
+    # --- Assert ---
+    assert calls == ["hello"]
+    assert "__cache_hit__" not in live
+    assert cached["__cache_hit__"] is True
+    assert cached["response_text"] == "echo: hello"
+    assert client.get_cache_stats()["hits"] == 1
+
+# --- Tests for the batch API ---
+
+def test_batch_returns_results_in_input_order(monkeypatch, isolated_cache):
+    """Tests that batch results keep input order and that cached requests are not re-dispatched."""
+    # --- Arrange ---
+    calls = []
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: _fake_provider(calls))
+    client.get_oracle_response("cached", "prompt", "llama3-8b-instruct")
+    calls.clear()
+    requests = [{"content": c, "system_prompt": "prompt", "model_name": "llama3-8b-instruct"} for c in ("a", "cached", "b", "c")]
+
+    # --- Act ---
+    results = client.get_oracle_responses(requests, max_concurrency=2)
+
+    # --- Assert ---
+    assert [r["response_text"] for r in results] == ["echo: a", "echo: cached", "echo: b", "echo: c"]
+    assert results[1]["__cache_hit__"] is True
+    assert sorted(calls) == ["a", "b", "c"]
+
+def test_batch_respects_concurrency_limit(monkeypatch, isolated_cache):
+    """Tests that no more than max_concurrency requests are in flight at once."""
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def get_response(content, system_prompt, model_name, validation_model=None):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        return {"response_text": content}
+
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: types.SimpleNamespace(get_response=get_response))
+    requests = [{"content": str(i), "system_prompt": "p", "model_name": "llama3-8b-instruct", "no_cache": True} for i in range(12)]
+
+    results = client.get_oracle_responses(requests, max_concurrency=3)
+
+    assert [r["response_text"] for r in results] == [str(i) for i in range(12)]
+    assert 1 < state["peak"] <= 3
+
+def test_batch_treats_non_positive_concurrency_as_one(monkeypatch, isolated_cache):
+    """Tests that max_concurrency below 1 still dispatches every request instead of blocking forever."""
+    calls = []
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: _fake_provider(calls))
+    requests = [{"content": c, "system_prompt": "p", "model_name": "llama3-8b-instruct", "no_cache": True} for c in ("a", "b")]
+
+    results = client.get_oracle_responses(requests, max_concurrency=0)
+
+    assert [r["response_text"] for r in results] == ["echo: a", "echo: b"]
+
+def test_async_single_request(monkeypatch, isolated_cache):
+    """Tests the async single-request API."""
+    calls = []
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: _fake_provider(calls))
+
+    result = asyncio.run(client.get_oracle_response_async("hi", "prompt", "llama3-8b-instruct"))
+
+    assert result["response_text"] == "echo: hi"
+    assert calls == ["hi"]
+
+def test_async_cache_lookups_run_off_the_event_loop(monkeypatch, isolated_cache):
+    """Tests that the async APIs never read the cache store on the event loop's thread."""
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: _fake_provider([]))
+    lookup_threads = []
+    original_lookup = client._lookup
+    def recording_lookup(*args):
+        lookup_threads.append(threading.current_thread())
+        return original_lookup(*args)
+    monkeypatch.setattr(client, "_lookup", recording_lookup)
+    requests = [{"content": c, "system_prompt": "p", "model_name": "llama3-8b-instruct"} for c in ("a", "b")]
+
+    async def run():
+        await client.get_oracle_response_async("hi", "p", "llama3-8b-instruct")
+        await client.get_oracle_responses_async(requests)
+        return threading.current_thread()
+    loop_thread = asyncio.run(run())
+
+    assert len(lookup_threads) == 3
+    assert loop_thread not in lookup_threads
+
+# --- Tests for rate limiting ---
+
+def test_dispatch_draws_from_configured_rate_limits(monkeypatch, tmp_path, isolated_cache):
+    """Tests that a dispatched call acquires its budget and settles reported usage."""
+    # --- Arrange ---
+    client.load_provider_config()
+    monkeypatch.setattr(client, "_rate_limits", {"providers": {"google": {"requests_per_minute": 10}}, "models": {"gemini-1.5-pro": {"tokens_per_minute": 1000}}})
+    limiter = client.rate_limiter.RateLimiter(str(tmp_path / "limits.sqlite3"))
+    monkeypatch.setattr(client.rate_limiter, "get_limiter", lambda: limiter)
+
+    def get_response(content, system_prompt, model_name, validation_model=None):
+        return {"response_text": "ok", "usage": {"input_tokens": 100, "output_tokens": 100}}
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: types.SimpleNamespace(get_response=get_response))
+
+    # --- Act ---
+    client.get_oracle_response("x" * 400, "", "gemini-1.5-pro", no_cache=True)
+
+    # --- Assert ---
+    levels = dict(limiter._connect().execute("SELECT name, level FROM buckets").fetchall())
+    assert round(levels["provider:google:requests"]) == 9
+    assert round(levels["model:gemini-1.5-pro:tokens"]) == 800
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import subprocess
+import pytest
+from forge.packages.psi import client, daemon
+from forge.packages.psi.daemon import DaemonClient
+
+def test_client_uses_running_daemon_and_falls_back(monkeypatch, tmp_path):
+    """Tests that requests go through a running 'psi serve' and run in-process once it stops."""
+    # --- Arrange ---
+    socket_path = str(tmp_path / "psi.sock")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    server = subprocess.Popen([sys.executable, "-m", "forge.packages.psi.main", "serve", "--socket", socket_path], env=env)
+    try:
+        deadline = time.monotonic() + 15
+        while DaemonClient(socket_path).ping() is None:
+            assert time.monotonic() < deadline and server.poll() is None, "daemon did not start"
+            time.sleep(0.05)
+        monkeypatch.setattr(daemon, "DISABLED", False)
+        monkeypatch.setattr(client, "_daemon", DaemonClient(socket_path))
+
+        # --- Act ---
+        served = client.get_oracle_response("hello", "prompt", "replay", no_cache=True)
+        status = DaemonClient(socket_path).ping()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    fallback = client.get_oracle_response("again", "prompt", "replay", no_cache=True)
+
+    # --- Assert ---
+    assert served["response_text"] == "hello"
+    assert status["requests"] == 1 and status["pid"] == server.pid
+    assert not os.path.exists(socket_path)
+    assert fallback["response_text"] == "again"
+
+def test_untrusted_socket_path_is_refused(monkeypatch, tmp_path):
+    """Tests that clients won't talk to, and the daemon won't replace, a path that isn't the user's socket."""
+    impostor = tmp_path / "psi.sock"
+    impostor.write_text("not a socket")
+    monkeypatch.setattr(daemon, "DISABLED", False)
+
+    assert DaemonClient(str(impostor)).request({"op": "ping"}) is None
+    assert DaemonClient(str(impostor)).ping() is None
+    with pytest.raises(OSError, match="refusing"):
+        daemon.PsiDaemon(str(impostor))
+    assert impostor.read_text() == "not a socket"
+
+def _start_daemon(socket_path: str, env: dict) -> subprocess.Popen:
+    """Starts 'psi serve' through the real CLI entrypoint and waits until it answers."""
+    server = subprocess.Popen([sys.executable, "-m", "forge.packages.psi.main", "serve", "--socket", socket_path], env=env)
+    deadline = time.monotonic() + 15
+    while DaemonClient(socket_path).ping() is None:
+        if time.monotonic() > deadline or server.poll() is not None:
+            server.kill()
+            raise AssertionError("daemon did not start")
+        time.sleep(0.05)
+    return server
+
+def test_daemon_only_answers_clients_with_its_settings(monkeypatch, tmp_path):
+    """Tests that the daemon declines requests from a process whose provider settings or cache dir differ."""
+    # --- Arrange ---
+    socket_path = str(tmp_path / "psi.sock")
+    monkeypatch.setenv("PSI_REPLAY_LATENCY_MS", "0")
+    server = _start_daemon(socket_path, dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    monkeypatch.setattr(daemon, "DISABLED", False)
+    try:
+        # --- Act ---
+        monkeypatch.setattr(client, "_daemon", DaemonClient(socket_path))
+        client.get_oracle_response("shared settings", "prompt", "replay", no_cache=True)
+        monkeypatch.setenv("PSI_REPLAY_LATENCY_MS", "1")
+        env_override = client.get_oracle_response("env override", "prompt", "replay", no_cache=True)
+        monkeypatch.setenv("PSI_REPLAY_LATENCY_MS", "0")
+        monkeypatch.setattr(client, "_daemon", DaemonClient(socket_path))
+        monkeypatch.setattr(client.cache_manager, "CACHE_DIR", str(tmp_path))
+        dir_override = client.get_oracle_response("dir override", "prompt", "replay", no_cache=True)
+        status = DaemonClient(socket_path).ping()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    # --- Assert ---
+    assert env_override["response_text"] == "env override"
+    assert dir_override["response_text"] == "dir override"
+    assert status["requests"] == 1
+
+def test_settings_loaded_from_dotenv_after_import_still_use_the_daemon(tmp_path):
+    """Tests the CLI order: psi.client is imported before load_dotenv, yet .env settings match the daemon's."""
+    # --- Arrange ---
+    socket_path = str(tmp_path / "psi.sock")
+    (tmp_path / ".env").write_text("PSI_REPLAY_LATENCY_MS=0\nLOCAL_MODEL_ENDPOINT=http://127.0.0.1:9/v1\n")
+    (tmp_path / "prompt.txt").write_text("prompt")
+    env = {k: v for k, v in os.environ.items() if k not in ("PSI_NO_DAEMON", "PSI_REPLAY_LATENCY_MS", "LOCAL_MODEL_ENDPOINT")}
+    env.update(PYTHONPATH=os.pathsep.join(sys.path), ENCLAVE_FOUNDATION_ROOT=str(tmp_path), PSI_DAEMON_SOCKET=socket_path)
+    server = _start_daemon(socket_path, env)
+    try:
+        # --- Act ---
+        subprocess.run([sys.executable, "-m", "forge.packages.psi.main", "--prompt-file", "prompt.txt", "--model", "replay", "--no-cache"],
+                       input="hello", capture_output=True, text=True, env=env, check=True)
+        status = DaemonClient(socket_path).ping()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+    # --- Assert ---
+    assert status["requests"] == 1
+
+def test_validation_models_the_daemon_cannot_import_run_in_process(monkeypatch):
+    """Tests that locally defined validation models never reach the daemon, and that a failed import is declined."""
+    # --- Arrange ---
+    from pydantic import BaseModel
+    from forge.packages.psi.models import SimpleResponse
+    class LocalModel(BaseModel):
+        name: str
+    monkeypatch.setattr(daemon, "DISABLED", False)
+    sent = []
+    daemon_client = DaemonClient("/nonexistent/psi.sock")
+    monkeypatch.setattr(daemon_client, "request", lambda message: sent.append(message) or {"result": {"response_text": "from daemon"}})
+    server = daemon.PsiDaemon.__new__(daemon.PsiDaemon)
+    server.client = client
+
+    # --- Act ---
+    local_result = daemon_client.get_response("c", "p", "replay", True, LocalModel, "dynamic", "fingerprint")
+    shared_result = daemon_client.get_response("c", "p", "replay", True, SimpleResponse, "dynamic", "fingerprint")
+    reply = server.dispatch({"op": "get_response", "content": "c", "system_prompt": "p", "model_name": "replay",
+                             "validation_model": "forge.missing_module:Model", "settings": client._daemon_settings()})
+
+    # --- Assert ---
+    assert local_result is None
+    assert shared_result == {"response_text": "from daemon"}
+    assert [m["validation_model"] for m in sent] == ["forge.packages.psi.models:SimpleResponse"]
+    assert reply["declined"] == "validation_model" and "result" not in reply
@@ -0,0 +1,135 @@
+import sys
+import types
+import importlib
+import pytest
+
+class _FakeGenerativeModel:
+    """Stands in for genai.GenerativeModel, returning canned responses with usage metadata."""
+    instances = 0
+    prompts = []
+
+    def __init__(self, model_name):
+        _FakeGenerativeModel.instances += 1
+        self.model_name = model_name
+        self.responses = []
+        self.generation_configs = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.generation_configs.append(generation_config)
+        _FakeGenerativeModel.prompts.append(prompt)
+        text = self.responses.pop(0) if self.responses else '{"name": "x", "value": 1, "is_correct": true}'
+        usage = types.SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        return types.SimpleNamespace(text=text, usage_metadata=usage)
+
+    @classmethod
+    def from_cached_content(cls, cached_content):
+        model = cls(cached_content.model)
+        model.cached_content = cached_content
+        return model
+
+    def count_tokens(self, text):
+        raise AssertionError("count_tokens must not be called")
+
+@pytest.fixture
+def google(monkeypatch):
+    """Imports the Google provider against a mocked google.generativeai SDK."""
+    configure_calls = []
+    genai = types.ModuleType("google.generativeai")
+    genai.configure = lambda api_key: configure_calls.append(api_key)
+    genai.GenerativeModel = _FakeGenerativeModel
+    created_contexts = []
+    def create_cached_content(model, system_instruction, ttl):
+        created_contexts.append(system_instruction)
+        return types.SimpleNamespace(model=model, system_instruction=system_instruction)
+    genai.caching = types.SimpleNamespace(CachedContent=types.SimpleNamespace(create=create_cached_content))
+    exceptions = types.ModuleType("google.api_core.exceptions")
+    exceptions.PermissionDenied = type("PermissionDenied", (Exception,), {})
+    exceptions.InvalidArgument = type("InvalidArgument", (Exception,), {})
+    google_pkg = types.ModuleType("google")
+    google_pkg.generativeai = genai
+    api_core = types.ModuleType("google.api_core")
+    api_core.exceptions = exceptions
+
+    for name, module in {"google": google_pkg, "google.generativeai": genai, "google.api_core": api_core, "google.api_core.exceptions": exceptions}.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    monkeypatch.delitem(sys.modules, "forge.packages.psi.providers.google", raising=False)
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    _FakeGenerativeModel.instances = 0
+    _FakeGenerativeModel.prompts = []
+
+    provider = importlib.import_module("forge.packages.psi.providers.google")
+    provider.configure_calls = configure_calls
+    provider.created_contexts = created_contexts
+    yield provider
+    sys.modules.pop("forge.packages.psi.providers.google", None)
+
+def test_model_is_configured_once(google):
+    """Tests that the SDK is configured and the model built once across calls."""
+    # --- Act ---
+    google.get_response("a", "prompt", "gemini-1.5-flash")
+    google.get_response("b", "prompt", "gemini-1.5-flash")
+
+    # --- Assert ---
+    assert google.configure_calls == ["test-key"]
+    assert _FakeGenerativeModel.instances == 1
+
+def test_usage_comes_from_response_metadata(google):
+    """Tests that token usage is read from the response instead of extra count_tokens calls."""
+    result = google.get_response("content", "prompt", "gemini-1.5-flash")
+
+    full_prompt = "prompt\n\n--- CONTENT TO ANALYZE ---\n\ncontent"
+    assert result["usage"] == {"input_tokens": len(full_prompt) // 4, "output_tokens": len(result["response_text"]) // 4}
+
+def test_reprompt_usage_is_summed(google):
+    """Tests that a validation re-prompt adds its usage to the first call's."""
+    from forge.packages.psi.models import SimpleResponse
+    model = google._get_model("gemini-1.5-pro", "test-key")
+    model.responses = ["not json", '{"name": "x", "value": 1, "is_correct": true}']
+
+    result = google.get_response("content", "prompt", "gemini-1.5-pro", validation_model=SimpleResponse)
+
+    assert result["validation_result"] == {"name": "x", "value": 1, "is_correct": True}
+    assert result["usage"]["input_tokens"] > len("prompt\n\n--- CONTENT TO ANALYZE ---\n\ncontent") // 4
+
+
+def test_validation_model_requests_structured_output(google):
+    """Tests that the validation model's schema is passed to Gemini's structured output mode."""
+    from forge.packages.psi.models import SimpleResponse
+    model = google._get_model("gemini-1.5-pro", "test-key")
+
+    google.get_response("content", "prompt", "gemini-1.5-pro")
+    google.get_response("content", "prompt", "gemini-1.5-pro", validation_model=SimpleResponse)
+
+    assert model.generation_configs == [None, {"response_mime_type": "application/json", "response_schema": SimpleResponse}]
+
+def test_fenced_json_is_repaired_without_reprompt(google):
+    """Tests that a fenced reply with a trailing comma is fixed locally instead of re-prompting."""
+    from forge.packages.psi.models import SimpleResponse
+    model = google._get_model("gemini-1.5-pro", "test-key")
+    model.responses = ['```json\n{"name": "x", "value": 1, "is_correct": true,}\n```']
+
+    result = google.get_response("content", "prompt", "gemini-1.5-pro", validation_model=SimpleResponse)
+
+    assert result["validation_result"] == {"name": "x", "value": 1, "is_correct": True}
+    assert len(model.generation_configs) == 1
+
+def test_repeated_large_prompt_uses_context_cache(google, monkeypatch):
+    """Tests that a repeated system prompt is cached once, after which only the content is sent."""
+    # --- Arrange ---
+    monkeypatch.setattr(google, "CONTEXT_CACHE_MIN_TOKENS", 1)
+
+    # --- Act ---
+    for content in ("a", "b", "c"):
+        google.get_response(content, "a long shared prompt", "gemini-1.5-pro")
+
+    # --- Assert ---
+    assert google.created_contexts == ["a long shared prompt"]
+    assert _FakeGenerativeModel.prompts[0].startswith("a long shared prompt")
+    assert _FakeGenerativeModel.prompts[1:] == ["--- CONTENT TO ANALYZE ---\n\nb", "--- CONTENT TO ANALYZE ---\n\nc"]
+
+def test_small_prompts_are_not_context_cached(google):
+    """Tests that prompts below the provider's minimum cacheable size are always sent inline."""
+    for content in ("a", "b", "c"):
+        google.get_response(content, "short prompt", "gemini-1.5-pro")
+
+    assert google.created_contexts == []
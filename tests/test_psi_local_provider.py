@@ -0,0 +1,102 @@
+import pytest
+from forge.packages.psi import daemon
+from forge.packages.psi.providers import local
+from forge.packages.psi.stand_in import StandInServer
+
+@pytest.fixture
+def stand_in_endpoint(monkeypatch):
+    """Runs a stand-in completion server and points the local provider at it."""
+    with StandInServer(reply='{"name": "x", "value": 1, "is_correct": true}', stream_chunks=["Hello", ", ", "world"]) as server:
+        monkeypatch.setenv("LOCAL_MODEL_ENDPOINT", server.endpoint)
+        monkeypatch.setattr(local, "_session", None)
+        monkeypatch.setattr(daemon, "DISABLED", True) # A running daemon would not see the stand-in.
+        yield server
+
+def test_calls_reuse_pooled_connection(stand_in_endpoint):
+    """Tests that consecutive calls share one keep-alive connection."""
+    # --- Act ---
+    first = local.get_response("a", "prompt", "llama3-8b-instruct")
+    second = local.get_response("b", "prompt", "llama3-8b-instruct")
+
+    # --- Assert ---
+    assert not first.get("error") and not second.get("error")
+    assert len(stand_in_endpoint.connections) == 1
+
+def test_stream_response_yields_deltas_and_ttft(stand_in_endpoint):
+    """Tests that SSE chunks are parsed into text deltas and time-to-first-token is measured."""
+    stream = local.stream_response("hi", "prompt", "llama3-8b-instruct")
+
+    deltas = list(stream)
+
+    assert deltas == ["Hello", ", ", "world"]
+    assert stream.text == "Hello, world"
+    assert 0 <= stream.time_to_first_token <= stream.total_time
+
+def test_streaming_mode_assembles_full_response(stand_in_endpoint, monkeypatch):
+    """Tests that opt-in streaming returns the assembled completion with timing data."""
+    monkeypatch.setenv("LOCAL_MODEL_STREAM", "1")
+
+    result = local.get_response("hi", "prompt", "llama3-8b-instruct")
+
+    assert result["choices"][0]["message"]["content"] == "Hello, world"
+    assert result["timing"]["time_to_first_token"] is not None
+    assert result["usage"]["output_tokens"] == len("Hello, world") // 4
+
+def test_stream_closed_early_releases_its_connection(stand_in_endpoint):
+    """Tests that leaving a partially read stream closes the response instead of leaking it."""
+    with local.stream_response("hi", "prompt", "llama3-8b-instruct") as stream:
+        first = next(iter(stream))
+
+    assert first == "Hello"
+    assert stream._response.raw.closed
+    assert stream.total_time is not None
+
+def test_streaming_mode_sends_and_applies_the_validation_model(monkeypatch):
+    """Tests that streaming requests carry the schema as response_format and are validated, with the 400 fallback."""
+    from forge.packages.psi.models import SimpleResponse
+    monkeypatch.setenv("LOCAL_MODEL_STREAM", "1")
+    with StandInServer(reply='{"name": "x", "value": 1, "is_correct": true}', reject_fields=("response_format",)) as server:
+        monkeypatch.setenv("LOCAL_MODEL_ENDPOINT", server.endpoint)
+        monkeypatch.setattr(local, "_session", None)
+
+        result = local.get_response("hi", "prompt", "llama3-8b-instruct", validation_model=SimpleResponse)
+
+    assert result["validation_result"] == {"name": "x", "value": 1, "is_correct": True}
+    assert [("response_format" in p, p["stream"]) for p in server.payloads] == [(True, True), (False, True)]
+
+def test_validation_model_is_applied(stand_in_endpoint):
+    """Tests that a validation model is applied to the local response."""
+    from forge.packages.psi.models import SimpleResponse
+
+    result = local.get_response("hi", "prompt", "llama3-8b-instruct", validation_model=SimpleResponse)
+
+    assert result["validation_result"] == {"name": "x", "value": 1, "is_correct": True}
+
+def test_validation_model_schema_is_sent_as_response_format(stand_in_endpoint):
+    """Tests that the validation model's JSON schema is sent for constrained decoding."""
+    from forge.packages.psi.models import SimpleResponse
+
+    local.get_response("hi", "prompt", "llama3-8b-instruct", validation_model=SimpleResponse)
+
+    response_format = stand_in_endpoint.payloads[-1]["response_format"]
+    assert response_format["json_schema"] == {"name": "SimpleResponse", "schema": SimpleResponse.model_json_schema()}
+
+def test_response_format_is_dropped_when_rejected(monkeypatch):
+    """Tests that an endpoint rejecting response_format is retried once without it."""
+    from forge.packages.psi.models import SimpleResponse
+    with StandInServer(reply='{"name": "x", "value": 1, "is_correct": true}', reject_fields=("response_format",)) as server:
+        monkeypatch.setenv("LOCAL_MODEL_ENDPOINT", server.endpoint)
+        monkeypatch.setattr(local, "_session", None)
+
+        result = local.get_response("hi", "prompt", "llama3-8b-instruct", validation_model=SimpleResponse)
+
+    assert result["validation_result"] == {"name": "x", "value": 1, "is_correct": True}
+    assert ["response_format" in p for p in server.payloads] == [True, False]
+
+def test_reused_prefix_is_reported_as_cached_tokens(stand_in_endpoint):
+    """Tests that prompt tokens a server served from its prefix cache are recorded in usage."""
+    first = local.get_response("a", "shared system prompt", "llama3-8b-instruct")
+    second = local.get_response("b", "shared system prompt", "llama3-8b-instruct")
+
+    assert "cached_input_tokens" not in first["usage"]
+    assert second["usage"]["cached_input_tokens"] == len("shared system prompt") // 4
@@ -0,0 +1,47 @@
+from forge.packages.psi.memory_cache import MemoryCache
+
+def test_memory_cache_counts_hits_and_misses():
+    """Tests that lookups are counted and stored entries are returned."""
+    # --- Arrange ---
+    cache = MemoryCache(max_entries=10, max_bytes=10_000)
+    cache.put("a", {"response": {"response_text": "hello"}})
+
+    # --- Act ---
+    hit = cache.get("a")
+    miss = cache.get("b")
+
+    # --- Assert ---
+    assert hit == {"response": {"response_text": "hello"}}
+    assert miss is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_memory_cache_evicts_least_recently_used_entry():
+    """Tests that the entry bound evicts the least recently used key."""
+    cache = MemoryCache(max_entries=2, max_bytes=10_000)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")            # 'a' becomes most recently used
+    cache.put("c", {"v": 3})  # evicts 'b'
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+def test_memory_cache_respects_byte_bound():
+    """Tests that the byte bound is enforced."""
+    cache = MemoryCache(max_entries=100, max_bytes=50)
+    cache.put("a", {"text": "x" * 20})
+    cache.put("b", {"text": "y" * 20})
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.stats()["bytes"] <= 50
+
+def test_memory_cache_drops_invalid_entries():
+    """Tests that entries failing the validity check (e.g. expired) are treated as misses."""
+    cache = MemoryCache(is_valid=lambda entry: entry["fresh"])
+    cache.put("stale", {"fresh": False})
+
+    assert cache.get("stale") is None
+    assert cache.stats()["entries"] == 0
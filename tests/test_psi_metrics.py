@@ -0,0 +1,63 @@
+import json
+import pytest
+from forge.packages.psi import metrics, client
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    """Enables an empty metrics registry for one test."""
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+def test_recording_is_a_no_op_when_disabled(monkeypatch):
+    """Tests that nothing is recorded unless metrics are enabled."""
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+
+    metrics.inc("psi_calls_total", {"provider": "google"})
+    metrics.observe("psi_call_latency_seconds", 0.2)
+
+    assert metrics.snapshot() == {"counters": [], "histograms": []}
+
+def test_histogram_and_prometheus_export(enabled_metrics):
+    """Tests that observations land in the right buckets and render as cumulative Prometheus buckets."""
+    # --- Act ---
+    metrics.observe("psi_call_latency_seconds", 0.003, {"model": "m"})
+    metrics.observe("psi_call_latency_seconds", 0.2, {"model": "m"})
+    metrics.inc("psi_calls_total", {"model": "m"}, 2)
+    text = metrics.to_prometheus()
+
+    # --- Assert ---
+    histogram = metrics.snapshot()["histograms"][0]
+    assert histogram["buckets"]["0.005"] == 1
+    assert histogram["buckets"]["0.25"] == 1
+    assert histogram["count"] == 2
+    assert '# TYPE psi_calls_total counter' in text
+    assert 'psi_calls_total{model="m"} 2' in text
+    assert 'psi_call_latency_seconds_bucket{model="m",le="0.1"} 1' in text
+    assert 'psi_call_latency_seconds_bucket{model="m",le="+Inf"} 2' in text
+
+def test_export_writes_json_per_process(enabled_metrics, monkeypatch, tmp_path):
+    """Tests that the JSON export expands {pid} in its path."""
+    monkeypatch.setattr(metrics, "JSON_PATH", str(tmp_path / "metrics-{pid}.json"))
+    metrics.inc("psi_calls_total")
+
+    metrics.export()
+
+    [written] = list(tmp_path.iterdir())
+    assert json.loads(written.read_text())["counters"][0]["name"] == "psi_calls_total"
+
+def test_client_records_calls_tokens_and_cache_lookups(enabled_metrics, isolated_cache):
+    """Tests that a miss followed by a hit records one call, its tokens and both lookups."""
+    # --- Act ---
+    client.get_oracle_response("hello world!", "prompt", "replay")
+    client.get_oracle_response("hello world!", "prompt", "replay")
+
+    # --- Assert ---
+    counters = {(c["name"],) + tuple(sorted(c["labels"].items())): c["value"] for c in metrics.snapshot()["counters"]}
+    assert counters[("psi_calls_total", ("model", "replay"), ("provider", "replay"))] == 1
+    assert counters[("psi_tokens_total", ("direction", "output"), ("model", "replay"), ("provider", "replay"))] == 3
+    assert counters[("psi_cache_lookups_total", ("model", "replay"), ("result", "hit"))] == 1
+    assert counters[("psi_cache_lookups_total", ("model", "replay"), ("result", "miss"))] == 1
+    assert metrics.snapshot()["histograms"][0]["count"] == 1
@@ -0,0 +1,99 @@
+import types
+import threading
+from forge.packages.psi import rate_limiter
+from forge.packages.psi.rate_limiter import Bucket, RateLimiter, buckets_for
+
+class _FakeClock:
+    """A stand-in for the time module whose sleeps advance the clock instantly."""
+    def __init__(self):
+        self.now = 1_000_000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def _fake_clock(monkeypatch) -> _FakeClock:
+    clock = _FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(time=clock.time, sleep=clock.sleep))
+    return clock
+
+def test_buckets_for_combines_provider_and_model_limits():
+    """Tests that provider and model settings each produce their own buckets."""
+    buckets = buckets_for("google", "gemini-1.5-pro", {"requests_per_minute": 100}, {"tokens_per_minute": 5000})
+
+    assert buckets == [
+        Bucket("provider:google:requests", 100.0),
+        Bucket("model:gemini-1.5-pro:tokens", 5000.0),
+    ]
+    assert buckets_for("local", "llama3-8b-instruct", None, {}) == []
+
+def test_burst_then_waits_exactly_for_refill(monkeypatch, tmp_path):
+    """Tests that a full bucket allows a burst, then waits only as long as the refill needs."""
+    # --- Arrange ---
+    _fake_clock(monkeypatch)
+    limiter = RateLimiter(str(tmp_path / "limits.sqlite3"))
+    buckets = [Bucket("provider:test:requests", 60.0)] # 1 request per second
+
+    # --- Act ---
+    burst_waits = [limiter.acquire(buckets) for _ in range(60)]
+    next_wait = limiter.acquire(buckets)
+
+    # --- Assert ---
+    assert burst_waits == [0.0] * 60
+    assert abs(next_wait - 1.0) < 1e-6
+
+def test_token_overspend_delays_the_next_call(monkeypatch, tmp_path):
+    """Tests that usage beyond the estimate is settled against the token bucket."""
+    # --- Arrange ---
+    _fake_clock(monkeypatch)
+    limiter = RateLimiter(str(tmp_path / "limits.sqlite3"))
+    buckets = [Bucket("model:test:tokens", 600.0)] # 10 tokens per second
+    limiter.acquire(buckets, tokens=100)
+
+    # --- Act ---
+    limiter.record_usage(buckets, extra_tokens=500) # The bucket is now empty.
+    wait = limiter.acquire(buckets, tokens=50)
+
+    # --- Assert ---
+    assert abs(wait - 5.0) < 1e-6
+
+def test_limiters_share_state_through_the_state_file(monkeypatch, tmp_path):
+    """Tests that separate limiter instances (as in separate processes) draw from the same bucket."""
+    # --- Arrange ---
+    _fake_clock(monkeypatch)
+    state_path = str(tmp_path / "limits.sqlite3")
+    buckets = [Bucket("provider:test:requests", 2.0)]
+    RateLimiter(state_path).acquire(buckets)
+    RateLimiter(state_path).acquire(buckets)
+
+    # --- Act ---
+    wait = RateLimiter(state_path).acquire(buckets)
+
+    # --- Assert ---
+    assert abs(wait - 30.0) < 1e-6
+
+def test_concurrent_acquires_never_overdraw(tmp_path):
+    """Tests that threads racing for a small bucket are admitted exactly once per unit."""
+    # --- Arrange ---
+    limiter = RateLimiter(str(tmp_path / "limits.sqlite3"))
+    buckets = [Bucket("provider:test:requests", 5.0)]
+    waits = []
+
+    def worker():
+        waits.append(limiter.acquire(buckets))
+
+    # --- Act ---
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # --- Assert ---
+    assert waits == [0.0] * 5
+    level = limiter._connect().execute("SELECT level FROM buckets").fetchone()[0]
+    assert 0.0 <= level < 0.1
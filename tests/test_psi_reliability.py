@@ -0,0 +1,143 @@
+import time
+import types
+import pytest
+from forge.packages.psi import client, cache_manager, reliability
+from forge.packages.psi.reliability import CircuitBreaker
+
+TRANSIENT = {"error": True, "error_type": "API_ERROR", "message": "boom"}
+
+def _configure(monkeypatch, providers: dict, settings: dict):
+    """Installs stand-in providers and model settings. providers maps model name to its get_response."""
+    client.load_provider_config()
+    monkeypatch.setattr(client, "_model_to_provider_map", {model: model for model in providers})
+    monkeypatch.setattr(client, "_model_settings", settings)
+    monkeypatch.setattr(client, "PROVIDER_MAP", {model: "stand-in" for model in providers})
+    monkeypatch.setattr(client, "_get_provider_module", lambda name: types.SimpleNamespace(get_response=providers[name]))
+    monkeypatch.setattr(reliability, "_breakers", {})
+
+def test_backoff_is_jittered_and_capped():
+    """Tests that delays stay within [0, min(cap, base * 2^attempt)]."""
+    delays = [reliability.backoff_delay(attempt, 1.0, cap_seconds=5.0) for attempt in range(10) for _ in range(20)]
+
+    assert all(0 <= d <= 5.0 for d in delays)
+    assert len(set(delays)) > 1
+
+def test_breaker_opens_then_allows_one_trial():
+    """Tests the closed -> open -> half-open -> closed cycle."""
+    # --- Arrange ---
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+
+    # --- Act & Assert ---
+    breaker.record(TRANSIENT)
+    assert breaker.allow()
+    breaker.record(TRANSIENT)
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()          # The trial call...
+    assert not breaker.allow()      # ...is the only one let through.
+    breaker.record({"response_text": "ok"})
+    assert breaker.state == "closed"
+
+def test_fallback_answers_are_returned_but_not_cached(monkeypatch, isolated_cache):
+    """Tests that a transient failure falls back to the next model without caching its answer."""
+    # --- Arrange ---
+    _configure(monkeypatch, {
+        "primary": lambda *a, **k: dict(TRANSIENT),
+        "backup": lambda content, *a, **k: {"response_text": f"backup: {content}"},
+    }, {"primary": {"fallback": ["backup"]}})
+
+    # --- Act ---
+    result = client.get_oracle_response("q", "p", "primary")
+
+    # --- Assert ---
+    assert result["response_text"] == "backup: q"
+    assert result["fallback_from"] == "primary"
+    assert cache_manager.read_entry(cache_manager._get_cache_key("q", "p", "primary")) is None
+
+def test_hedge_returns_the_faster_model(monkeypatch, isolated_cache):
+    """Tests that a slow primary is hedged with the first fallback after hedge_after_ms."""
+    # --- Arrange ---
+    def slow_primary(*args, **kwargs):
+        time.sleep(0.5)
+        return {"response_text": "primary"}
+    _configure(monkeypatch, {
+        "primary": slow_primary,
+        "backup": lambda *a, **k: {"response_text": "backup"},
+    }, {"primary": {"fallback": ["backup"], "hedge_after_ms": 50}})
+
+    # --- Act ---
+    started = time.perf_counter()
+    result = client.get_oracle_response("q", "p", "primary", no_cache=True)
+    elapsed = time.perf_counter() - started
+
+    # --- Assert ---
+    assert result["response_text"] == "backup"
+    assert elapsed < 0.4
+
+def test_open_circuit_skips_straight_to_fallback(monkeypatch, isolated_cache):
+    """Tests that an open circuit refuses the primary call without invoking its provider."""
+    # --- Arrange ---
+    primary_calls = []
+    _configure(monkeypatch, {
+        "primary": lambda *a, **k: primary_calls.append(1) or dict(TRANSIENT),
+        "backup": lambda *a, **k: {"response_text": "backup"},
+    }, {"primary": {"fallback": ["backup"]}})
+    reliability._breakers["primary"] = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    reliability._breakers["primary"].record(TRANSIENT)
+
+    # --- Act ---
+    result = client.get_oracle_response("q", "p", "primary", no_cache=True)
+
+    # --- Assert ---
+    assert result["response_text"] == "backup"
+    assert primary_calls == []
+
+def test_failed_rate_limit_wait_releases_the_trial_slot(monkeypatch, isolated_cache):
+    """Tests that a half-open breaker can still close after the rate limiter raised before a trial call."""
+    # --- Arrange ---
+    _configure(monkeypatch, {"primary": lambda *a, **k: {"response_text": "ok"}}, {})
+    monkeypatch.setattr(client, "_get_rate_limit_buckets", lambda provider, model: ["bucket"])
+    breaker = reliability._breakers["primary"] = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    breaker.record(TRANSIENT)
+
+    class _FailingLimiter:
+        def acquire(self, buckets, tokens):
+            raise TimeoutError("rate limiter unavailable")
+    monkeypatch.setattr(client.rate_limiter, "get_limiter", lambda: _FailingLimiter())
+
+    # --- Act ---
+    with pytest.raises(TimeoutError):
+        client.get_oracle_response("q", "p", "primary", no_cache=True)
+
+    # --- Assert ---
+    assert breaker.allow()
+
+def test_primary_failing_fast_still_fails_over_when_hedging(monkeypatch, isolated_cache):
+    """Tests that a transient error returned before the hedge threshold still moves on to the hedge model."""
+    # --- Arrange ---
+    _configure(monkeypatch, {
+        "primary": lambda *a, **k: dict(TRANSIENT),
+        "backup": lambda content, *a, **k: {"response_text": f"backup: {content}"},
+    }, {"primary": {"fallback": ["backup"], "hedge_after_ms": 1000}})
+
+    # --- Act ---
+    started = time.perf_counter()
+    result = client.get_oracle_response("q", "p", "primary", no_cache=True)
+    elapsed = time.perf_counter() - started
+
+    # --- Assert ---
+    assert result["response_text"] == "backup: q"
+    assert result["fallback_from"] == "primary"
+    assert elapsed < 0.5 # The hedge starts as soon as the primary fails, not at the threshold.
+
+def test_hedge_survives_a_secondary_that_raises():
+    """Tests that a quickly failing hedge doesn't discard a primary that succeeds."""
+    def slow_primary():
+        time.sleep(0.1)
+        return {"response_text": "primary"}
+    def broken_secondary():
+        raise RuntimeError("backup exploded")
+
+    assert reliability.hedge(slow_primary, broken_secondary, 0.01) == {"response_text": "primary"}
+    with pytest.raises(RuntimeError):
+        reliability.hedge(lambda: time.sleep(0.05) or broken_secondary(), broken_secondary, 0.01)
@@ -0,0 +1,74 @@
+import time
+import threading
+from forge.packages.psi.single_flight import SingleFlight
+
+def _run_concurrently(count: int, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+def test_concurrent_callers_share_one_call():
+    """Tests that threads asking for the same key while it is in flight share its result."""
+    # --- Arrange ---
+    flight = SingleFlight()
+    calls, results = [], []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"response_text": "answer"}
+
+    # --- Act ---
+    _run_concurrently(5, lambda: results.append(flight.do("key", slow_call, recheck=lambda: None)))
+
+    # --- Assert ---
+    assert len(calls) == 1
+    assert results == [{"response_text": "answer"}] * 5
+
+def test_lock_file_makes_other_processes_reuse_the_cached_result(tmp_path):
+    """Tests that separate SingleFlight instances (standing in for processes) wait on the key's lock file and re-check the cache."""
+    # --- Arrange ---
+    cache, calls, results = {}, [], []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.2)
+        cache["key"] = {"response_text": "answer", "__cache_hit__": True}
+        return {"response_text": "answer"}
+
+    def separate_process():
+        results.append(SingleFlight().do("key", slow_call, recheck=lambda: cache.get("key"), lock_dir=str(tmp_path)))
+
+    # --- Act ---
+    _run_concurrently(3, separate_process)
+
+    # --- Assert ---
+    assert len(calls) == 1
+    assert sorted(r.get("__cache_hit__", False) for r in results) == [False, True, True]
+    assert list(tmp_path.iterdir()) == [] # The holder removes its lock file.
+
+def test_errors_reach_every_waiter_and_are_not_remembered():
+    """Tests that an exception is raised for all waiters and the next call runs again."""
+    # --- Arrange ---
+    flight = SingleFlight()
+    errors = []
+
+    def failing_call():
+        time.sleep(0.1)
+        raise RuntimeError("boom")
+
+    def caller():
+        try:
+            flight.do("key", failing_call, recheck=lambda: None)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    # --- Act ---
+    _run_concurrently(3, caller)
+    retried = flight.do("key", lambda: "ok", recheck=lambda: None)
+
+    # --- Assert ---
+    assert errors == ["boom"] * 3
+    assert retried == "ok"
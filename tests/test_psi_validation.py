@@ -39,4 +39,27 @@ def test_failed_validation():
     # The result should be the error object, not the Pydantic model.
     assert not isinstance(result, SimpleResponse)
     assert isinstance(result, dict)
-    assert result.get("error_type") == "VALIDATION_ERROR"
\ No newline at end of file
+    assert result.get("error_type") == "VALIDATION_ERROR"
+
+def test_fenced_json_is_extracted_and_repaired():
+    """
+    Tests that JSON wrapped in a markdown fence with a trailing comma is fixed locally.
+    """
+    # --- Arrange ---
+    json_string = 'Here you go:\n```json\n{"name": "test", "value": 1, "is_correct": false,}\n```'
+
+    # --- Act ---
+    result = validator.validate_response(json_string, SimpleResponse)
+
+    # --- Assert ---
+    assert isinstance(result, SimpleResponse)
+    assert result.is_correct is False
+
+def test_invalid_json_is_reported_as_such():
+    """
+    Tests that unparseable text is distinguished from JSON that breaks the schema.
+    """
+    result = validator.validate_response("no json here", SimpleResponse)
+
+    assert result["error_type"] == "VALIDATION_ERROR"
+    assert result["message"] == "The LLM response was not valid JSON."
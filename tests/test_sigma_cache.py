@@ -0,0 +1,102 @@
+import io
+import os
+import pytest
+from forge.apps.cli_tools.sigma import cache as snapshot_cache
+
+def _record(key: str, rendered: str, **kwargs):
+    """Renders a snapshot through recording_snapshot, the path sigma uses to fill the cache."""
+    with snapshot_cache.recording_snapshot(key, **kwargs):
+        print(rendered, end='')
+
+def test_fingerprint_tracks_file_changes_and_options(tmp_path):
+    """Tests that the fingerprint changes when a file or a rendering option changes."""
+    # --- Arrange ---
+    file_path = tmp_path / "a.txt"
+    file_path.write_text("one")
+    files = [str(file_path)]
+
+    # --- Act ---
+    original = snapshot_cache.compute_fingerprint(files, str(tmp_path), 'text', None, False)
+    same = snapshot_cache.compute_fingerprint(files, str(tmp_path), 'text', None, False)
+    other_format = snapshot_cache.compute_fingerprint(files, str(tmp_path), 'json', None, False)
+    other_prompt = snapshot_cache.compute_fingerprint(files, str(tmp_path), 'text', "prompt", False)
+    file_path.write_text("one plus more")
+    modified = snapshot_cache.compute_fingerprint(files, str(tmp_path), 'text', None, False)
+
+    # --- Assert ---
+    assert original == same
+    assert len({original, other_format, other_prompt, modified}) == 4
+
+def test_record_and_stream_round_trip(tmp_path, monkeypatch):
+    """Tests that a recorded snapshot is streamed back byte for byte."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+
+    _record("key", "snapshot ✓ content")
+    out = io.BytesIO()
+
+    assert snapshot_cache.has_snapshot("key")
+    assert snapshot_cache.stream_snapshot("key", out)
+    assert out.getvalue().decode('utf-8') == "snapshot ✓ content"
+    assert not snapshot_cache.stream_snapshot("missing", io.BytesIO())
+
+def test_eviction_keeps_cache_within_limit(tmp_path, monkeypatch):
+    """Tests that the least recently used snapshots are evicted first."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+
+    _record("old", "x" * 100, max_bytes=250)
+    os.utime(tmp_path / "old.snapshot", (1, 1))
+    _record("mid", "y" * 100, max_bytes=250)
+    _record("new", "z" * 100, max_bytes=250)
+
+    assert not snapshot_cache.has_snapshot("old")
+    assert snapshot_cache.has_snapshot("mid")
+    assert snapshot_cache.has_snapshot("new")
+
+def test_recording_snapshot_streams_and_caches(tmp_path, monkeypatch, capsys):
+    """Tests that a rendered snapshot reaches stdout as it is printed and is cached afterwards."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+
+    with snapshot_cache.recording_snapshot("key"):
+        print("part one")
+        assert capsys.readouterr().out == "part one\n" # Already streamed, not buffered.
+        print("part two ✓")
+
+    out = io.BytesIO()
+    assert snapshot_cache.stream_snapshot("key", out)
+    assert out.getvalue().decode('utf-8') == "part one\npart two ✓\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["key.snapshot"]
+
+def test_failed_render_is_not_cached(tmp_path, monkeypatch):
+    """Tests that an interrupted render leaves neither a snapshot nor a temporary file behind."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        with snapshot_cache.recording_snapshot("key"):
+            print("partial")
+            raise RuntimeError("render failed")
+
+    assert list(tmp_path.iterdir()) == []
+
+def test_recording_removes_its_temporary_file_on_failure(tmp_path, monkeypatch, capsys):
+    """Tests that a failed atomic rename doesn't leave the temporary file in the cache."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(snapshot_cache.os, "replace", failing_replace)
+
+    _record("key", "content")
+
+    assert capsys.readouterr().out == "content"
+    assert list(tmp_path.iterdir()) == []
+
+def test_output_errors_are_not_reported_as_a_miss(tmp_path, monkeypatch):
+    """Tests that a failing output stream raises instead of looking like a cache miss."""
+    monkeypatch.setattr(snapshot_cache, "CACHE_DIR", str(tmp_path))
+    _record("key", "content")
+
+    class _BrokenPipe(io.BytesIO):
+        def write(self, data):
+            raise BrokenPipeError()
+
+    with pytest.raises(BrokenPipeError):
+        snapshot_cache.stream_snapshot("key", _BrokenPipe())
@@ -0,0 +1,218 @@
+import os
+import sys
+import subprocess
+import json
+import time
+import importlib
+import pytest
+from forge.apps.cli_tools.sigma import snapshot
+
+# 'lambda' is a keyword, so Lambda's loaders can only be imported by name.
+loaders = importlib.import_module("forge.packages.lambda.src.lambda.loaders")
+
+# --- Tests for deduplication ---
+
+def test_dedupe_replaces_identical_files_with_reference(tmp_path, capsys):
+    """Tests that only the first of several identical files is emitted in full."""
+    # --- Arrange ---
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.txt").write_text("same content")
+    (repo / "b.txt").write_text("same content")
+    (repo / "c.txt").write_text("other content")
+    files = [str(repo / name) for name in ("a.txt", "b.txt", "c.txt")]
+
+    # --- Act ---
+    snapshot.write_json_snapshot_to_stdout(files, str(tmp_path), dedupe=True)
+    data = json.loads(capsys.readouterr().out)
+
+    # --- Assert ---
+    assert data["repo/a.txt"] == "same content"
+    assert data["repo/b.txt"] == "[Duplicate of ./repo/a.txt]"
+    assert data["repo/c.txt"] == "other content"
+
+def test_dedupe_is_opt_in(tmp_path, capsys):
+    """Tests that identical files are emitted in full when deduplication is off."""
+    (tmp_path / "a.txt").write_text("same content")
+    (tmp_path / "b.txt").write_text("same content")
+    files = [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+
+    snapshot.write_snapshot_to_stdout(files, str(tmp_path), None)
+    output = capsys.readouterr().out
+
+    assert output.count("same content") == 2
+    assert "[Duplicate of" not in output
+
+def test_deduped_snapshot_expands_back_in_lambda(tmp_path, capsys):
+    """Tests that Lambda's parser restores each duplicate's content from the file it references."""
+    # --- Arrange ---
+    repo = tmp_path / "repo"
+    (repo / "src").mkdir(parents=True)
+    (repo / "a.txt").write_text("same content\nsecond line")
+    (repo / "src" / "b.txt").write_text("same content\nsecond line")
+    (repo / "src" / "c.txt").write_text("same content\nsecond line")
+    (repo / "d.txt").write_text("other content")
+    files = [str(repo / name) for name in ("a.txt", "src/b.txt", "src/c.txt", "d.txt")]
+    snapshot.write_snapshot_to_stdout(files, str(tmp_path), None, dedupe=True)
+    deduped = capsys.readouterr().out
+
+    # --- Act ---
+    raw = loaders.parse_codex_snapshot(deduped)
+    expanded = loaders.parse_codex_snapshot(deduped, expand_duplicates=True)
+
+    # --- Assert ---
+    assert raw["./repo/src/b.txt"] == raw["./repo/src/c.txt"] == "[Duplicate of ./repo/a.txt]"
+    assert expanded == {
+        "./repo/a.txt": "same content\nsecond line",
+        "./repo/src/b.txt": "same content\nsecond line",
+        "./repo/src/c.txt": "same content\nsecond line",
+        "./repo/d.txt": "other content",
+    }
+
+# --- Tests for git index enumeration ---
+
+def test_git_index_enumeration_respects_ignores(tmp_path):
+    """Tests that git-index enumeration honours .gitignore and .sigmaignore and orders READMEs first."""
+    # --- Arrange ---
+    subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True)
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    (tmp_path / "README.md").write_text("readme")
+    (tmp_path / "main.py").write_text("code")
+    (tmp_path / "debug.log").write_text("noise")
+    (tmp_path / "prompts").mkdir()
+    (tmp_path / "prompts" / "p.txt").write_text("prompt")
+
+    # --- Act ---
+    files = snapshot.process_repo(str(tmp_path), ["prompts/"], use_git_index=True)
+
+    # --- Assert ---
+    relative = [os.path.relpath(f, tmp_path) for f in files]
+    assert relative == ["README.md", ".gitignore", "main.py"]
+
+def test_git_index_falls_back_to_walk_outside_git(tmp_path, monkeypatch):
+    """Tests that non-git directories are enumerated by walking the tree."""
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path.parent))
+    (tmp_path / "a.txt").write_text("a")
+
+    files = snapshot.process_repo(str(tmp_path), [], use_git_index=True)
+
+    assert files == [str(tmp_path / "a.txt")]
+
+# --- Tests for path selectors ---
+
+def _make_tree(root):
+    """Creates a small repository layout for selector tests."""
+    for relative_path in ("README.md", "src/app.py", "src/notes.md", "docs/guide.md", "build/out.md"):
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(relative_path)
+
+def test_include_and_exclude_selectors(tmp_path):
+    """Tests that include patterns keep matching files and exclude patterns prune directories."""
+    _make_tree(tmp_path)
+
+    files = snapshot.process_repo(str(tmp_path), [], include_patterns=["*.md"], exclude_patterns=["build/"])
+
+    relative = [os.path.relpath(f, tmp_path) for f in files]
+    assert relative == ["README.md", "docs/guide.md", "src/notes.md"]
+
+def test_subtree_selection(tmp_path):
+    """Tests that only the selected subtree is enumerated."""
+    _make_tree(tmp_path)
+
+    files = snapshot.process_repo(str(tmp_path), [], subtrees=["src/"])
+
+    relative = [os.path.relpath(f, tmp_path) for f in files]
+    assert relative == ["src/app.py", "src/notes.md"]
+
+def test_subtree_outside_the_repository_is_rejected(tmp_path):
+    """Tests that subtrees escaping the repository root, directly or through a symlink, raise ValueError."""
+    # --- Arrange ---
+    repo = tmp_path / "repo"
+    _make_tree(repo)
+    (tmp_path / "secret").mkdir()
+    (tmp_path / "secret" / "key.txt").write_text("secret")
+    (repo / "escape").symlink_to(tmp_path / "secret")
+
+    # --- Act & Assert ---
+    for subtree in ("../secret", "src/../../secret", "escape"):
+        with pytest.raises(ValueError):
+            snapshot.process_repo(str(repo), [], subtrees=[subtree])
+    files = snapshot.process_repo(str(repo), [], subtrees=["/src/../docs"])
+    assert [os.path.relpath(f, repo) for f in files] == ["docs/guide.md"]
+
+def test_files_from_rejects_repository_selectors(tmp_path):
+    """Tests that the CLI refuses selectors --files-from would otherwise ignore."""
+    file_list = tmp_path / "files.txt"
+    file_list.write_text("README.md\n")
+    env = dict(os.environ, ENCLAVE_FOUNDATION_ROOT=str(tmp_path), PYTHONPATH=os.pathsep.join(sys.path))
+
+    for selector in (["--subtree", "src"], ["--use-git-index"], ["--all"], ["--forge"]):
+        result = subprocess.run([sys.executable, "-m", "forge.apps.cli_tools.sigma", "--files-from", str(file_list)] + selector,
+                                capture_output=True, text=True, env=env)
+        assert result.returncode == 2
+        assert "--files-from cannot be combined" in result.stderr
+
+def test_process_file_list(tmp_path):
+    """Tests that an explicit file list is resolved, filtered and ordered."""
+    _make_tree(tmp_path)
+    file_list = ["src/app.py", "README.md", "missing.txt", "", str(tmp_path / "build" / "out.md")]
+
+    files = snapshot.process_file_list(file_list, str(tmp_path), ["build/"])
+
+    relative = [os.path.relpath(f, tmp_path) for f in files]
+    assert relative == ["README.md", "src/app.py"]
+
+# --- Tests for the concurrent repository scan ---
+
+def _run_sigma(monkeypatch, tmp_path, process_repo, *flags):
+    """Runs sigma's main() against tmp_path with a stand-in process_repo. Returns the captured render plan."""
+    sigma_main = importlib.import_module("forge.apps.cli_tools.sigma.__main__")
+    plans = []
+    monkeypatch.setenv("ENCLAVE_FOUNDATION_ROOT", str(tmp_path))
+    monkeypatch.setattr(sys, "argv", ["sigma", "--output-format", "json", "--no-cache", *flags])
+    monkeypatch.setattr(sigma_main, "process_repo", process_repo)
+    monkeypatch.setattr(sigma_main.loom, "render", plans.append)
+    sigma_main.main()
+    return plans[0]
+
+def test_concurrent_scan_keeps_the_requested_order(tmp_path, monkeypatch, capsys):
+    """Tests that repositories finishing out of order are still reported and emitted in the order requested."""
+    # --- Arrange ---
+    delays = {"foundation": 0.2, "mycelium": 0.0}
+    finished = []
+    for repo_name in delays:
+        (tmp_path / repo_name).mkdir()
+        (tmp_path / repo_name / "file.txt").write_text(repo_name)
+    def delayed_process_repo(repo_path, global_ignore_patterns, **selectors):
+        repo_name = os.path.basename(repo_path)
+        time.sleep(delays[repo_name])
+        finished.append(repo_name)
+        return [os.path.join(repo_path, "file.txt")]
+
+    # --- Act ---
+    plan = _run_sigma(monkeypatch, tmp_path, delayed_process_repo, "--foundation", "--mycelium")
+    data = json.loads(capsys.readouterr().out)
+
+    # --- Assert ---
+    assert finished == ["mycelium", "foundation"]
+    scoping = next(item for item in plan if item.get("title") == "Scoping Repositories")
+    assert [item["key"] for item in scoping["items"]] == ["foundation", "mycelium"]
+    assert list(data) == ["foundation/file.txt", "mycelium/file.txt"]
+
+def test_concurrent_scan_aborts_on_a_rejected_repository(tmp_path, monkeypatch, capsys):
+    """Tests that a ValueError from one repository's scan aborts the run without writing a snapshot."""
+    # --- Arrange ---
+    def failing_process_repo(repo_path, global_ignore_patterns, **selectors):
+        if repo_path.endswith("mycelium"):
+            raise ValueError("Subtree 'src' escapes the repository")
+        return []
+
+    # --- Act ---
+    plan = _run_sigma(monkeypatch, tmp_path, failing_process_repo, "--foundation", "--mycelium")
+
+    # --- Assert ---
+    error = next(item for item in plan if item.get("title") == "Error")
+    assert error["items"][0]["value"] == "Subtree 'src' escapes the repository"
+    assert plan[-1] == {"type": "end", "text": "Operation aborted.", "color": "red"}
+    assert capsys.readouterr().out == ""